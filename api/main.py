@@ -1,10 +1,13 @@
 from fastapi import FastAPI, UploadFile, File, Request
-from fastapi.responses import HTMLResponse, JSONResponse
+from fastapi.responses import HTMLResponse, JSONResponse, Response, StreamingResponse
 from fastapi.staticfiles import StaticFiles
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.templating import Jinja2Templates
-from PIL import Image, ImageDraw, ImageFont
+from starlette.background import BackgroundTask
+from PIL import Image, ImageDraw, ImageFont, ImageOps
 import uuid
+import sys
+import importlib.util
 import shutil
 import os
 import logging
@@ -12,6 +15,8 @@ import base64
 import httpx
 import json
 import io
+import time
+import hashlib
 
 # ==================== INITIALIZE APP ====================
 HF_API_URL = "https://rozu1726-ibrood-app.hf.space"
@@ -55,15 +60,195 @@ if os.path.exists(os.path.join(frontend_path, "static")):
 # Setup templates
 templates = Jinja2Templates(directory=templates_path)
 
-# ==================== LOCAL MODEL CONFIG ====================
-# from ultralytics import YOLO
-# import cv2
-# import numpy as np
+# ==================== UPSTREAM CLIENT ====================
+# One pooled client for the app's lifetime so calls to HF_API_URL reuse
+# keep-alive (HTTP/2 when h2 is installed) connections instead of paying a
+# new TCP + TLS handshake per request.
+UPSTREAM_TIMEOUT = float(os.environ.get("UPSTREAM_TIMEOUT", "60"))
+UPSTREAM_MAX_CONNECTIONS = int(os.environ.get("UPSTREAM_MAX_CONNECTIONS", "20"))
+UPSTREAM_MAX_KEEPALIVE = int(os.environ.get("UPSTREAM_MAX_KEEPALIVE", "10"))
+UPSTREAM_KEEPALIVE_EXPIRY = float(os.environ.get("UPSTREAM_KEEPALIVE_EXPIRY", "60"))
+
+try:
+    import h2  # noqa: F401 - enables httpx HTTP/2 support
+    UPSTREAM_HTTP2 = os.environ.get("UPSTREAM_HTTP2", "1") == "1"
+except ImportError:
+    UPSTREAM_HTTP2 = False
+
+# Upper bounds (ms) of the upstream latency histogram buckets
+LATENCY_BUCKETS_MS = (50, 100, 250, 500, 1000, 2500, 5000, 10000, 30000, 60000)
+
+class UpstreamMetrics:
+    """Per-route upstream latency histograms"""
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.routes = {}
+
+    def observe(self, route, elapsed_ms, ok):
+        stats = self.routes.setdefault(route, {
+            "count": 0,
+            "errors": 0,
+            "sum_ms": 0.0,
+            "buckets": [0] * (len(self.buckets) + 1)
+        })
+        stats["count"] += 1
+        stats["sum_ms"] += elapsed_ms
+        if not ok:
+            stats["errors"] += 1
+        index = next((i for i, bound in enumerate(self.buckets) if elapsed_ms <= bound), len(self.buckets))
+        stats["buckets"][index] += 1
+
+    def snapshot(self):
+        labels = [f"<={bound}ms" for bound in self.buckets] + [f">{self.buckets[-1]}ms"]
+        return {
+            route: {
+                "count": stats["count"],
+                "errors": stats["errors"],
+                "avg_ms": round(stats["sum_ms"] / stats["count"], 1) if stats["count"] else 0,
+                "histogram": dict(zip(labels, stats["buckets"]))
+            }
+            for route, stats in self.routes.items()
+        }
 
-# Load the local model
-logger.info("Using Hugging Face API for inference...")
-# model = YOLO('best-seg.pt')
-# logger.info("Using local YOLO model for inference")
+upstream_metrics = UpstreamMetrics(LATENCY_BUCKETS_MS)
+upstream_client = None
+
+@app.on_event("startup")
+async def open_upstream_client():
+    global upstream_client
+    upstream_client = httpx.AsyncClient(
+        base_url=HF_API_URL,
+        http2=UPSTREAM_HTTP2,
+        timeout=UPSTREAM_TIMEOUT,
+        limits=httpx.Limits(
+            max_connections=UPSTREAM_MAX_CONNECTIONS,
+            max_keepalive_connections=UPSTREAM_MAX_KEEPALIVE,
+            keepalive_expiry=UPSTREAM_KEEPALIVE_EXPIRY
+        )
+    )
+    logger.info(f"Upstream client ready for {HF_API_URL} (http2={UPSTREAM_HTTP2})")
+
+@app.on_event("shutdown")
+async def close_upstream_client():
+    if upstream_client is not None:
+        await upstream_client.aclose()
+
+async def upstream_post(route, **kwargs):
+    """POST to the detection API on the shared client, recording latency per route"""
+    start = time.perf_counter()
+    ok = False
+    try:
+        response = await upstream_client.post(route, **kwargs)
+        ok = response.status_code == 200
+        return response
+    finally:
+        upstream_metrics.observe(route, (time.perf_counter() - start) * 1000, ok)
+
+def blob_urls(data, *fields, base=HF_API_URL):
+    """Blob-store URLs from a detection response, made absolute against base
+    (HF_API_URL for upstream responses, "" keeps local ones relative)"""
+    return {
+        field: data[field] if data[field].startswith("http") else f"{base}{data[field]}"
+        for field in fields if data.get(field)
+    }
+
+# ==================== INFERENCE MODE ====================
+# INFERENCE_MODE picks where detections run:
+#   remote   - forward every upload to the detection service at HF_API_URL (default)
+#   local    - run the detection core of huggingface-deploy/app.py in this
+#              process, skipping the network hop and the second image upload
+#   fallback - local, but forward to HF_API_URL when the local models are not
+#              loaded, the local inference queue is full or local inference fails
+# The detection app is imported from DETECTOR_DIR with its models, batchers,
+# result cache and blob store (its blobs are served from this gateway's
+# /blobs). Detection jobs always run on the detection service.
+INFERENCE_MODES = ("remote", "local", "fallback")
+INFERENCE_MODE = os.environ.get("INFERENCE_MODE", "remote").lower()
+DETECTOR_DIR = os.path.abspath(os.environ.get("DETECTOR_DIR", os.path.join(backend_path, "..", "huggingface-deploy")))
+# Local answers that fallback mode retries upstream: models not loaded, queue full
+FALLBACK_STATUSES = (500, 503)
+
+if INFERENCE_MODE not in INFERENCE_MODES:
+    logger.error(f"Unknown INFERENCE_MODE '{INFERENCE_MODE}', using remote")
+    INFERENCE_MODE = "remote"
+
+def load_detector(path):
+    """Import the detection app (huggingface-deploy/app.py) as a module, or None"""
+    cwd = os.getcwd()
+    try:
+        # The detection app imports its sibling modules and loads its weights
+        # relative to its own directory
+        sys.path.insert(0, path)
+        os.chdir(path)
+        spec = importlib.util.spec_from_file_location("detector", os.path.join(path, "app.py"))
+        module = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(module)
+        logger.info(f"Local detector loaded from {path}")
+        return module
+    except Exception as e:
+        logger.error(f"Failed to load local detector from {path}: {e}")
+        return None
+    finally:
+        os.chdir(cwd)
+
+detector = load_detector(DETECTOR_DIR) if INFERENCE_MODE != "remote" else None
+local_metrics = UpstreamMetrics(LATENCY_BUCKETS_MS)
+fallbacks = {}
+
+if detector is not None:
+    app.add_api_route("/blobs/{key:path}", detector.get_blob, methods=["GET"])
+logger.info(f"Inference mode: {INFERENCE_MODE}")
+
+async def local_detection(route, file_content, params):
+    """(status code, body) of the in-process detection core for /queen_detect or /brood_detect"""
+    start = time.perf_counter()
+    status_code = 500
+    try:
+        try:
+            if route == "/queen_detect":
+                result = detector.queen_request_error("fp32") or await detector.queen_detection(file_content)
+            else:
+                result = detector.brood_request_error(**params) or await detector.brood_detection(file_content, **params)
+        except detector.InferenceQueueFull:
+            result = detector.queue_full_response()
+        except detector.UploadRejected as e:
+            result = detector.upload_rejected_response(e)
+        
+        # Errors come back as the detection app's JSONResponses
+        if isinstance(result, Response):
+            status_code, data = result.status_code, json.loads(result.body)
+        else:
+            status_code, data = 200, result
+        return status_code, data
+    finally:
+        local_metrics.observe(route, (time.perf_counter() - start) * 1000, status_code == 200)
+
+async def detect(route, upload, params=None):
+    """Run a detection where INFERENCE_MODE says. upload is a (filename, bytes or
+    file, content type) tuple. Returns (status code, body, base URL for the
+    body's relative links)."""
+    params = params or {}
+    if INFERENCE_MODE != "remote":
+        filename, content, content_type = upload
+        if hasattr(content, "read"):
+            content = content.read()
+            upload = (filename, content, content_type)
+        try:
+            if detector is None:
+                raise RuntimeError(f"Local detector not loaded from {DETECTOR_DIR}")
+            status_code, data = await local_detection(route, content, params)
+            if INFERENCE_MODE == "local" or status_code not in FALLBACK_STATUSES:
+                return status_code, data, ""
+            logger.warning(f"Local {route} answered {status_code}, falling back to {HF_API_URL}")
+        except Exception as e:
+            if INFERENCE_MODE == "local":
+                raise
+            logger.warning(f"Local {route} failed, falling back to {HF_API_URL}: {e}")
+        fallbacks[route] = fallbacks.get(route, 0) + 1
+    
+    response = await upstream_post(route, files={"file": upload}, params=params)
+    return response.status_code, response.json() if response.status_code == 200 else {}, HF_API_URL
 
 # ==================== QUEEN CELL CLASSES - ONLY 5 CLASSES ====================
 # CORRECTED CLASS MAPPING - BASED ON YOUR MODEL OUTPUTS
@@ -179,6 +364,19 @@ async def brood_page(request: Request):
         return HTMLResponse("<h1>Error loading brood page</h1>")
 
 # ==================== QUEEN CELL DETECTION ENDPOINT ====================
+# Queen boxes are in the coordinates of the detection service's inference
+# copy of the upload: EXIF orientation applied, longest side at most
+# INFERENCE_MAX_SIZE (see huggingface-deploy/ingest.py)
+INFERENCE_MAX_SIZE = 1280
+
+def inference_frame(fp):
+    """The upload as the detection service runs it: upright and downscaled like ingest.prepare_image"""
+    img = ImageOps.exif_transpose(Image.open(fp))
+    ratio = min(1.0, INFERENCE_MAX_SIZE / max(img.size))
+    if ratio < 1.0:
+        img = img.resize((int(img.width * ratio), int(img.height * ratio)), Image.LANCZOS)
+    return img
+
 @app.post("/queen_detect")
 async def detect_queen(file: UploadFile = File(...)):
     """
@@ -188,43 +386,42 @@ async def detect_queen(file: UploadFile = File(...)):
     try:
         logger.info("STARTING QUEEN CELL DETECTION...")
 
-        # Read file content
-        file_content = await file.read()
-
-        # Call Hugging Face API
-        async with httpx.AsyncClient(timeout=60.0) as client:
-            files = {"file": (file.filename, file_content, file.content_type)}
-            response = await client.post(f"{HF_API_URL}/queen_detect", files=files)
-            
-            if response.status_code != 200:
-                logger.error(f"HF API error: {response.status_code}")
-                return JSONResponse(
-                    content={"error": "Model API unavailable"},
-                    status_code=500
-                )
-
-        data = response.json()  # Get detections
-
-        # Annotate the image
-        img = Image.open(io.BytesIO(file_content))
-        draw = ImageDraw.Draw(img)
-        try:
-            font = ImageFont.load_default()
-        except:
-            font = ImageFont.truetype("arial.ttf", 15) if os.path.exists("arial.ttf") else ImageFont.load_default()
+        # Remote calls stream the spooled upload in chunks
+        status_code, data, _ = await detect("/queen_detect", (file.filename, file.file, file.content_type))
         
-        for det in data.get("detections", []):
-            x1, y1, x2, y2 = det["bbox"]
-            cls = det["class"]
-            label = QUEEN_CLASS_MAP.get(cls, str(cls))
-            color = QUEEN_CLASS_ATTRIBUTES.get(label, {}).get("color", "#FF0000")
-            draw.rectangle([x1, y1, x2, y2], outline=color, width=3)
-            draw.text((x1, y1 - 10), label, fill=color, font=font)
+        if status_code != 200:
+            logger.error(f"Detection error: {status_code}")
+            return JSONResponse(
+                content={"error": "Model API unavailable"},
+                status_code=500
+            )
 
-        # Convert annotated image to Base64
-        buffer = io.BytesIO()
-        img.save(buffer, format="JPEG")
-        img_str = base64.b64encode(buffer.getvalue()).decode()
+        annotated = data.get("annotated_image", "")
+        if annotated.startswith("data:image/"):
+            # The detection service already drew the boxes on the frame they refer to
+            img_str = annotated.split(",", 1)[1]
+        else:
+            # Annotate the image
+            file.file.seek(0)
+            img = inference_frame(file.file)
+            draw = ImageDraw.Draw(img)
+            try:
+                font = ImageFont.load_default()
+            except:
+                font = ImageFont.truetype("arial.ttf", 15) if os.path.exists("arial.ttf") else ImageFont.load_default()
+            
+            for det in data.get("detections", []):
+                x1, y1, x2, y2 = det["bbox"]
+                cls = det["class"]
+                label = QUEEN_CLASS_MAP.get(cls, str(cls))
+                color = QUEEN_CLASS_ATTRIBUTES.get(label, {}).get("color", "#FF0000")
+                draw.rectangle([x1, y1, x2, y2], outline=color, width=3)
+                draw.text((x1, y1 - 10), label, fill=color, font=font)
+
+            # Convert annotated image to Base64
+            buffer = io.BytesIO()
+            img.convert("RGB").save(buffer, format="JPEG")
+            img_str = base64.b64encode(buffer.getvalue()).decode()
 
         # Prepare summary
         summary = {QUEEN_CLASS_MAP.get(d["class"], str(d["class"])): 0 for d in data.get("detections", [])}
@@ -241,49 +438,60 @@ async def detect_queen(file: UploadFile = File(...)):
         )
 
 # ==================== COMPATIBILITY ENDPOINT FOR FRONTEND ====================
+# /analyze takes the image as a raw body, a multipart "file" field or legacy
+# base64 JSON, parsed by the detection service's analyze_upload.py (imported
+# from DETECTOR_DIR) so both accept exactly the same requests. Binary uploads
+# are forwarded as they are and answered with a short reference (imageId plus
+# blob-store URLs). The legacy form still echoes the image as imagePreview.
+# Sizes and parse times per form are in /health.
+sys.path.append(DETECTOR_DIR)
+from analyze_upload import InvalidUpload, AnalyzeMetrics, read_analyze_upload
+
+analyze_metrics = AnalyzeMetrics()
+
 @app.post("/analyze")
 async def analyze_image(request: Request):
     """
-    Compatibility endpoint for frontend - expects JSON with base64 image
+    Compatibility endpoint for frontend - takes the image as a raw body,
+    multipart upload or legacy base64 JSON (see above)
     """
     try:
         logger.info("STARTING ANALYSIS FROM FRONTEND...")
         
-        data = await request.json()
-        image_data = data.get('image', '')
-        
-        if not image_data or 'data:image' not in image_data:
+        start = time.perf_counter()
+        try:
+            form, image_bytes, content_type, request_bytes, image_data = await read_analyze_upload(request)
+        except (InvalidUpload, ValueError) as e:
             return JSONResponse(
-                content={"error": "Invalid image format"},
+                content={"error": str(e) if isinstance(e, InvalidUpload) else "Invalid image format"},
                 status_code=400
             )
+        parse_ms = (time.perf_counter() - start) * 1000
         
-        # Extract base64 data
-        image_base64 = image_data.split(',')[1]
-        image_bytes = base64.b64decode(image_base64)
-        
-        # Convert to PIL Image to get dimensions and save as bytes
-        img = Image.open(io.BytesIO(image_bytes))
-        
-        # Call Hugging Face API for queen detection
-        async with httpx.AsyncClient(timeout=60.0) as client:
+        if image_data is not None:
+            # Convert to PIL Image to get dimensions and save as bytes
+            img = Image.open(io.BytesIO(image_bytes))
+            
             # Process image in memory
             buffer = io.BytesIO()
             img.save(buffer, format="JPEG")
             buffer.seek(0)
-            
-            # Send to Hugging Face API
-            files = {"file": ("image.jpg", buffer, "image/jpeg")}
-            response = await client.post(f"{HF_API_URL}/queen_detect", files=files)
-            
-            if response.status_code != 200:
-                logger.error(f"HF API error: {response.status_code}")
-                return JSONResponse(
-                    content={"error": "Model API unavailable"},
-                    status_code=500
-                )
+            upload = ("image.jpg", buffer, "image/jpeg")
+        else:
+            # Binary uploads go upstream untouched
+            upload = ("image", image_bytes, content_type)
+        
+        # Queen detection, in process or on the detection service
+        status_code, upstream, base = await detect("/queen_detect", upload)
+        
+        if status_code != 200:
+            logger.error(f"Detection error: {status_code}")
+            return JSONResponse(
+                content={"error": "Model API unavailable"},
+                status_code=500
+            )
         
-        detections = response.json().get("detections", [])
+        detections = upstream.get("detections", [])
         
         # Process detections to match frontend expectations
         cells = []
@@ -378,10 +586,15 @@ async def analyze_image(request: Request):
             "cells": cells,
             "maturityDistribution": distribution,
             "recommendations": recommendations if recommendations else ['Continue regular monitoring'],
-            "imagePreview": image_data
+            "imageId": hashlib.sha256(image_bytes).hexdigest()[:32],
+            **blob_urls(upstream, "image_url", "thumbnail_url", "annotated_image_url", base=base)
         }
+        if image_data is not None:
+            result["imagePreview"] = image_data
         
-        return JSONResponse(content=result)
+        response = JSONResponse(content=result)
+        analyze_metrics.observe(form, request_bytes, len(response.body), parse_ms)
+        return response
         
     except Exception as e:
         logger.error(f"Error in analysis: {str(e)}")
@@ -392,43 +605,55 @@ async def analyze_image(request: Request):
 
 # ==================== BROOD STATUS DETECTION ENDPOINT ====================
 @app.post("/brood_detect")
-async def detect_brood(file: UploadFile = File(...)):
+async def detect_brood(request: Request):
     """
     Detect brood status: Egg, Larva, Pupa, Empty Comb
+    Expects multipart form data with a 'file' field
     Returns: Percentage breakdown and hive health status
     """
     try:
         logger.info("STARTING BROOD STATUS DETECTION...")
 
-        # Read file content
-        file_content = await file.read()
-
-        # Call Hugging Face API
-        async with httpx.AsyncClient(timeout=60.0) as client:
-            files = {"file": (file.filename, file_content, file.content_type)}
-            response = await client.post(f"{HF_API_URL}/brood_detect", files=files)
-            
-            if response.status_code != 200:
-                logger.error(f"HF API error: {response.status_code}")
-                return JSONResponse(
-                    content={"error": "Model API unavailable"},
-                    status_code=500
-                )
-            
-            data = response.json()
-            
-            # Format response for frontend
-            result = {
-                "detections": data.get("detections", []),
-                "count": data.get("count", 0),
-                "counts": data.get("counts", {"egg": 0, "larva": 0, "pupa": 0, "empty_comb": 0}),
-                "health": data.get("health", {"status": "UNKNOWN", "score": 0}),
-                "recommendations": data.get("recommendations", []),
-                "annotated_image": data.get("annotated_image", ""),
-                "annotated_image_with_labels": data.get("annotated_image_with_labels", "")
-            }
-            
-            return JSONResponse(content=result)
+        # The gateway's frontend contract carries the annotated images inline
+        params = {"output": "inline"}
+        if INFERENCE_MODE == "remote":
+            # The gateway never looks at the image, so the client's multipart body
+            # is streamed straight through to Hugging Face instead of buffered
+            headers = {"content-type": request.headers.get("content-type", "")}
+            if "content-length" in request.headers:
+                headers["content-length"] = request.headers["content-length"]
+            response = await upstream_post("/brood_detect", content=request.stream(), headers=headers, params=params)
+            status_code, base = response.status_code, HF_API_URL
+            data = response.json() if status_code == 200 else {}
+        else:
+            form = await request.form()
+            upload = form.get("file")
+            if upload is None or isinstance(upload, str):
+                return JSONResponse(content={"error": "Multipart body needs a 'file' field"}, status_code=400)
+            status_code, data, base = await detect(
+                "/brood_detect", (upload.filename, await upload.read(), upload.content_type), params
+            )
+        
+        if status_code != 200:
+            logger.error(f"Detection error: {status_code}")
+            return JSONResponse(
+                content={"error": "Model API unavailable"},
+                status_code=500
+            )
+        
+        # Format response for frontend
+        result = {
+            "detections": data.get("detections", []),
+            "count": data.get("count", 0),
+            "counts": data.get("counts", {"egg": 0, "larva": 0, "pupa": 0, "empty_comb": 0}),
+            "health": data.get("health", {"status": "UNKNOWN", "score": 0}),
+            "recommendations": data.get("recommendations", []),
+            "annotated_image": data.get("annotated_image", ""),
+            "annotated_image_with_labels": data.get("annotated_image_with_labels", ""),
+            **blob_urls(data, "image_url", "thumbnail_url", "annotated_image_url", "annotated_image_with_labels_url", base=base)
+        }
+        
+        return JSONResponse(content=result)
             
     except Exception as e:
         logger.error(f"Error in brood detection: {str(e)}")
@@ -448,11 +673,93 @@ async def get_brood_status():
         "classes": ["egg", "larva", "pupa", "empty_comb"]
     })
 
+# ==================== DETECTION JOBS ====================
+# Proxies the detection service's job API. Submitting and polling are short
+# requests, so slow inferences no longer run into UPSTREAM_TIMEOUT.
+def upstream_unavailable(e):
+    """502 for a job request the detection service could not answer"""
+    logger.error(f"HF API unreachable: {e}")
+    return JSONResponse(content={"error": "Model API unavailable"}, status_code=502)
+
+def job_urls(data):
+    """Job URLs made relative to this gateway"""
+    if "job_id" in data:
+        data["status_url"] = f"/jobs/{data['job_id']}"
+        data["events_url"] = f"/jobs/{data['job_id']}/events"
+    return data
+
+@app.post("/jobs")
+async def submit_job(request: Request):
+    """Queue a queen_detect / brood_detect job; same query parameters and multipart body as upstream"""
+    headers = {"content-type": request.headers.get("content-type", "")}
+    if "content-length" in request.headers:
+        headers["content-length"] = request.headers["content-length"]
+    try:
+        response = await upstream_post(
+            "/jobs", content=request.stream(), headers=headers, params=dict(request.query_params)
+        )
+    except httpx.HTTPError as e:
+        return upstream_unavailable(e)
+    if response.status_code >= 500:
+        logger.error(f"HF API error: {response.status_code}")
+        return JSONResponse(content={"error": "Model API unavailable"}, status_code=500)
+    data = job_urls(response.json())
+    headers = {"Location": data["status_url"]} if response.status_code == 202 else None
+    return JSONResponse(content=data, status_code=response.status_code, headers=headers)
+
+@app.get("/jobs/{job_id}")
+async def get_job(job_id: str):
+    """Job status, with the detection result once it is done"""
+    try:
+        response = await upstream_client.get(f"/jobs/{job_id}")
+    except httpx.HTTPError as e:
+        return upstream_unavailable(e)
+    if response.status_code >= 500:
+        logger.error(f"HF API error: {response.status_code}")
+        return JSONResponse(content={"error": "Model API unavailable"}, status_code=500)
+    return JSONResponse(content=response.json(), status_code=response.status_code)
+
+@app.get("/jobs/{job_id}/events")
+async def job_events(job_id: str):
+    """Relay the job's server-sent event stream"""
+    request = upstream_client.build_request("GET", f"/jobs/{job_id}/events", timeout=httpx.Timeout(UPSTREAM_TIMEOUT, read=None))
+    try:
+        response = await upstream_client.send(request, stream=True)
+    except httpx.HTTPError as e:
+        return upstream_unavailable(e)
+    if response.status_code != 200:
+        await response.aread()
+        await response.aclose()
+        return JSONResponse(content=response.json(), status_code=response.status_code)
+    return StreamingResponse(response.aiter_raw(), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+                             background=BackgroundTask(response.aclose))
+
 # ==================== HEALTH CHECK ====================
 @app.get("/health")
 async def health_check():
     """Health check endpoint"""
-    return JSONResponse(content={"status": "healthy", "service": "queen-cell-analysis-api"})
+    return JSONResponse(content={
+        "status": "healthy",
+        "service": "queen-cell-analysis-api",
+        "upstream": {
+            "url": HF_API_URL,
+            "http2": UPSTREAM_HTTP2,
+            "max_connections": UPSTREAM_MAX_CONNECTIONS,
+            "latency": upstream_metrics.snapshot()
+        },
+        "inference": {
+            "mode": INFERENCE_MODE,
+            "detector": DETECTOR_DIR if detector is not None else None,
+            "models": {
+                "queen": detector.queen_model is not None,
+                "brood": detector.brood_model is not None
+            } if detector is not None else None,
+            "latency": local_metrics.snapshot(),
+            "fallbacks": fallbacks
+        },
+        "analyze": analyze_metrics.snapshot()
+    })
 
 if __name__ == "__main__":
     import uvicorn
@@ -87,6 +87,12 @@ export default function BroodPatternPage() {
       const result = await response.json()
       console.log('Brood detection result:', result)
       
+      // Annotated images are rendered on demand by result id (JPEG, loaded by the <img> tags)
+      const annotatedImage = result.annotated_image
+        || (result.annotated_image_url ? `${API_URL}${result.annotated_image_url}` : null)
+      const annotatedImageWithLabels = result.annotated_image_with_labels
+        || (result.annotated_image_with_labels_url ? `${API_URL}${result.annotated_image_with_labels_url}` : null)
+      
       // Transform API results to match UI format - ONLY 3 CLASSES
       const counts = result.counts || { egg: 0, larva: 0, pupa: 0 }
       const health = result.health || { status: 'UNKNOWN', score: 0, total_brood: 0, total_cells: 0 }
@@ -131,9 +137,9 @@ export default function BroodPatternPage() {
         ],
         recommendations: result.recommendations || ['Continue regular monitoring'],
         // Use annotated image (with bounding boxes) as the primary image
-        imagePreview: result.annotated_image || imageData,
-        annotatedImage: result.annotated_image || null,
-        annotatedImageWithLabels: result.annotated_image_with_labels || null,
+        imagePreview: annotatedImage || imageData,
+        annotatedImage: annotatedImage,
+        annotatedImageWithLabels: annotatedImageWithLabels,
         originalImage: imageData,
         detections: result.detections || []
       }
@@ -1,16 +1,23 @@
 # iBrood Database API
 # FastAPI endpoints for PostgreSQL on Render
 
-from fastapi import FastAPI, HTTPException, Depends
+from fastapi import FastAPI, HTTPException, Depends, Response, Header
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel, EmailStr
-from typing import List, Optional
-from datetime import datetime, date
+from pydantic import ValidationError, AfterValidator
+from typing import List, Optional, Annotated, Tuple
+from datetime import datetime, date, timedelta, timezone
+from uuid import UUID
 import os
+import json
+import base64
+import asyncio
 import asyncpg
-import hashlib
 import secrets
+import time
+from collections import OrderedDict
 from dotenv import load_dotenv
+import passwords
 
 # Load environment variables from .env file
 load_dotenv()
@@ -24,18 +31,70 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor"],
 )
 
 # Database connection
 DATABASE_URL = os.environ.get("DATABASE_URL", "")
 
+# Connection pool settings
+DB_POOL_MIN_SIZE = int(os.environ.get("DB_POOL_MIN_SIZE", "2"))
+DB_POOL_MAX_SIZE = int(os.environ.get("DB_POOL_MAX_SIZE", "10"))
+DB_ACQUIRE_TIMEOUT = float(os.environ.get("DB_ACQUIRE_TIMEOUT", "5"))
+DB_STATEMENT_CACHE_SIZE = int(os.environ.get("DB_STATEMENT_CACHE_SIZE", "100"))
+DB_MAX_INACTIVE_LIFETIME = float(os.environ.get("DB_MAX_INACTIVE_LIFETIME", "300"))
+
+pool: Optional[asyncpg.Pool] = None
+pool_acquire_timeouts = 0
+
+async def init_connection(conn):
+    """Decode JSONB columns (cells_data) to and from Python dicts"""
+    await conn.set_type_codec("jsonb", encoder=json.dumps, decoder=json.loads, schema="pg_catalog")
+
+@app.on_event("startup")
+async def create_pool():
+    global pool
+    pool = await asyncpg.create_pool(
+        DATABASE_URL,
+        min_size=DB_POOL_MIN_SIZE,
+        max_size=DB_POOL_MAX_SIZE,
+        statement_cache_size=DB_STATEMENT_CACHE_SIZE,
+        max_inactive_connection_lifetime=DB_MAX_INACTIVE_LIFETIME,
+        init=init_connection
+    )
+
+@app.on_event("shutdown")
+async def close_pool():
+    if maintenance_task is not None:
+        maintenance_task.cancel()
+    if pool is not None:
+        await pool.close()
+
 async def get_db():
-    """Get database connection pool"""
-    conn = await asyncpg.connect(DATABASE_URL)
+    """Get a connection from the pool"""
+    global pool_acquire_timeouts
+    try:
+        conn = await pool.acquire(timeout=DB_ACQUIRE_TIMEOUT)
+    except asyncio.TimeoutError:
+        pool_acquire_timeouts += 1
+        raise HTTPException(status_code=503, detail="Database busy, please retry")
     try:
         yield conn
     finally:
-        await conn.close()
+        await pool.release(conn)
+
+def pool_stats() -> dict:
+    """Pool utilization for /health"""
+    size = pool.get_size()
+    idle = pool.get_idle_size()
+    return {
+        "min_size": pool.get_min_size(),
+        "max_size": pool.get_max_size(),
+        "size": size,
+        "in_use": size - idle,
+        "idle": idle,
+        "acquire_timeouts": pool_acquire_timeouts
+    }
 
 
 # ==================== MODELS ====================
@@ -55,6 +114,24 @@ class UserResponse(BaseModel):
     name: str
     created_at: datetime
 
+# Analysis images live in the detection API's blob store; rows keep only the
+# URL. Inline base64 images (data: URLs) are refused so rows stay small.
+def contains_inline_image(value) -> bool:
+    if isinstance(value, str):
+        return value.startswith("data:")
+    if isinstance(value, dict):
+        return any(contains_inline_image(item) for item in value.values())
+    if isinstance(value, list):
+        return any(contains_inline_image(item) for item in value)
+    return False
+
+def reject_inline_images(value):
+    if contains_inline_image(value):
+        raise ValueError("inline images are not stored - send the blob store image_url instead")
+    return value
+
+NoInlineImages = AfterValidator(reject_inline_images)
+
 class QueenCellAnalysisCreate(BaseModel):
     hive_id: Optional[int] = None
     total_queen_cells: int = 0
@@ -63,7 +140,8 @@ class QueenCellAnalysisCreate(BaseModel):
     mature_count: int = 0
     open_count: int = 0
     recommendations: List[str] = []
-    cells_data: Optional[dict] = None
+    cells_data: Annotated[Optional[dict], NoInlineImages] = None
+    image_url: Annotated[Optional[str], NoInlineImages] = None
 
 class BroodAnalysisCreate(BaseModel):
     hive_id: Optional[int] = None
@@ -75,6 +153,7 @@ class BroodAnalysisCreate(BaseModel):
     health_status: str = ""
     brood_coverage: int = 0
     recommendations: List[str] = []
+    image_url: Annotated[Optional[str], NoInlineImages] = None
 
 class QueenCellLogCreate(BaseModel):
     hive_id: str
@@ -95,20 +174,269 @@ class BroodLogCreate(BaseModel):
     queen_spotted: bool = False
     notes: str = ""
 
+class SyncRecord(BaseModel):
+    client_id: UUID
+    type: str
+    captured_at: Optional[datetime] = None
+    data: dict
 
-# ==================== HELPER FUNCTIONS ====================
+class SyncBatch(BaseModel):
+    records: List[SyncRecord]
 
-def hash_password(password: str) -> str:
-    """Simple password hashing - use bcrypt in production!"""
-    return hashlib.sha256(password.encode()).hexdigest()
 
-def verify_password(password: str, hashed: str) -> bool:
-    return hash_password(password) == hashed
+# ==================== HELPER FUNCTIONS ====================
 
 def generate_token() -> str:
     return secrets.token_urlsafe(32)
 
 
+# ==================== PAGINATION ====================
+# Listing endpoints page by keyset: the X-Next-Cursor response header holds
+# the sort key of the last row, and passing it back as ?cursor= continues
+# strictly after that row via the (user_id, <sort key>) indexes in schema.sql.
+MAX_PAGE_SIZE = 100
+
+QUEEN_ANALYSIS_COLUMNS = (
+    "id", "user_id", "hive_id", "timestamp", "total_queen_cells", "capped_count", "semi_mature_count",
+    "mature_count", "open_count", "recommendations", "cells_data", "image_url", "created_at", "client_id"
+)
+BROOD_ANALYSIS_COLUMNS = (
+    "id", "user_id", "hive_id", "timestamp", "total_detections", "egg_count", "larva_count", "pupa_count",
+    "health_score", "health_status", "brood_coverage", "recommendations", "image_url", "created_at", "client_id"
+)
+QUEEN_LOG_COLUMNS = (
+    "id", "user_id", "hive_id", "observation_date", "estimated_hatch_date", "status", "days_old",
+    "queen_birthday", "queen_age", "notes", "created_at", "updated_at", "client_id"
+)
+BROOD_LOG_COLUMNS = (
+    "id", "user_id", "hive_id", "observation_date", "health_score", "brood_coverage", "egg_presence",
+    "larva_presence", "pupa_presence", "queen_spotted", "notes", "created_at", "updated_at", "client_id"
+)
+
+# Columns left out unless requested with ?fields=
+HEAVY_COLUMNS = {"cells_data"}
+
+ANALYSIS_KEYS = (("timestamp", datetime.fromisoformat), ("id", int))
+LOG_KEYS = (("observation_date", date.fromisoformat), ("created_at", datetime.fromisoformat), ("id", int))
+
+def select_columns(fields: Optional[str], columns: tuple, keys: tuple) -> List[str]:
+    """Columns for ?fields= (default: all but heavy ones); sort keys are always included"""
+    if fields:
+        requested = [field.strip() for field in fields.split(",") if field.strip()]
+        unknown = [field for field in requested if field not in columns]
+        if unknown:
+            raise HTTPException(status_code=400, detail=f"Unknown fields: {', '.join(unknown)}")
+    else:
+        requested = [column for column in columns if column not in HEAVY_COLUMNS]
+    
+    key_columns = [name for name, _ in keys]
+    return key_columns + [column for column in requested if column not in key_columns]
+
+def encode_cursor(row, keys: tuple) -> str:
+    values = [row[name].isoformat() if hasattr(row[name], "isoformat") else row[name] for name, _ in keys]
+    return base64.urlsafe_b64encode(json.dumps(values).encode()).decode().rstrip("=")
+
+def decode_cursor(cursor: str, keys: tuple) -> list:
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+        if len(values) != len(keys):
+            raise ValueError("wrong number of keys")
+        return [parse(value) for (_, parse), value in zip(keys, values)]
+    except (ValueError, TypeError) as e:
+        raise HTTPException(status_code=400, detail=f"Invalid cursor: {e}")
+
+def page_query(table: str, columns: List[str], keys: tuple, with_cursor: bool) -> str:
+    """SQL for one page: $1 user_id, then the cursor keys if any, then the limit"""
+    key_names = [name for name, _ in keys]
+    where = "user_id = $1"
+    if with_cursor:
+        placeholders = ", ".join(f"${i}" for i in range(2, 2 + len(keys)))
+        where += f" AND ({', '.join(key_names)}) < ({placeholders})"
+        # Implied by the row comparison, but spelled out so partitions newer
+        # than the cursor are pruned
+        where += f" AND {key_names[0]} <= $2"
+    
+    # Table and column names come from the constants above, never from user input
+    return f"""SELECT {', '.join(columns)} FROM {table}
+            WHERE {where}
+            ORDER BY {', '.join(f'{name} DESC' for name in key_names)}
+            LIMIT ${2 + len(keys) if with_cursor else 2}"""
+
+async def fetch_page(db, response: Response, table: str, columns: List[str], keys: tuple,
+                     user_id: int, cursor: Optional[str], limit: int) -> List[dict]:
+    """One page of a user's rows, newest first, setting X-Next-Cursor when more remain"""
+    limit = max(1, min(limit, MAX_PAGE_SIZE))
+    values = decode_cursor(cursor, keys) if cursor else []
+    rows = await db.fetch(page_query(table, columns, keys, bool(cursor)), user_id, *values, limit + 1)
+    
+    if len(rows) > limit:
+        rows = rows[:limit]
+        response.headers["X-Next-Cursor"] = encode_cursor(rows[-1], keys)
+    return [dict(row) for row in rows]
+
+
+# ==================== SESSIONS ====================
+# Requests authenticate with "Authorization: Bearer <token>". Validated tokens
+# are cached in-process for SESSION_CACHE_TTL seconds so repeat calls skip the
+# sessions lookup; logout drops the token here, and other workers stop
+# accepting it once their entry expires. SESSION_CACHE_TTL=0 disables caching.
+SESSION_CACHE_TTL = float(os.environ.get("SESSION_CACHE_TTL", "60"))
+SESSION_CACHE_SIZE = int(os.environ.get("SESSION_CACHE_SIZE", "10000"))
+
+SESSION_LOOKUP_QUERY = "SELECT user_id, expires_at FROM sessions WHERE token = $1 AND expires_at > NOW()"
+SESSION_SWEEP_QUERY = "DELETE FROM sessions WHERE expires_at <= NOW()"
+# expires_at is the partition key, so logout touches only the session's own partition
+SESSION_LOGOUT_QUERY = "DELETE FROM sessions WHERE token = $1 AND expires_at = $2"
+
+class SessionCache:
+    """LRU + TTL cache of token -> (user_id, expires_at), never outliving the session itself"""
+
+    def __init__(self, ttl, max_entries):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+
+    def get(self, token) -> Optional[Tuple[int, datetime]]:
+        entry = self._entries.get(token)
+        if entry is not None:
+            valid_until, user_id, expires_at = entry
+            if time.time() < valid_until:
+                self._entries.move_to_end(token)
+                self.hits += 1
+                return user_id, expires_at
+            del self._entries[token]
+        self.misses += 1
+        return None
+
+    def put(self, token, user_id, expires_at: datetime):
+        if self.ttl <= 0:
+            return
+        self._entries[token] = (min(time.time() + self.ttl, expires_at.timestamp()), user_id, expires_at)
+        self._entries.move_to_end(token)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def invalidate(self, token):
+        self._entries.pop(token, None)
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "ttl": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0
+        }
+
+session_cache = SessionCache(SESSION_CACHE_TTL, SESSION_CACHE_SIZE)
+
+async def current_session(authorization: Optional[str] = Header(None)) -> Tuple[str, int, datetime]:
+    """(token, user id, expires_at) of the bearer token; only touches the database on a cache miss"""
+    scheme, _, token = (authorization or "").partition(" ")
+    if scheme.lower() != "bearer" or not token:
+        raise HTTPException(status_code=401, detail="Missing bearer token", headers={"WWW-Authenticate": "Bearer"})
+    
+    cached = session_cache.get(token)
+    if cached is not None:
+        return (token, *cached)
+    
+    try:
+        async with pool.acquire(timeout=DB_ACQUIRE_TIMEOUT) as db:
+            session = await db.fetchrow(SESSION_LOOKUP_QUERY, token)
+    except asyncio.TimeoutError:
+        raise HTTPException(status_code=503, detail="Database busy, please retry")
+    if not session:
+        raise HTTPException(status_code=401, detail="Invalid or expired token", headers={"WWW-Authenticate": "Bearer"})
+    
+    session_cache.put(token, session['user_id'], session['expires_at'])
+    return token, session['user_id'], session['expires_at']
+
+async def current_user(session: Tuple[str, int, datetime] = Depends(current_session)) -> int:
+    """User id of the bearer token"""
+    return session[1]
+
+async def path_user(user_id: int, current: int = Depends(current_user)) -> int:
+    """The {user_id} in the path, which must be the caller's own"""
+    if user_id != current:
+        raise HTTPException(status_code=403, detail="Not allowed to access another user's data")
+    return user_id
+
+async def create_session(db, user_id: int) -> str:
+    token = generate_token()
+    session = await db.fetchrow(
+        """INSERT INTO sessions (user_id, token, expires_at) 
+           VALUES ($1, $2, NOW() + INTERVAL '7 days') RETURNING expires_at""",
+        user_id, token
+    )
+    session_cache.put(token, user_id, session['expires_at'])
+    return token
+
+
+# ==================== MAINTENANCE ====================
+# Runs at startup and then every MAINTENANCE_INTERVAL seconds (0: startup
+# only): creates the next PARTITION_MONTHS_AHEAD monthly partitions, expires
+# old ones under the retention policy and sweeps expired sessions. Only one
+# worker does the work at a time (advisory lock).
+MAINTENANCE_INTERVAL = float(os.environ.get("MAINTENANCE_INTERVAL", "3600"))
+PARTITION_MONTHS_AHEAD = int(os.environ.get("PARTITION_MONTHS_AHEAD", "1"))
+# Months of analyses to keep besides the current one (0: keep everything).
+# user_stats totals and hive trends are rollups and keep the full history.
+ANALYSIS_RETENTION_MONTHS = int(os.environ.get("ANALYSIS_RETENTION_MONTHS", "0"))
+# "archive" detaches old partitions into the archive schema, "drop" deletes them
+ANALYSIS_RETENTION_ACTION = os.environ.get("ANALYSIS_RETENTION_ACTION", "archive")
+MAINTENANCE_LOCK_CLASS = 2  # first key of the maintenance advisory lock
+
+# Partitioned table -> months kept besides the current one (None: keep all).
+# A sessions partition goes as soon as its month is over: all of it expired.
+PARTITIONED_TABLES = {
+    "queen_cell_analyses": ANALYSIS_RETENTION_MONTHS or None,
+    "brood_analyses": ANALYSIS_RETENTION_MONTHS or None,
+    "sessions": 0,
+}
+
+maintenance_task: Optional[asyncio.Task] = None
+maintenance_stats = {"runs": 0, "partitions_created": 0, "partitions_expired": 0, "sessions_swept": 0, "last_error": None}
+
+async def maintain_partitions(db) -> None:
+    """One maintenance pass (see schema.sql for the partition functions)"""
+    async with db.transaction():
+        await db.execute("SELECT pg_advisory_xact_lock($1, 0)", MAINTENANCE_LOCK_CLASS)
+        for table, keep_months in PARTITIONED_TABLES.items():
+            maintenance_stats["partitions_created"] += await db.fetchval(
+                "SELECT create_monthly_partitions($1, NOW(), NOW() + make_interval(months => $2))",
+                table, PARTITION_MONTHS_AHEAD
+            )
+            if keep_months is not None:
+                archive = table != "sessions" and ANALYSIS_RETENTION_ACTION == "archive"
+                maintenance_stats["partitions_expired"] += await db.fetchval(
+                    "SELECT expire_monthly_partitions($1, $2, $3)", table, keep_months, archive
+                )
+        status = await db.execute(SESSION_SWEEP_QUERY)
+        maintenance_stats["sessions_swept"] += int(status.split()[-1])
+
+async def run_maintenance():
+    while True:
+        try:
+            async with pool.acquire(timeout=DB_ACQUIRE_TIMEOUT) as db:
+                await maintain_partitions(db)
+            maintenance_stats["runs"] += 1
+            maintenance_stats["last_error"] = None
+        except (asyncio.TimeoutError, asyncpg.PostgresError, OSError) as e:
+            maintenance_stats["last_error"] = str(e)
+            print(f"Database maintenance failed: {e}")
+        if MAINTENANCE_INTERVAL <= 0:
+            return
+        await asyncio.sleep(MAINTENANCE_INTERVAL)
+
+@app.on_event("startup")
+async def start_maintenance():
+    global maintenance_task
+    maintenance_task = asyncio.create_task(run_maintenance())
+
+
 # ==================== AUTH ENDPOINTS ====================
 
 @app.post("/api/auth/signup", response_model=dict)
@@ -120,7 +448,7 @@ async def signup(user: UserCreate, db=Depends(get_db)):
         raise HTTPException(status_code=400, detail="Email already registered")
     
     # Create user
-    password_hash = hash_password(user.password)
+    password_hash = await passwords.hash_password(user.password)
     result = await db.fetchrow(
         """INSERT INTO users (email, name, password_hash) 
            VALUES ($1, $2, $3) RETURNING id, email, name, created_at""",
@@ -128,12 +456,7 @@ async def signup(user: UserCreate, db=Depends(get_db)):
     )
     
     # Create session token
-    token = generate_token()
-    await db.execute(
-        """INSERT INTO sessions (user_id, token, expires_at) 
-           VALUES ($1, $2, NOW() + INTERVAL '7 days')""",
-        result['id'], token
-    )
+    token = await create_session(db, result['id'])
     
     return {
         "user": dict(result),
@@ -149,16 +472,19 @@ async def login(credentials: UserLogin, db=Depends(get_db)):
         credentials.email
     )
     
-    if not user or not verify_password(credentials.password, user['password_hash']):
+    stored_hash = user['password_hash'] if user else passwords.DUMMY_HASH
+    if not await passwords.verify_password(credentials.password, stored_hash) or not user:
         raise HTTPException(status_code=401, detail="Invalid email or password")
     
+    # Upgrade legacy SHA-256 hashes (and old cost settings) now that we have the password
+    if passwords.needs_rehash(stored_hash):
+        await db.execute(
+            "UPDATE users SET password_hash = $1, updated_at = NOW() WHERE id = $2",
+            await passwords.hash_password(credentials.password), user['id']
+        )
+    
     # Create new session
-    token = generate_token()
-    await db.execute(
-        """INSERT INTO sessions (user_id, token, expires_at) 
-           VALUES ($1, $2, NOW() + INTERVAL '7 days')""",
-        user['id'], token
-    )
+    token = await create_session(db, user['id'])
     
     return {
         "user": {
@@ -172,40 +498,39 @@ async def login(credentials: UserLogin, db=Depends(get_db)):
     }
 
 @app.post("/api/auth/logout")
-async def logout(token: str, db=Depends(get_db)):
-    """Logout user - invalidate token"""
-    await db.execute("DELETE FROM sessions WHERE token = $1", token)
+async def logout(session: Tuple[str, int, datetime] = Depends(current_session), db=Depends(get_db)):
+    """Logout user - invalidate the bearer token"""
+    token, _, expires_at = session
+    await db.execute(SESSION_LOGOUT_QUERY, token, expires_at)
+    session_cache.invalidate(token)
     return {"message": "Logged out successfully"}
 
 
 # ==================== QUEEN CELL ANALYSES ====================
 
 @app.post("/api/queen-analyses")
-async def create_queen_analysis(analysis: QueenCellAnalysisCreate, user_id: int, db=Depends(get_db)):
+async def create_queen_analysis(analysis: QueenCellAnalysisCreate, user_id: int = Depends(current_user), db=Depends(get_db)):
     """Save a queen cell analysis result"""
     result = await db.fetchrow(
         """INSERT INTO queen_cell_analyses 
-           (user_id, hive_id, total_queen_cells, capped_count, semi_mature_count, mature_count, open_count, recommendations, cells_data)
-           VALUES ($1, $2, $3, $4, $5, $6, $7, $8, $9)
+           (user_id, hive_id, total_queen_cells, capped_count, semi_mature_count, mature_count, open_count, recommendations, cells_data, image_url)
+           VALUES ($1, $2, $3, $4, $5, $6, $7, $8, $9, $10)
            RETURNING id, timestamp""",
         user_id, analysis.hive_id, analysis.total_queen_cells,
         analysis.capped_count, analysis.semi_mature_count, analysis.mature_count, analysis.open_count,
-        analysis.recommendations, analysis.cells_data
+        analysis.recommendations, analysis.cells_data, analysis.image_url
     )
     return {"id": result['id'], "timestamp": result['timestamp'].isoformat()}
 
 @app.get("/api/queen-analyses/{user_id}")
-async def get_queen_analyses(user_id: int, limit: int = 20, db=Depends(get_db)):
-    """Get user's queen cell analyses"""
-    rows = await db.fetch(
-        """SELECT * FROM queen_cell_analyses 
-           WHERE user_id = $1 ORDER BY timestamp DESC LIMIT $2""",
-        user_id, limit
-    )
-    return [dict(row) for row in rows]
+async def get_queen_analyses(response: Response, user_id: int = Depends(path_user), limit: int = 20, cursor: Optional[str] = None,
+                             fields: Optional[str] = None, db=Depends(get_db)):
+    """Get user's queen cell analyses (cells_data only when listed in fields)"""
+    columns = select_columns(fields, QUEEN_ANALYSIS_COLUMNS, ANALYSIS_KEYS)
+    return await fetch_page(db, response, "queen_cell_analyses", columns, ANALYSIS_KEYS, user_id, cursor, limit)
 
 @app.delete("/api/queen-analyses/{analysis_id}")
-async def delete_queen_analysis(analysis_id: int, user_id: int, db=Depends(get_db)):
+async def delete_queen_analysis(analysis_id: int, user_id: int = Depends(current_user), db=Depends(get_db)):
     """Delete a queen cell analysis"""
     await db.execute(
         "DELETE FROM queen_cell_analyses WHERE id = $1 AND user_id = $2",
@@ -217,35 +542,32 @@ async def delete_queen_analysis(analysis_id: int, user_id: int, db=Depends(get_d
 # ==================== BROOD ANALYSES ====================
 
 @app.post("/api/brood-analyses")
-async def create_brood_analysis(analysis: BroodAnalysisCreate, user_id: int, db=Depends(get_db)):
+async def create_brood_analysis(analysis: BroodAnalysisCreate, user_id: int = Depends(current_user), db=Depends(get_db)):
     """Save a brood analysis result"""
     result = await db.fetchrow(
         """INSERT INTO brood_analyses 
-           (user_id, hive_id, total_detections, egg_count, larva_count, pupa_count, health_score, health_status, brood_coverage, recommendations)
-           VALUES ($1, $2, $3, $4, $5, $6, $7, $8, $9, $10)
+           (user_id, hive_id, total_detections, egg_count, larva_count, pupa_count, health_score, health_status, brood_coverage, recommendations, image_url)
+           VALUES ($1, $2, $3, $4, $5, $6, $7, $8, $9, $10, $11)
            RETURNING id, timestamp""",
         user_id, analysis.hive_id, analysis.total_detections,
         analysis.egg_count, analysis.larva_count, analysis.pupa_count,
         analysis.health_score, analysis.health_status, analysis.brood_coverage,
-        analysis.recommendations
+        analysis.recommendations, analysis.image_url
     )
     return {"id": result['id'], "timestamp": result['timestamp'].isoformat()}
 
 @app.get("/api/brood-analyses/{user_id}")
-async def get_brood_analyses(user_id: int, limit: int = 20, db=Depends(get_db)):
+async def get_brood_analyses(response: Response, user_id: int = Depends(path_user), limit: int = 20, cursor: Optional[str] = None,
+                             fields: Optional[str] = None, db=Depends(get_db)):
     """Get user's brood analyses"""
-    rows = await db.fetch(
-        """SELECT * FROM brood_analyses 
-           WHERE user_id = $1 ORDER BY timestamp DESC LIMIT $2""",
-        user_id, limit
-    )
-    return [dict(row) for row in rows]
+    columns = select_columns(fields, BROOD_ANALYSIS_COLUMNS, ANALYSIS_KEYS)
+    return await fetch_page(db, response, "brood_analyses", columns, ANALYSIS_KEYS, user_id, cursor, limit)
 
 
 # ==================== QUEEN CELL LOGS (Manual) ====================
 
 @app.post("/api/queen-logs")
-async def create_queen_log(log: QueenCellLogCreate, user_id: int, db=Depends(get_db)):
+async def create_queen_log(log: QueenCellLogCreate, user_id: int = Depends(current_user), db=Depends(get_db)):
     """Create a manual queen cell log entry"""
     result = await db.fetchrow(
         """INSERT INTO queen_cell_logs 
@@ -258,17 +580,14 @@ async def create_queen_log(log: QueenCellLogCreate, user_id: int, db=Depends(get
     return {"id": result['id'], "created_at": result['created_at'].isoformat()}
 
 @app.get("/api/queen-logs/{user_id}")
-async def get_queen_logs(user_id: int, limit: int = 50, db=Depends(get_db)):
+async def get_queen_logs(response: Response, user_id: int = Depends(path_user), limit: int = 50, cursor: Optional[str] = None,
+                         fields: Optional[str] = None, db=Depends(get_db)):
     """Get user's queen cell logs"""
-    rows = await db.fetch(
-        """SELECT * FROM queen_cell_logs 
-           WHERE user_id = $1 ORDER BY observation_date DESC, created_at DESC LIMIT $2""",
-        user_id, limit
-    )
-    return [dict(row) for row in rows]
+    columns = select_columns(fields, QUEEN_LOG_COLUMNS, LOG_KEYS)
+    return await fetch_page(db, response, "queen_cell_logs", columns, LOG_KEYS, user_id, cursor, limit)
 
 @app.delete("/api/queen-logs/{log_id}")
-async def delete_queen_log(log_id: int, user_id: int, db=Depends(get_db)):
+async def delete_queen_log(log_id: int, user_id: int = Depends(current_user), db=Depends(get_db)):
     """Delete a queen cell log"""
     await db.execute(
         "DELETE FROM queen_cell_logs WHERE id = $1 AND user_id = $2",
@@ -280,7 +599,7 @@ async def delete_queen_log(log_id: int, user_id: int, db=Depends(get_db)):
 # ==================== BROOD LOGS (Manual) ====================
 
 @app.post("/api/brood-logs")
-async def create_brood_log(log: BroodLogCreate, user_id: int, db=Depends(get_db)):
+async def create_brood_log(log: BroodLogCreate, user_id: int = Depends(current_user), db=Depends(get_db)):
     """Create a manual brood log entry"""
     result = await db.fetchrow(
         """INSERT INTO brood_logs 
@@ -295,60 +614,276 @@ async def create_brood_log(log: BroodLogCreate, user_id: int, db=Depends(get_db)
     return {"id": result['id'], "created_at": result['created_at'].isoformat()}
 
 @app.get("/api/brood-logs/{user_id}")
-async def get_brood_logs(user_id: int, limit: int = 50, db=Depends(get_db)):
+async def get_brood_logs(response: Response, user_id: int = Depends(path_user), limit: int = 50, cursor: Optional[str] = None,
+                         fields: Optional[str] = None, db=Depends(get_db)):
     """Get user's brood logs"""
-    rows = await db.fetch(
-        """SELECT * FROM brood_logs 
-           WHERE user_id = $1 ORDER BY observation_date DESC, created_at DESC LIMIT $2""",
-        user_id, limit
+    columns = select_columns(fields, BROOD_LOG_COLUMNS, LOG_KEYS)
+    return await fetch_page(db, response, "brood_logs", columns, LOG_KEYS, user_id, cursor, limit)
+
+
+# ==================== OFFLINE SYNC ====================
+# Devices capture analyses and logs offline and upload them in one batch.
+# Every record carries a client-generated UUID, unique per user and table
+# (see schema.sql), so a retried upload reports the rows it already wrote
+# instead of inserting them twice.
+SYNC_MAX_RECORDS = int(os.environ.get("SYNC_MAX_RECORDS", "500"))
+SYNC_LOCK_CLASS = 1  # first key of the per-user advisory lock
+
+# Record type -> (table, model, column holding the capture time, JSONB columns)
+SYNC_TABLES = {
+    "queen_analysis": ("queen_cell_analyses", QueenCellAnalysisCreate, "timestamp", {"cells_data"}),
+    "brood_analysis": ("brood_analyses", BroodAnalysisCreate, "timestamp", set()),
+    "queen_log": ("queen_cell_logs", QueenCellLogCreate, "created_at", set()),
+    "brood_log": ("brood_logs", BroodLogCreate, "created_at", set()),
+}
+
+SYNC_EXISTING_QUERY = "SELECT client_id, id FROM {table} WHERE user_id = $1 AND client_id = ANY($2::uuid[])"
+
+# Whether any monthly partition of $1 covering $2..$3 is missing (same naming as create_monthly_partitions)
+PARTITIONS_MISSING_QUERY = """
+    SELECT EXISTS (
+        SELECT 1 FROM generate_series(date_trunc('month', $2::timestamptz AT TIME ZONE 'UTC'),
+                                      $3::timestamptz AT TIME ZONE 'UTC', INTERVAL '1 month') AS month
+        WHERE to_regclass(format('%s_p%s', $1::text, to_char(month, 'YYYYMM'))) IS NULL
+    )"""
+
+def sync_columns(kind: str) -> List[str]:
+    table, model, time_column, _ = SYNC_TABLES[kind]
+    return ["user_id", "client_id", time_column] + list(model.model_fields)
+
+async def partitions_missing(db, pending: dict) -> bool:
+    """Whether writing the pending records needs a partition that doesn't exist yet"""
+    for kind, rows in pending.items():
+        table = SYNC_TABLES[kind][0]
+        if rows and table in PARTITIONED_TABLES:
+            captured = [values[2] for values in rows.values()]
+            if await db.fetchval(PARTITIONS_MISSING_QUERY, table, min(captured), max(captured)):
+                return True
+    return False
+
+async def sync_table(db, kind: str, user_id: int, pending: dict) -> dict:
+    """Write one table's new records; returns client_id -> (status, row id)"""
+    table, _, _, json_columns = SYNC_TABLES[kind]
+    columns = sync_columns(kind)
+    
+    existing = await db.fetch(SYNC_EXISTING_QUERY.format(table=table), user_id, list(pending))
+    outcome = {str(row['client_id']): ("exists", row['id']) for row in existing}
+    new = [values for client_id, values in pending.items() if client_id not in outcome]
+    if not new:
+        return outcome
+    
+    # Offline captures can be older than any partition made by maintenance
+    # (sync_records holds the maintenance lock whenever one is missing)
+    if table in PARTITIONED_TABLES:
+        captured = [values[2] for values in new]
+        await db.execute("SELECT create_monthly_partitions($1, $2, $3)", table, min(captured), max(captured))
+    
+    # COPY into a staging table and insert from it to get the new ids back.
+    # JSONB goes through COPY as text and is cast back on insert.
+    staging = f"sync_{table}"
+    await db.execute(
+        f"""CREATE TEMP TABLE {staging} ON COMMIT DROP AS
+            SELECT {', '.join(f'{c}::text AS {c}' if c in json_columns else c for c in columns)}
+            FROM {table} WITH NO DATA"""
     )
-    return [dict(row) for row in rows]
+    await db.copy_records_to_table(staging, records=new, columns=columns)
+    inserted = await db.fetch(
+        f"""INSERT INTO {table} ({', '.join(columns)})
+            SELECT {', '.join(f'{c}::jsonb' if c in json_columns else c for c in columns)} FROM {staging}
+            RETURNING client_id, id"""
+    )
+    outcome.update({str(row['client_id']): ("created", row['id']) for row in inserted})
+    return outcome
+
+@app.post("/api/sync")
+async def sync_records(batch: SyncBatch, user_id: int = Depends(current_user), db=Depends(get_db)):
+    """Bulk-write offline records in one transaction, with a status per record"""
+    if len(batch.records) > SYNC_MAX_RECORDS:
+        raise HTTPException(status_code=413, detail=f"At most {SYNC_MAX_RECORDS} records per sync")
+    
+    results: List[Optional[dict]] = [None] * len(batch.records)
+    first_seen = {}  # client_id -> (index, type) of its first record in the batch
+    pending = {kind: {} for kind in SYNC_TABLES}  # type -> client_id -> COPY row
+    received_at = datetime.now(timezone.utc)
+    
+    for i, record in enumerate(batch.records):
+        client_id = str(record.client_id)
+        if client_id in first_seen:
+            if first_seen[client_id][1] != record.type:
+                results[i] = {"client_id": client_id, "status": "invalid", "error": "client_id reused for another record type"}
+            continue
+        first_seen[client_id] = (i, record.type)
+        
+        if record.type not in SYNC_TABLES:
+            results[i] = {"client_id": client_id, "status": "invalid", "error": f"Unknown record type: {record.type}"}
+            continue
+        _, model, _, json_columns = SYNC_TABLES[record.type]
+        try:
+            fields = model.model_validate(record.data).model_dump()
+        except ValidationError as e:
+            errors = "; ".join(f"{'.'.join(map(str, err['loc']))}: {err['msg']}" for err in e.errors())
+            results[i] = {"client_id": client_id, "status": "invalid", "error": errors}
+            continue
+        
+        values = [json.dumps(value) if name in json_columns and value is not None else value
+                  for name, value in fields.items()]
+        # Device clocks drift; a capture time can't be later than its upload
+        captured_at = record.captured_at or received_at
+        if captured_at.tzinfo is None:
+            captured_at = captured_at.replace(tzinfo=timezone.utc)
+        captured_at = min(captured_at, received_at)
+        pending[record.type][client_id] = (user_id, record.client_id, captured_at, *values)
+    
+    async with db.transaction():
+        # One sync per user at a time, so the already-uploaded lookup can't
+        # miss rows a concurrent retry of the same batch is writing
+        await db.execute("SELECT pg_advisory_xact_lock($1, $2)", SYNC_LOCK_CLASS, user_id)
+        # Creating a partition takes the maintenance lock, so concurrent syncs
+        # and maintenance don't race on CREATE TABLE ... PARTITION OF for the
+        # same month. It is taken before any table is touched: a sync reading
+        # the parent would otherwise block a maintenance pass waiting to
+        # detach a partition while waiting on its lock (deadlock).
+        if await partitions_missing(db, pending):
+            await db.execute("SELECT pg_advisory_xact_lock($1, 0)", MAINTENANCE_LOCK_CLASS)
+        outcomes = {}
+        for kind, rows in pending.items():
+            if rows:
+                outcomes.update(await sync_table(db, kind, user_id, rows))
+    
+    for i, record in enumerate(batch.records):
+        client_id = str(record.client_id)
+        if results[i] is None and client_id in outcomes:
+            status, row_id = outcomes[client_id]
+            if first_seen[client_id][0] != i:
+                status = "duplicate"
+            results[i] = {"client_id": client_id, "status": status, "id": row_id}
+        elif results[i] is None:
+            # Repeat of a record that was rejected: report the same error
+            results[i] = results[first_seen[client_id][0]]
+    
+    summary = {}
+    for result in results:
+        summary[result["status"]] = summary.get(result["status"], 0) + 1
+    return {"results": results, "summary": summary}
 
 
 # ==================== STATS & DASHBOARD ====================
 
+# user_stats is maintained by triggers on the analyses tables (see schema.sql).
+# Joining on timestamp too lets each latest-row lookup prune to one partition.
+USER_STATS_QUERY = """SELECT s.queen_analysis_count, s.brood_analysis_count,
+              s.total_queen_cells, s.total_brood_cells,
+              s.health_score_sum, s.health_score_count,
+              to_jsonb(q) AS latest_queen, to_jsonb(b) AS latest_brood
+       FROM user_stats s
+       LEFT JOIN queen_cell_analyses q ON q.id = s.latest_queen_analysis_id AND q.timestamp = s.latest_queen_analysis_at
+       LEFT JOIN brood_analyses b ON b.id = s.latest_brood_analysis_id AND b.timestamp = s.latest_brood_analysis_at
+       WHERE s.user_id = $1"""
+
 @app.get("/api/stats/{user_id}")
-async def get_user_stats(user_id: int, db=Depends(get_db)):
+async def get_user_stats(user_id: int = Depends(path_user), db=Depends(get_db)):
     """Get user's overall statistics for dashboard"""
     
-    # Total analyses
-    queen_count = await db.fetchval(
-        "SELECT COUNT(*) FROM queen_cell_analyses WHERE user_id = $1", user_id
-    )
-    brood_count = await db.fetchval(
-        "SELECT COUNT(*) FROM brood_analyses WHERE user_id = $1", user_id
-    )
+    stats = await db.fetchrow(USER_STATS_QUERY, user_id)
     
-    # Total queen cells detected
-    total_queen_cells = await db.fetchval(
-        "SELECT COALESCE(SUM(total_queen_cells), 0) FROM queen_cell_analyses WHERE user_id = $1", user_id
-    )
+    if not stats:
+        return {
+            "total_inspections": 0,
+            "total_queen_cells": 0,
+            "total_brood_cells": 0,
+            "avg_health_score": 0,
+            "latest_queen_analysis": None,
+            "latest_brood_analysis": None
+        }
     
-    # Total brood cells detected
-    total_brood_cells = await db.fetchval(
-        "SELECT COALESCE(SUM(total_detections), 0) FROM brood_analyses WHERE user_id = $1", user_id
-    )
+    avg_health = stats['health_score_sum'] / stats['health_score_count'] if stats['health_score_count'] else 0
     
-    # Average health score
-    avg_health = await db.fetchval(
-        "SELECT COALESCE(AVG(health_score), 0) FROM brood_analyses WHERE user_id = $1", user_id
+    return {
+        "total_inspections": stats['queen_analysis_count'] + stats['brood_analysis_count'],
+        "total_queen_cells": stats['total_queen_cells'],
+        "total_brood_cells": stats['total_brood_cells'],
+        "avg_health_score": round(avg_health),
+        "latest_queen_analysis": stats['latest_queen'],
+        "latest_brood_analysis": stats['latest_brood']
+    }
+
+
+# ==================== HIVE TRENDS ====================
+# Served from hive_daily_rollups (see schema.sql): per-hive daily sums kept
+# by triggers, grouped here into buckets, so the query reads at most one row
+# per day in the range whatever the number of analyses.
+TREND_BUCKETS = ("day", "week", "month")
+TREND_MAX_DAYS = int(os.environ.get("TREND_MAX_DAYS", str(3 * 366)))
+
+# Metric -> (sum column, count column); values are averages per inspection
+TREND_METRICS = {
+    "health_score": ("health_score_sum", "health_score_count"),
+    "brood_coverage": ("brood_coverage_sum", "brood_inspections"),
+    "total_detections": ("total_detections_sum", "brood_inspections"),
+    "egg_count": ("egg_sum", "brood_inspections"),
+    "larva_count": ("larva_sum", "brood_inspections"),
+    "pupa_count": ("pupa_sum", "brood_inspections"),
+    "total_queen_cells": ("queen_cells_sum", "queen_inspections"),
+    "capped_count": ("capped_sum", "queen_inspections"),
+    "semi_mature_count": ("semi_mature_sum", "queen_inspections"),
+    "mature_count": ("mature_sum", "queen_inspections"),
+    "open_count": ("open_sum", "queen_inspections"),
+}
+
+def trend_query(metrics: List[str]) -> str:
+    """SQL for bucketed trends: $1 hive_id, $2 bucket, $3 since, $4 until"""
+    # Column names come from TREND_METRICS, never from user input
+    sums = ", ".join(
+        f"SUM({TREND_METRICS[m][0]}) AS {m}_sum, SUM({TREND_METRICS[m][1]}) AS {m}_n" for m in metrics
     )
+    return f"""SELECT date_trunc($2, day::timestamp)::date AS bucket,
+                  SUM(brood_inspections) AS brood_inspections, SUM(queen_inspections) AS queen_inspections,
+                  {sums}
+           FROM hive_daily_rollups
+           WHERE hive_id = $1 AND day BETWEEN $3 AND $4
+           GROUP BY 1
+           ORDER BY 1"""
+
+@app.get("/api/hives/{hive_id}/trends")
+async def get_hive_trends(hive_id: int, metric: str = "health_score", bucket: str = "week",
+                          since: Optional[date] = None, until: Optional[date] = None,
+                          user_id: int = Depends(current_user), db=Depends(get_db)):
+    """Per-bucket averages of one or more metrics (comma-separated) for a hive"""
+    metrics = [m.strip() for m in metric.split(",") if m.strip()]
+    unknown = [m for m in metrics if m not in TREND_METRICS]
+    if not metrics or unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown metrics: {', '.join(unknown)}. Available: {', '.join(TREND_METRICS)}")
+    if bucket not in TREND_BUCKETS:
+        raise HTTPException(status_code=400, detail=f"bucket must be one of: {', '.join(TREND_BUCKETS)}")
     
-    # Latest activity
-    latest_queen = await db.fetchrow(
-        "SELECT * FROM queen_cell_analyses WHERE user_id = $1 ORDER BY timestamp DESC LIMIT 1", user_id
-    )
-    latest_brood = await db.fetchrow(
-        "SELECT * FROM brood_analyses WHERE user_id = $1 ORDER BY timestamp DESC LIMIT 1", user_id
-    )
+    until = until or datetime.now(timezone.utc).date()
+    since = since or until - timedelta(days=365)
+    if since > until or (until - since).days > TREND_MAX_DAYS:
+        raise HTTPException(status_code=400, detail=f"since must be before until and at most {TREND_MAX_DAYS} days earlier")
+    
+    owner = await db.fetchval("SELECT user_id FROM hives WHERE id = $1", hive_id)
+    if owner != user_id:
+        raise HTTPException(status_code=404, detail="Hive not found")
+    
+    rows = await db.fetch(trend_query(metrics), hive_id, bucket, since, until)
+    points = []
+    for row in rows:
+        point = {
+            "bucket": row['bucket'].isoformat(),
+            "brood_inspections": row['brood_inspections'],
+            "queen_inspections": row['queen_inspections']
+        }
+        for m in metrics:
+            point[m] = round(row[f"{m}_sum"] / row[f"{m}_n"], 2) if row[f"{m}_n"] else None
+        points.append(point)
     
     return {
-        "total_inspections": queen_count + brood_count,
-        "total_queen_cells": total_queen_cells,
-        "total_brood_cells": total_brood_cells,
-        "avg_health_score": round(avg_health),
-        "latest_queen_analysis": dict(latest_queen) if latest_queen else None,
-        "latest_brood_analysis": dict(latest_brood) if latest_brood else None
+        "hive_id": hive_id,
+        "bucket": bucket,
+        "since": since.isoformat(),
+        "until": until.isoformat(),
+        "metrics": metrics,
+        "points": points
     }
 
 
@@ -359,12 +894,15 @@ async def root():
     return {"status": "ok", "service": "iBrood Database API", "version": "1.0.0"}
 
 @app.get("/health")
-async def health_check(db=Depends(get_db)):
+async def health_check():
     try:
-        await db.fetchval("SELECT 1")
-        return {"status": "healthy", "database": "connected"}
+        async with pool.acquire(timeout=DB_ACQUIRE_TIMEOUT) as db:
+            await db.fetchval("SELECT 1")
+        return {"status": "healthy", "database": "connected", "pool": pool_stats(),
+                "session_cache": session_cache.stats(), "maintenance": maintenance_stats}
     except Exception as e:
-        return {"status": "unhealthy", "error": str(e)}
+        return {"status": "unhealthy", "error": str(e), "pool": pool_stats(),
+                "session_cache": session_cache.stats(), "maintenance": maintenance_stats}
 
 
 if __name__ == "__main__":
@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+"""
+Auth Benchmark Tool
+Starts the API twice against a scratch database, once with the session token
+cache and once without (SESSION_CACHE_TTL=0), and compares the latency of
+authenticated requests
+
+Usage:
+    TEST_DATABASE_URL=postgresql://localhost/ibrood_test python benchmark-auth.py [--requests 2000] [--concurrency 8]
+
+Requires schema.sql to be applied to the test database. The throwaway user
+created for the run is deleted at the end.
+"""
+
+import os
+import sys
+import json
+import time
+import asyncio
+import secrets
+import argparse
+import statistics
+import subprocess
+import http.client
+from concurrent.futures import ThreadPoolExecutor
+import asyncpg
+
+DATABASE_DIR = os.path.dirname(os.path.abspath(__file__))
+PORT = 8011
+
+def request(conn, method, path, body=None, token=None):
+    headers = {"Content-Type": "application/json"}
+    if token:
+        headers["Authorization"] = f"Bearer {token}"
+    conn.request(method, path, body=json.dumps(body) if body is not None else None, headers=headers)
+    response = conn.getresponse()
+    data = response.read()
+    if response.status >= 400:
+        raise RuntimeError(f"{method} {path} -> {response.status}: {data[:200]}")
+    return json.loads(data)
+
+def start_server(database_url, cache_ttl):
+    env = dict(os.environ, DATABASE_URL=database_url, SESSION_CACHE_TTL=str(cache_ttl), MAINTENANCE_INTERVAL="0")
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "api:app", "--port", str(PORT), "--log-level", "warning"],
+        cwd=DATABASE_DIR, env=env
+    )
+    for _ in range(100):
+        try:
+            request(http.client.HTTPConnection("127.0.0.1", PORT), "GET", "/health")
+            return server
+        except (OSError, RuntimeError):
+            time.sleep(0.1)
+    server.terminate()
+    raise RuntimeError("API did not start")
+
+def run(path, token, total, concurrency):
+    """Latencies (ms) of `total` authenticated GETs spread over `concurrency` connections"""
+    def worker(count):
+        conn = http.client.HTTPConnection("127.0.0.1", PORT)
+        latencies = []
+        for _ in range(count):
+            start = time.perf_counter()
+            request(conn, "GET", path, token=token)
+            latencies.append((time.perf_counter() - start) * 1000)
+        conn.close()
+        return latencies
+
+    per_worker = [total // concurrency + (i < total % concurrency) for i in range(concurrency)]
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        latencies = [ms for chunk in executor.map(worker, per_worker) for ms in chunk]
+    return latencies, time.perf_counter() - start
+
+def benchmark(database_url, email, cache_ttl, args):
+    server = start_server(database_url, cache_ttl)
+    try:
+        conn = http.client.HTTPConnection("127.0.0.1", PORT)
+        try:
+            session = request(conn, "POST", "/api/auth/signup", {"email": email, "name": "Benchmark", "password": "benchmark"})
+        except RuntimeError:
+            session = request(conn, "POST", "/api/auth/login", {"email": email, "password": "benchmark"})
+        path = f"/api/stats/{session['user']['id']}"
+
+        run(path, session["token"], 50, 1)  # warm-up
+        latencies, elapsed = run(path, session["token"], args.requests, args.concurrency)
+        cache = request(conn, "GET", "/health")["session_cache"]
+    finally:
+        server.terminate()
+        server.wait()
+
+    latencies.sort()
+    return {
+        "mean_ms": statistics.mean(latencies),
+        "p50_ms": latencies[len(latencies) // 2],
+        "p95_ms": latencies[int(len(latencies) * 0.95)],
+        "rps": len(latencies) / elapsed,
+        "hit_rate": cache["hit_rate"],
+    }
+
+async def delete_user(database_url, email):
+    conn = await asyncpg.connect(database_url)
+    try:
+        await conn.execute("DELETE FROM users WHERE email = $1", email)
+    finally:
+        await conn.close()
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark authenticated requests with and without the session cache")
+    parser.add_argument('--requests', type=int, default=2000, help="Authenticated requests per run")
+    parser.add_argument('--concurrency', type=int, default=8, help="Parallel client connections")
+    args = parser.parse_args()
+
+    database_url = os.environ.get("TEST_DATABASE_URL")
+    if not database_url:
+        print("Set TEST_DATABASE_URL to a scratch Postgres database")
+        sys.exit(2)
+
+    email = f"auth-benchmark-{secrets.token_hex(4)}@ibrood.test"
+    print(f"{args.requests} GET /api/stats requests over {args.concurrency} connection(s)")
+    try:
+        results = {
+            "cached": benchmark(database_url, email, 60, args),
+            "uncached": benchmark(database_url, email, 0, args),
+        }
+    finally:
+        asyncio.run(delete_user(database_url, email))
+
+    print("-" * 70)
+    print(f"{'':10} | {'mean ms':>8} | {'p50 ms':>8} | {'p95 ms':>8} | {'req/s':>8} | {'hit rate':>8}")
+    for label, stats in results.items():
+        print(f"{label:10} | {stats['mean_ms']:8.2f} | {stats['p50_ms']:8.2f} | {stats['p95_ms']:8.2f} | "
+              f"{stats['rps']:8.0f} | {stats['hit_rate']:8.1%}")
+    print("-" * 70)
+    saved = results["uncached"]["mean_ms"] - results["cached"]["mean_ms"]
+    print(f"Cache saves {saved:.2f} ms per request ({saved / results['uncached']['mean_ms']:.0%})")
+
+if __name__ == "__main__":
+    main()
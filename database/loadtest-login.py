@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+"""
+Login Load Test
+Runs bursts of concurrent password verifications the way the login endpoint
+does, for a range of scrypt costs, and reports login throughput and how long
+the event loop stalls. The "inline" row verifies on the event loop itself,
+which is what hashing inside the handler would do.
+
+Usage:
+    python loadtest-login.py [--logins 200] [--concurrency 32] [--workers N]
+
+PASSWORD_SCRYPT_N / _R / _P set the cost used by the API; the sweep below
+shows what a different choice would cost.
+"""
+
+import os
+import sys
+import time
+import asyncio
+import hashlib
+import argparse
+import statistics
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import passwords  # noqa: E402
+
+async def loop_lag(stop, interval=0.005):
+    """Worst delay of a timer that should fire every `interval` seconds"""
+    worst = 0.0
+    while not stop.is_set():
+        start = time.perf_counter()
+        await asyncio.sleep(interval)
+        worst = max(worst, time.perf_counter() - start - interval)
+    return worst
+
+async def burst(stored, logins, concurrency, inline):
+    """Verify `logins` passwords with at most `concurrency` in flight"""
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+
+    async def login():
+        async with semaphore:
+            start = time.perf_counter()
+            if inline:
+                ok = passwords.verify_password_sync("correct horse", stored)
+                await asyncio.sleep(0)
+            else:
+                ok = await passwords.verify_password("correct horse", stored)
+            assert ok
+            latencies.append((time.perf_counter() - start) * 1000)
+
+    stop = asyncio.Event()
+    lag = asyncio.create_task(loop_lag(stop))
+    start = time.perf_counter()
+    await asyncio.gather(*(login() for _ in range(logins)))
+    elapsed = time.perf_counter() - start
+    stop.set()
+
+    latencies.sort()
+    return {
+        "rps": logins / elapsed,
+        "p50_ms": statistics.median(latencies),
+        "p95_ms": latencies[int(len(latencies) * 0.95)],
+        "lag_ms": await lag * 1000,
+    }
+
+async def main():
+    parser = argparse.ArgumentParser(description="Login throughput at different scrypt costs")
+    parser.add_argument('--logins', type=int, default=200, help="Logins per burst")
+    parser.add_argument('--concurrency', type=int, default=32, help="Logins in flight at once")
+    parser.add_argument('--workers', type=int, default=passwords.HASH_WORKERS, help="Hashing threads")
+    args = parser.parse_args()
+
+    passwords.executor = ThreadPoolExecutor(max_workers=args.workers, thread_name_prefix="password-hash")
+    print(f"{args.logins} logins, {args.concurrency} concurrent, {args.workers} hashing thread(s)")
+    print(f"API cost: n={passwords.SCRYPT_N} r={passwords.SCRYPT_R} p={passwords.SCRYPT_P}")
+    print("-" * 78)
+    print(f"{'':20} | {'hash ms':>8} | {'logins/s':>9} | {'p50 ms':>8} | {'p95 ms':>8} | {'loop stall ms':>13}")
+
+    for n in (2 ** 13, 2 ** 14, 2 ** 15, 2 ** 16):
+        stored = passwords.hash_password_sync("correct horse", n=n)
+        start = time.perf_counter()
+        passwords.verify_password_sync("correct horse", stored)
+        single_ms = (time.perf_counter() - start) * 1000
+
+        modes = [("pool", False)]
+        if n == passwords.SCRYPT_N:
+            modes.append(("inline", True))
+        for label, inline in modes:
+            stats = await burst(stored, args.logins, args.concurrency, inline)
+            name = f"n=2^{n.bit_length() - 1} {label}" + (" *" if n == passwords.SCRYPT_N else "")
+            print(f"{name:20} | {single_ms:8.1f} | {stats['rps']:9.1f} | {stats['p50_ms']:8.1f} | "
+                  f"{stats['p95_ms']:8.1f} | {stats['lag_ms']:13.1f}")
+
+    legacy = hashlib.sha256(b"correct horse").hexdigest()
+    assert await passwords.verify_password("correct horse", legacy) and passwords.needs_rehash(legacy)
+    print("-" * 78)
+    print("* = configured cost. Legacy SHA-256 hashes still verify and are flagged for rehash.")
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,70 @@
+# iBrood Password Hashing
+# Salted scrypt with tunable cost, run in a thread pool so a hash never
+# blocks the event loop. Stored format: scrypt$<n>$<r>$<p>$<salt>$<hash>
+# (base64). Accounts created before this module still hold an unsalted
+# SHA-256 hex digest; those verify as before and are rehashed on login.
+
+import os
+import hmac
+import base64
+import asyncio
+import hashlib
+import secrets
+from concurrent.futures import ThreadPoolExecutor
+
+# Cost parameters: memory is 128 * n * r bytes per hash (16 MB by default)
+SCRYPT_N = int(os.environ.get("PASSWORD_SCRYPT_N", "16384"))
+SCRYPT_R = int(os.environ.get("PASSWORD_SCRYPT_R", "8"))
+SCRYPT_P = int(os.environ.get("PASSWORD_SCRYPT_P", "1"))
+HASH_WORKERS = int(os.environ.get("PASSWORD_HASH_WORKERS", str(os.cpu_count() or 2)))
+
+SALT_BYTES = 16
+KEY_BYTES = 32
+
+executor = ThreadPoolExecutor(max_workers=HASH_WORKERS, thread_name_prefix="password-hash")
+
+def _b64encode(data: bytes) -> str:
+    return base64.b64encode(data).decode().rstrip("=")
+
+def _b64decode(text: str) -> bytes:
+    return base64.b64decode(text + "=" * (-len(text) % 4))
+
+def _scrypt(password: str, salt: bytes, n: int, r: int, p: int) -> bytes:
+    # OpenSSL needs roughly 128 * r * (n + p + 2) bytes; allow some headroom
+    return hashlib.scrypt(password.encode(), salt=salt, n=n, r=r, p=p,
+                          maxmem=256 * r * (n + p + 2), dklen=KEY_BYTES)
+
+def is_legacy(stored: str) -> bool:
+    return not stored.startswith("scrypt$")
+
+def needs_rehash(stored: str) -> bool:
+    """Legacy SHA-256 hashes and scrypt hashes made with other cost parameters"""
+    if is_legacy(stored):
+        return True
+    _, n, r, p, _, _ = stored.split("$")
+    return (int(n), int(r), int(p)) != (SCRYPT_N, SCRYPT_R, SCRYPT_P)
+
+def hash_password_sync(password: str, n: int = SCRYPT_N, r: int = SCRYPT_R, p: int = SCRYPT_P) -> str:
+    salt = secrets.token_bytes(SALT_BYTES)
+    key = _scrypt(password, salt, n, r, p)
+    return f"scrypt${n}${r}${p}${_b64encode(salt)}${_b64encode(key)}"
+
+def verify_password_sync(password: str, stored: str) -> bool:
+    if is_legacy(stored):
+        return hmac.compare_digest(hashlib.sha256(password.encode()).hexdigest(), stored)
+    try:
+        _, n, r, p, salt, key = stored.split("$")
+        expected = _b64decode(key)
+        return hmac.compare_digest(_scrypt(password, _b64decode(salt), int(n), int(r), int(p)), expected)
+    except ValueError:
+        return False
+
+async def hash_password(password: str) -> str:
+    return await asyncio.get_running_loop().run_in_executor(executor, hash_password_sync, password)
+
+async def verify_password(password: str, stored: str) -> bool:
+    return await asyncio.get_running_loop().run_in_executor(executor, verify_password_sync, password, stored)
+
+# Verified against when the email is unknown, so a failed login takes as long
+# whether or not the account exists
+DUMMY_HASH = hash_password_sync(secrets.token_urlsafe(16))
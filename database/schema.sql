@@ -11,8 +11,8 @@ CREATE TABLE IF NOT EXISTS users (
     updated_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP
 );
 
--- Index for faster email lookups
-CREATE INDEX IF NOT EXISTS idx_users_email ON users(email);
+-- The UNIQUE constraint on email already provides the lookup index
+DROP INDEX IF EXISTS idx_users_email;
 
 -- ==================== HIVES TABLE ====================
 CREATE TABLE IF NOT EXISTS hives (
@@ -27,12 +27,125 @@ CREATE TABLE IF NOT EXISTS hives (
 
 CREATE INDEX IF NOT EXISTS idx_hives_user ON hives(user_id);
 
+-- ==================== PARTITIONING ====================
+-- queen_cell_analyses and brood_analyses are range-partitioned by month on
+-- timestamp, and sessions by month on expires_at. Partitions are named
+-- <table>_pYYYYMM. The API's maintenance task creates upcoming months and
+-- drops or archives old ones (maintain_partitions in api.py), so retention is a
+-- metadata operation instead of a large DELETE. Queries that bound the
+-- partition key only touch the months they need.
+
+-- Create the monthly partitions of `parent` covering from_ts..to_ts (UTC months)
+CREATE OR REPLACE FUNCTION create_monthly_partitions(parent TEXT, from_ts TIMESTAMPTZ, to_ts TIMESTAMPTZ)
+RETURNS INTEGER AS $$
+DECLARE
+    month DATE := date_trunc('month', from_ts AT TIME ZONE 'UTC')::date;
+    partition_name TEXT;
+    created INTEGER := 0;
+BEGIN
+    WHILE month <= (to_ts AT TIME ZONE 'UTC')::date LOOP
+        partition_name := format('%s_p%s', parent, to_char(month, 'YYYYMM'));
+        IF to_regclass(partition_name) IS NULL THEN
+            EXECUTE format('CREATE TABLE %I PARTITION OF %I FOR VALUES FROM (%L) TO (%L)',
+                           partition_name, parent,
+                           month::timestamp AT TIME ZONE 'UTC',
+                           (month + INTERVAL '1 month')::timestamp AT TIME ZONE 'UTC');
+            created := created + 1;
+        END IF;
+        month := (month + INTERVAL '1 month')::date;
+    END LOOP;
+    RETURN created;
+END;
+$$ language 'plpgsql';
+
+-- Detach (archive_old = true, moved to the "archive" schema) or drop the
+-- partitions of `parent` whose month ended more than keep_months months
+-- before the current month. keep_months = 0 removes every finished month.
+CREATE OR REPLACE FUNCTION expire_monthly_partitions(parent TEXT, keep_months INTEGER, archive_old BOOLEAN)
+RETURNS INTEGER AS $$
+DECLARE
+    cutoff DATE := (date_trunc('month', NOW() AT TIME ZONE 'UTC') - make_interval(months => keep_months))::date;
+    partition_name TEXT;
+    expired INTEGER := 0;
+BEGIN
+    FOR partition_name IN
+        SELECT c.relname FROM pg_inherits i
+        JOIN pg_class c ON c.oid = i.inhrelid
+        WHERE i.inhparent = to_regclass(parent)
+          AND c.relname ~ '_p[0-9]{6}$'
+          AND to_date(right(c.relname, 6), 'YYYYMM') + INTERVAL '1 month' <= cutoff
+        ORDER BY c.relname
+    LOOP
+        IF archive_old THEN
+            EXECUTE 'CREATE SCHEMA IF NOT EXISTS archive';
+            EXECUTE format('ALTER TABLE %I DETACH PARTITION %I', parent, partition_name);
+            EXECUTE format('ALTER TABLE %I SET SCHEMA archive', partition_name);
+        ELSE
+            EXECUTE format('DROP TABLE %I', partition_name);
+        END IF;
+        expired := expired + 1;
+    END LOOP;
+    RETURN expired;
+END;
+$$ language 'plpgsql';
+
+-- Tables created before partitioning are converted in place: the plain table
+-- is renamed to <table>_unpartitioned (with its indexes, so the names are free
+-- for the new table) here, and copied into the partitioned one by
+-- finish_partitioning once that exists.
+CREATE OR REPLACE FUNCTION start_partitioning(parent TEXT)
+RETURNS VOID AS $$
+DECLARE
+    index_name TEXT;
+BEGIN
+    IF to_regclass(parent) IS NULL
+       OR (SELECT relkind FROM pg_class WHERE oid = to_regclass(parent)) <> 'r' THEN
+        RETURN;
+    END IF;
+    EXECUTE format('ALTER TABLE %I RENAME TO %I', parent, parent || '_unpartitioned');
+    FOR index_name IN
+        SELECT indexrelid::regclass::text FROM pg_index WHERE indrelid = to_regclass(parent || '_unpartitioned')
+    LOOP
+        EXECUTE format('ALTER INDEX %s RENAME TO %I', index_name, index_name || '_unpartitioned');
+    END LOOP;
+END;
+$$ language 'plpgsql';
+
+CREATE OR REPLACE FUNCTION finish_partitioning(parent TEXT, partition_key TEXT)
+RETURNS VOID AS $$
+DECLARE
+    legacy TEXT := parent || '_unpartitioned';
+    column_list TEXT;
+    oldest TIMESTAMPTZ;
+BEGIN
+    IF to_regclass(legacy) IS NULL THEN
+        RETURN;
+    END IF;
+    SELECT string_agg(quote_ident(column_name), ', ') INTO column_list
+    FROM information_schema.columns
+    WHERE table_schema = current_schema() AND table_name = parent
+      AND column_name IN (SELECT column_name FROM information_schema.columns
+                          WHERE table_schema = current_schema() AND table_name = legacy);
+
+    EXECUTE format('UPDATE %I SET %I = COALESCE(created_at, NOW()) WHERE %I IS NULL', legacy, partition_key, partition_key);
+    EXECUTE format('SELECT MIN(%I) FROM %I', partition_key, legacy) INTO oldest;
+    PERFORM create_monthly_partitions(parent, COALESCE(oldest, NOW()), NOW());
+    EXECUTE format('INSERT INTO %I (%s) SELECT %s FROM %I', parent, column_list, column_list, legacy);
+    EXECUTE format('SELECT setval(pg_get_serial_sequence(%L, ''id''), GREATEST((SELECT MAX(id) FROM %I), 1))', parent, parent);
+    EXECUTE format('DROP TABLE %I', legacy);
+END;
+$$ language 'plpgsql';
+
+SELECT start_partitioning('queen_cell_analyses');
+SELECT start_partitioning('brood_analyses');
+SELECT start_partitioning('sessions');
+
 -- ==================== QUEEN CELL ANALYSES (AI) ====================
 CREATE TABLE IF NOT EXISTS queen_cell_analyses (
-    id SERIAL PRIMARY KEY,
+    id SERIAL,
     user_id INTEGER REFERENCES users(id) ON DELETE CASCADE,
     hive_id INTEGER REFERENCES hives(id) ON DELETE SET NULL,
-    timestamp TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP,
+    timestamp TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT CURRENT_TIMESTAMP,
     total_queen_cells INTEGER DEFAULT 0,
     capped_count INTEGER DEFAULT 0,
     semi_mature_count INTEGER DEFAULT 0,
@@ -41,18 +154,35 @@ CREATE TABLE IF NOT EXISTS queen_cell_analyses (
     recommendations TEXT[],
     cells_data JSONB,
     image_url TEXT,
-    created_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP
-);
+    created_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP,
+    client_id UUID,
+    PRIMARY KEY (id, timestamp)
+) PARTITION BY RANGE (timestamp);
+
+-- Every read is "this user's rows, newest first" (listing pages, and the
+-- latest-row lookup in the user_stats triggers, which is index-only), so a
+-- single composite index serves them all without a sort. It also covers
+-- user_id lookups for ON DELETE CASCADE, replacing the single-column indexes.
+DROP INDEX IF EXISTS idx_queen_analyses_user;
+DROP INDEX IF EXISTS idx_queen_analyses_timestamp;
+CREATE INDEX IF NOT EXISTS idx_queen_analyses_user_timestamp_id ON queen_cell_analyses(user_id, timestamp DESC, id DESC);
 
-CREATE INDEX IF NOT EXISTS idx_queen_analyses_user ON queen_cell_analyses(user_id);
-CREATE INDEX IF NOT EXISTS idx_queen_analyses_timestamp ON queen_cell_analyses(timestamp DESC);
+-- client_id: client-generated id of records uploaded through /api/sync, so a
+-- retried batch is recognised instead of inserted twice (NULL for rows saved
+-- online). Unique indexes on a partitioned table must include the partition
+-- key; /api/sync serializes each user's batches, so its lookup by
+-- (user_id, client_id) is what keeps uploads idempotent.
+CREATE UNIQUE INDEX IF NOT EXISTS idx_queen_analyses_user_client ON queen_cell_analyses(user_id, client_id, timestamp);
+
+SELECT create_monthly_partitions('queen_cell_analyses', NOW(), NOW() + INTERVAL '1 month');
+SELECT finish_partitioning('queen_cell_analyses', 'timestamp');
 
 -- ==================== BROOD ANALYSES (AI) ====================
 CREATE TABLE IF NOT EXISTS brood_analyses (
-    id SERIAL PRIMARY KEY,
+    id SERIAL,
     user_id INTEGER REFERENCES users(id) ON DELETE CASCADE,
     hive_id INTEGER REFERENCES hives(id) ON DELETE SET NULL,
-    timestamp TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP,
+    timestamp TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT CURRENT_TIMESTAMP,
     total_detections INTEGER DEFAULT 0,
     egg_count INTEGER DEFAULT 0,
     larva_count INTEGER DEFAULT 0,
@@ -62,11 +192,19 @@ CREATE TABLE IF NOT EXISTS brood_analyses (
     brood_coverage INTEGER DEFAULT 0,
     recommendations TEXT[],
     image_url TEXT,
-    created_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP
-);
+    created_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP,
+    client_id UUID,
+    PRIMARY KEY (id, timestamp)
+) PARTITION BY RANGE (timestamp);
 
-CREATE INDEX IF NOT EXISTS idx_brood_analyses_user ON brood_analyses(user_id);
-CREATE INDEX IF NOT EXISTS idx_brood_analyses_timestamp ON brood_analyses(timestamp DESC);
+DROP INDEX IF EXISTS idx_brood_analyses_user;
+DROP INDEX IF EXISTS idx_brood_analyses_timestamp;
+CREATE INDEX IF NOT EXISTS idx_brood_analyses_user_timestamp_id ON brood_analyses(user_id, timestamp DESC, id DESC);
+
+CREATE UNIQUE INDEX IF NOT EXISTS idx_brood_analyses_user_client ON brood_analyses(user_id, client_id, timestamp);
+
+SELECT create_monthly_partitions('brood_analyses', NOW(), NOW() + INTERVAL '1 month');
+SELECT finish_partitioning('brood_analyses', 'timestamp');
 
 -- ==================== QUEEN CELL LOGS (Manual) ====================
 CREATE TABLE IF NOT EXISTS queen_cell_logs (
@@ -84,8 +222,13 @@ CREATE TABLE IF NOT EXISTS queen_cell_logs (
     updated_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP
 );
 
-CREATE INDEX IF NOT EXISTS idx_queen_logs_user ON queen_cell_logs(user_id);
-CREATE INDEX IF NOT EXISTS idx_queen_logs_date ON queen_cell_logs(observation_date DESC);
+-- Logs are listed per user by (observation_date, created_at, id), newest first
+DROP INDEX IF EXISTS idx_queen_logs_user;
+DROP INDEX IF EXISTS idx_queen_logs_date;
+CREATE INDEX IF NOT EXISTS idx_queen_logs_user_date_created_id ON queen_cell_logs(user_id, observation_date DESC, created_at DESC, id DESC);
+
+ALTER TABLE queen_cell_logs ADD COLUMN IF NOT EXISTS client_id UUID;
+CREATE UNIQUE INDEX IF NOT EXISTS idx_queen_logs_user_client ON queen_cell_logs(user_id, client_id);
 
 -- ==================== BROOD LOGS (Manual) ====================
 CREATE TABLE IF NOT EXISTS brood_logs (
@@ -104,20 +247,303 @@ CREATE TABLE IF NOT EXISTS brood_logs (
     updated_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP
 );
 
-CREATE INDEX IF NOT EXISTS idx_brood_logs_user ON brood_logs(user_id);
-CREATE INDEX IF NOT EXISTS idx_brood_logs_date ON brood_logs(observation_date DESC);
+DROP INDEX IF EXISTS idx_brood_logs_user;
+DROP INDEX IF EXISTS idx_brood_logs_date;
+CREATE INDEX IF NOT EXISTS idx_brood_logs_user_date_created_id ON brood_logs(user_id, observation_date DESC, created_at DESC, id DESC);
+
+ALTER TABLE brood_logs ADD COLUMN IF NOT EXISTS client_id UUID;
+CREATE UNIQUE INDEX IF NOT EXISTS idx_brood_logs_user_client ON brood_logs(user_id, client_id);
 
 -- ==================== SESSIONS TABLE (for auth) ====================
+-- Partitioned by month on expires_at: a month's partition is dropped once
+-- every session in it has expired, and token lookups (which require
+-- expires_at > NOW()) only visit the current and future months.
 CREATE TABLE IF NOT EXISTS sessions (
-    id SERIAL PRIMARY KEY,
+    id SERIAL,
     user_id INTEGER REFERENCES users(id) ON DELETE CASCADE,
-    token VARCHAR(255) UNIQUE NOT NULL,
+    token VARCHAR(255) NOT NULL,
     expires_at TIMESTAMP WITH TIME ZONE NOT NULL,
-    created_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP
-);
+    created_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (id, expires_at),
+    UNIQUE (token, expires_at)
+) PARTITION BY RANGE (expires_at);
 
-CREATE INDEX IF NOT EXISTS idx_sessions_token ON sessions(token);
+-- The UNIQUE (token, expires_at) constraint provides the lookup index
+DROP INDEX IF EXISTS idx_sessions_token;
 CREATE INDEX IF NOT EXISTS idx_sessions_user ON sessions(user_id);
+-- The API's periodic sweep deletes expired sessions by range on expires_at
+CREATE INDEX IF NOT EXISTS idx_sessions_expires_at ON sessions(expires_at);
+
+SELECT create_monthly_partitions('sessions', NOW(), NOW() + INTERVAL '1 month');
+SELECT finish_partitioning('sessions', 'expires_at');
+
+-- ==================== USER STATS (Dashboard summary) ====================
+-- One row per user, kept up to date by the triggers below whenever an
+-- analysis is inserted or deleted, so /api/stats/{user_id} is a single
+-- primary key lookup instead of seven scans over the user's history.
+CREATE TABLE IF NOT EXISTS user_stats (
+    user_id INTEGER PRIMARY KEY REFERENCES users(id) ON DELETE CASCADE,
+    queen_analysis_count INTEGER NOT NULL DEFAULT 0,
+    brood_analysis_count INTEGER NOT NULL DEFAULT 0,
+    total_queen_cells BIGINT NOT NULL DEFAULT 0,
+    total_brood_cells BIGINT NOT NULL DEFAULT 0,
+    health_score_sum BIGINT NOT NULL DEFAULT 0,
+    health_score_count INTEGER NOT NULL DEFAULT 0,
+    latest_queen_analysis_id INTEGER,
+    latest_queen_analysis_at TIMESTAMP WITH TIME ZONE,
+    latest_brood_analysis_id INTEGER,
+    latest_brood_analysis_at TIMESTAMP WITH TIME ZONE
+);
+
+CREATE OR REPLACE FUNCTION user_stats_queen_analysis()
+RETURNS TRIGGER AS $$
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        IF NEW.user_id IS NULL THEN
+            RETURN NULL;
+        END IF;
+        INSERT INTO user_stats (user_id, queen_analysis_count, total_queen_cells, latest_queen_analysis_id, latest_queen_analysis_at)
+        VALUES (NEW.user_id, 1, COALESCE(NEW.total_queen_cells, 0), NEW.id, NEW.timestamp)
+        ON CONFLICT (user_id) DO UPDATE SET
+            queen_analysis_count = user_stats.queen_analysis_count + 1,
+            total_queen_cells = user_stats.total_queen_cells + EXCLUDED.total_queen_cells,
+            latest_queen_analysis_id = CASE
+                WHEN user_stats.latest_queen_analysis_at IS NULL
+                  OR EXCLUDED.latest_queen_analysis_at >= user_stats.latest_queen_analysis_at
+                THEN EXCLUDED.latest_queen_analysis_id
+                ELSE user_stats.latest_queen_analysis_id END,
+            latest_queen_analysis_at = GREATEST(user_stats.latest_queen_analysis_at, EXCLUDED.latest_queen_analysis_at);
+    ELSIF TG_OP = 'DELETE' THEN
+        IF OLD.user_id IS NULL THEN
+            RETURN NULL;
+        END IF;
+        UPDATE user_stats SET
+            queen_analysis_count = queen_analysis_count - 1,
+            total_queen_cells = total_queen_cells - COALESCE(OLD.total_queen_cells, 0)
+        WHERE user_id = OLD.user_id;
+        -- Only when the latest analysis goes do we look up the new latest one
+        UPDATE user_stats SET (latest_queen_analysis_id, latest_queen_analysis_at) = (
+            SELECT id, timestamp FROM queen_cell_analyses
+            WHERE user_id = OLD.user_id ORDER BY timestamp DESC LIMIT 1
+        )
+        WHERE user_id = OLD.user_id AND latest_queen_analysis_id = OLD.id;
+    END IF;
+    RETURN NULL;
+END;
+$$ language 'plpgsql';
+
+CREATE OR REPLACE FUNCTION user_stats_brood_analysis()
+RETURNS TRIGGER AS $$
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        IF NEW.user_id IS NULL THEN
+            RETURN NULL;
+        END IF;
+        INSERT INTO user_stats (user_id, brood_analysis_count, total_brood_cells, health_score_sum, health_score_count,
+                                latest_brood_analysis_id, latest_brood_analysis_at)
+        VALUES (NEW.user_id, 1, COALESCE(NEW.total_detections, 0), COALESCE(NEW.health_score, 0),
+                CASE WHEN NEW.health_score IS NULL THEN 0 ELSE 1 END, NEW.id, NEW.timestamp)
+        ON CONFLICT (user_id) DO UPDATE SET
+            brood_analysis_count = user_stats.brood_analysis_count + 1,
+            total_brood_cells = user_stats.total_brood_cells + EXCLUDED.total_brood_cells,
+            health_score_sum = user_stats.health_score_sum + EXCLUDED.health_score_sum,
+            health_score_count = user_stats.health_score_count + EXCLUDED.health_score_count,
+            latest_brood_analysis_id = CASE
+                WHEN user_stats.latest_brood_analysis_at IS NULL
+                  OR EXCLUDED.latest_brood_analysis_at >= user_stats.latest_brood_analysis_at
+                THEN EXCLUDED.latest_brood_analysis_id
+                ELSE user_stats.latest_brood_analysis_id END,
+            latest_brood_analysis_at = GREATEST(user_stats.latest_brood_analysis_at, EXCLUDED.latest_brood_analysis_at);
+    ELSIF TG_OP = 'DELETE' THEN
+        IF OLD.user_id IS NULL THEN
+            RETURN NULL;
+        END IF;
+        UPDATE user_stats SET
+            brood_analysis_count = brood_analysis_count - 1,
+            total_brood_cells = total_brood_cells - COALESCE(OLD.total_detections, 0),
+            health_score_sum = health_score_sum - COALESCE(OLD.health_score, 0),
+            health_score_count = health_score_count - CASE WHEN OLD.health_score IS NULL THEN 0 ELSE 1 END
+        WHERE user_id = OLD.user_id;
+        -- Only when the latest analysis goes do we look up the new latest one
+        UPDATE user_stats SET (latest_brood_analysis_id, latest_brood_analysis_at) = (
+            SELECT id, timestamp FROM brood_analyses
+            WHERE user_id = OLD.user_id ORDER BY timestamp DESC LIMIT 1
+        )
+        WHERE user_id = OLD.user_id AND latest_brood_analysis_id = OLD.id;
+    END IF;
+    RETURN NULL;
+END;
+$$ language 'plpgsql';
+
+DROP TRIGGER IF EXISTS queen_analyses_user_stats ON queen_cell_analyses;
+CREATE TRIGGER queen_analyses_user_stats
+    AFTER INSERT OR DELETE ON queen_cell_analyses
+    FOR EACH ROW
+    EXECUTE FUNCTION user_stats_queen_analysis();
+
+DROP TRIGGER IF EXISTS brood_analyses_user_stats ON brood_analyses;
+CREATE TRIGGER brood_analyses_user_stats
+    AFTER INSERT OR DELETE ON brood_analyses
+    FOR EACH ROW
+    EXECUTE FUNCTION user_stats_brood_analysis();
+
+-- Backfill users who already have analyses (no-op for users already tracked)
+INSERT INTO user_stats (
+    user_id, queen_analysis_count, brood_analysis_count, total_queen_cells, total_brood_cells,
+    health_score_sum, health_score_count,
+    latest_queen_analysis_id, latest_queen_analysis_at, latest_brood_analysis_id, latest_brood_analysis_at
+)
+SELECT u.id,
+       COALESCE(q.n, 0), COALESCE(b.n, 0), COALESCE(q.cells, 0), COALESCE(b.cells, 0),
+       COALESCE(b.health_sum, 0), COALESCE(b.health_n, 0),
+       lq.id, lq.timestamp, lb.id, lb.timestamp
+FROM users u
+LEFT JOIN (
+    SELECT user_id, COUNT(*) AS n, SUM(total_queen_cells) AS cells
+    FROM queen_cell_analyses GROUP BY user_id
+) q ON q.user_id = u.id
+LEFT JOIN (
+    SELECT user_id, COUNT(*) AS n, SUM(total_detections) AS cells,
+           SUM(health_score) AS health_sum, COUNT(health_score) AS health_n
+    FROM brood_analyses GROUP BY user_id
+) b ON b.user_id = u.id
+LEFT JOIN LATERAL (
+    SELECT id, timestamp FROM queen_cell_analyses
+    WHERE user_id = u.id ORDER BY timestamp DESC LIMIT 1
+) lq ON true
+LEFT JOIN LATERAL (
+    SELECT id, timestamp FROM brood_analyses
+    WHERE user_id = u.id ORDER BY timestamp DESC LIMIT 1
+) lb ON true
+WHERE q.n IS NOT NULL OR b.n IS NOT NULL
+ON CONFLICT (user_id) DO NOTHING;
+
+-- ==================== HIVE TRENDS (Daily rollups) ====================
+-- Per-hive daily sums of the analysis metrics, kept up to date by triggers
+-- like user_stats. /api/hives/{id}/trends groups these into day/week/month
+-- buckets, so a year of history is at most 366 rows read by primary key
+-- range, however many analyses a hive has. Analyses without a hive_id are
+-- not rolled up.
+CREATE TABLE IF NOT EXISTS hive_daily_rollups (
+    hive_id INTEGER NOT NULL REFERENCES hives(id) ON DELETE CASCADE,
+    day DATE NOT NULL,
+    brood_inspections INTEGER NOT NULL DEFAULT 0,
+    health_score_sum BIGINT NOT NULL DEFAULT 0,
+    health_score_count INTEGER NOT NULL DEFAULT 0,
+    brood_coverage_sum BIGINT NOT NULL DEFAULT 0,
+    total_detections_sum BIGINT NOT NULL DEFAULT 0,
+    egg_sum BIGINT NOT NULL DEFAULT 0,
+    larva_sum BIGINT NOT NULL DEFAULT 0,
+    pupa_sum BIGINT NOT NULL DEFAULT 0,
+    queen_inspections INTEGER NOT NULL DEFAULT 0,
+    queen_cells_sum BIGINT NOT NULL DEFAULT 0,
+    capped_sum BIGINT NOT NULL DEFAULT 0,
+    semi_mature_sum BIGINT NOT NULL DEFAULT 0,
+    mature_sum BIGINT NOT NULL DEFAULT 0,
+    open_sum BIGINT NOT NULL DEFAULT 0,
+    PRIMARY KEY (hive_id, day)
+);
+
+CREATE OR REPLACE FUNCTION hive_rollup_brood_analysis()
+RETURNS TRIGGER AS $$
+DECLARE
+    r brood_analyses%ROWTYPE;
+    delta INTEGER;
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        r := NEW; delta := 1;
+    ELSE
+        r := OLD; delta := -1;
+    END IF;
+    IF r.hive_id IS NULL THEN
+        RETURN NULL;
+    END IF;
+    INSERT INTO hive_daily_rollups AS h (hive_id, day, brood_inspections, health_score_sum, health_score_count,
+                                         brood_coverage_sum, total_detections_sum, egg_sum, larva_sum, pupa_sum)
+    VALUES (r.hive_id, (r.timestamp AT TIME ZONE 'UTC')::date, delta,
+            delta * COALESCE(r.health_score, 0), delta * CASE WHEN r.health_score IS NULL THEN 0 ELSE 1 END,
+            delta * COALESCE(r.brood_coverage, 0), delta * COALESCE(r.total_detections, 0),
+            delta * COALESCE(r.egg_count, 0), delta * COALESCE(r.larva_count, 0), delta * COALESCE(r.pupa_count, 0))
+    ON CONFLICT (hive_id, day) DO UPDATE SET
+        brood_inspections = h.brood_inspections + EXCLUDED.brood_inspections,
+        health_score_sum = h.health_score_sum + EXCLUDED.health_score_sum,
+        health_score_count = h.health_score_count + EXCLUDED.health_score_count,
+        brood_coverage_sum = h.brood_coverage_sum + EXCLUDED.brood_coverage_sum,
+        total_detections_sum = h.total_detections_sum + EXCLUDED.total_detections_sum,
+        egg_sum = h.egg_sum + EXCLUDED.egg_sum,
+        larva_sum = h.larva_sum + EXCLUDED.larva_sum,
+        pupa_sum = h.pupa_sum + EXCLUDED.pupa_sum;
+    RETURN NULL;
+END;
+$$ language 'plpgsql';
+
+CREATE OR REPLACE FUNCTION hive_rollup_queen_analysis()
+RETURNS TRIGGER AS $$
+DECLARE
+    r queen_cell_analyses%ROWTYPE;
+    delta INTEGER;
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        r := NEW; delta := 1;
+    ELSE
+        r := OLD; delta := -1;
+    END IF;
+    IF r.hive_id IS NULL THEN
+        RETURN NULL;
+    END IF;
+    INSERT INTO hive_daily_rollups AS h (hive_id, day, queen_inspections, queen_cells_sum,
+                                         capped_sum, semi_mature_sum, mature_sum, open_sum)
+    VALUES (r.hive_id, (r.timestamp AT TIME ZONE 'UTC')::date, delta,
+            delta * COALESCE(r.total_queen_cells, 0), delta * COALESCE(r.capped_count, 0),
+            delta * COALESCE(r.semi_mature_count, 0), delta * COALESCE(r.mature_count, 0),
+            delta * COALESCE(r.open_count, 0))
+    ON CONFLICT (hive_id, day) DO UPDATE SET
+        queen_inspections = h.queen_inspections + EXCLUDED.queen_inspections,
+        queen_cells_sum = h.queen_cells_sum + EXCLUDED.queen_cells_sum,
+        capped_sum = h.capped_sum + EXCLUDED.capped_sum,
+        semi_mature_sum = h.semi_mature_sum + EXCLUDED.semi_mature_sum,
+        mature_sum = h.mature_sum + EXCLUDED.mature_sum,
+        open_sum = h.open_sum + EXCLUDED.open_sum;
+    RETURN NULL;
+END;
+$$ language 'plpgsql';
+
+DROP TRIGGER IF EXISTS brood_analyses_hive_rollup ON brood_analyses;
+CREATE TRIGGER brood_analyses_hive_rollup
+    AFTER INSERT OR DELETE ON brood_analyses
+    FOR EACH ROW
+    EXECUTE FUNCTION hive_rollup_brood_analysis();
+
+DROP TRIGGER IF EXISTS queen_analyses_hive_rollup ON queen_cell_analyses;
+CREATE TRIGGER queen_analyses_hive_rollup
+    AFTER INSERT OR DELETE ON queen_cell_analyses
+    FOR EACH ROW
+    EXECUTE FUNCTION hive_rollup_queen_analysis();
+
+-- Backfill from existing analyses (no-op once the table has been populated)
+INSERT INTO hive_daily_rollups (
+    hive_id, day, brood_inspections, health_score_sum, health_score_count, brood_coverage_sum,
+    total_detections_sum, egg_sum, larva_sum, pupa_sum,
+    queen_inspections, queen_cells_sum, capped_sum, semi_mature_sum, mature_sum, open_sum
+)
+SELECT hive_id, day, SUM(brood_n), SUM(health_sum), SUM(health_n), SUM(coverage), SUM(detections),
+       SUM(eggs), SUM(larvae), SUM(pupae), SUM(queen_n), SUM(queen_cells), SUM(capped), SUM(semi_mature),
+       SUM(mature), SUM(open)
+FROM (
+    SELECT hive_id, (timestamp AT TIME ZONE 'UTC')::date AS day, 1 AS brood_n,
+           COALESCE(health_score, 0) AS health_sum, CASE WHEN health_score IS NULL THEN 0 ELSE 1 END AS health_n,
+           COALESCE(brood_coverage, 0) AS coverage, COALESCE(total_detections, 0) AS detections,
+           COALESCE(egg_count, 0) AS eggs, COALESCE(larva_count, 0) AS larvae, COALESCE(pupa_count, 0) AS pupae,
+           0 AS queen_n, 0 AS queen_cells, 0 AS capped, 0 AS semi_mature, 0 AS mature, 0 AS open
+    FROM brood_analyses WHERE hive_id IS NOT NULL
+    UNION ALL
+    SELECT hive_id, (timestamp AT TIME ZONE 'UTC')::date, 0, 0, 0, 0, 0, 0, 0, 0, 1,
+           COALESCE(total_queen_cells, 0), COALESCE(capped_count, 0), COALESCE(semi_mature_count, 0),
+           COALESCE(mature_count, 0), COALESCE(open_count, 0)
+    FROM queen_cell_analyses WHERE hive_id IS NOT NULL
+) analyses
+WHERE NOT EXISTS (SELECT 1 FROM hive_daily_rollups)
+GROUP BY hive_id, day;
 
 -- ==================== FUNCTION: Update timestamp ====================
 CREATE OR REPLACE FUNCTION update_updated_at_column()
@@ -0,0 +1,252 @@
+#!/usr/bin/env python3
+"""
+Query Plan Regression Check
+Seeds a scratch schema in a local Postgres with realistic volumes, then runs
+EXPLAIN ANALYZE on every query the API issues (in a transaction that is
+rolled back) and fails if a plan sorts, falls back to a sequential scan,
+stops using the index it is meant to use, or reads more monthly partitions
+of the analyses / sessions tables than expected
+
+Usage:
+    TEST_DATABASE_URL=postgresql://localhost/ibrood_test python test-query-plans.py
+
+Everything is created in the 'ibrood_plan_test' schema, which is dropped
+again at the end.
+"""
+
+import os
+import sys
+import json
+import asyncio
+import uuid
+from datetime import datetime, date, timedelta, timezone
+import asyncpg
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import api  # noqa: E402 - reuse the exact SQL the endpoints run
+
+TEST_SCHEMA = "ibrood_plan_test"
+SCHEMA_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "schema.sql")
+
+# Rows per table, roughly a year of a few hundred beekeepers (the session
+# sweep runs hourly, so only a small share of sessions is expired)
+USERS = 300
+HIVES_PER_USER = 5
+ANALYSES_PER_USER = 400
+LOGS_PER_USER = 150
+SESSIONS_PER_USER = 100
+
+SEED_SQL = f"""
+INSERT INTO users (email, name, password_hash)
+SELECT 'user' || g || '@ibrood.test', 'User ' || g, md5(g::text)
+FROM generate_series(1, {USERS}) g;
+
+INSERT INTO hives (user_id, name)
+SELECT u, 'Hive ' || h
+FROM generate_series(1, {USERS}) u, generate_series(1, {HIVES_PER_USER}) h;
+
+SELECT create_monthly_partitions('queen_cell_analyses', NOW() - INTERVAL '13 months', NOW());
+SELECT create_monthly_partitions('brood_analyses', NOW() - INTERVAL '13 months', NOW());
+
+INSERT INTO queen_cell_analyses (user_id, hive_id, timestamp, total_queen_cells, capped_count, open_count, recommendations, cells_data)
+SELECT u, (u - 1) * {HIVES_PER_USER} + g % {HIVES_PER_USER} + 1, NOW() - (g * 22 || ' hours')::interval, g % 7, g % 3, g % 2, ARRAY['Continue regular monitoring'],
+       jsonb_build_object('cells', jsonb_build_array(jsonb_build_object('id', 1, 'bbox', jsonb_build_array(1, 2, 3, 4))))
+FROM generate_series(1, {USERS}) u, generate_series(1, {ANALYSES_PER_USER}) g;
+
+INSERT INTO brood_analyses (user_id, hive_id, timestamp, total_detections, egg_count, larva_count, pupa_count, health_score, health_status)
+SELECT u, (u - 1) * {HIVES_PER_USER} + g % {HIVES_PER_USER} + 1, NOW() - (g * 22 || ' hours')::interval, g % 200, g % 50, g % 70, g % 80, 40 + g % 60, 'GOOD'
+FROM generate_series(1, {USERS}) u, generate_series(1, {ANALYSES_PER_USER}) g;
+
+INSERT INTO queen_cell_logs (user_id, hive_id, observation_date, status, notes)
+SELECT u, 'hive-' || (g % 5), CURRENT_DATE - (g / 2), 'capped', ''
+FROM generate_series(1, {USERS}) u, generate_series(1, {LOGS_PER_USER}) g;
+
+INSERT INTO brood_logs (user_id, hive_id, observation_date, health_score, notes)
+SELECT u, 'hive-' || (g % 5), CURRENT_DATE - (g / 2), 70, ''
+FROM generate_series(1, {USERS}) u, generate_series(1, {LOGS_PER_USER}) g;
+
+INSERT INTO sessions (user_id, token, expires_at)
+SELECT u, md5(u::text || '-' || g), NOW() + ((g - 1) || ' hours')::interval
+FROM generate_series(1, {USERS}) u, generate_series(1, {SESSIONS_PER_USER}) g;
+"""
+
+NOW = datetime.now(timezone.utc)
+TODAY = date.today()
+
+def listing(table, columns, keys, with_cursor, cursor_values, index):
+    """Check for one listing page, first page or continued from a cursor"""
+    query = api.page_query(table, list(columns), keys, with_cursor)
+    args = [USERS // 2] + (cursor_values if with_cursor else []) + [21]
+    expect = {"index": index, "no_seq_scan": [table]}
+    if table in api.PARTITIONED_TABLES:
+        # A cursor prunes newer months; the first page reads next month's
+        # (empty) partition, then the current one and, early in a month, the
+        # previous one before the LIMIT is met
+        expect["partitions"] = {table: 2 if with_cursor else 3}
+    return (query, args, expect)
+
+def checks():
+    """(name, query, args, expectations) for every query in api.py"""
+    queen_cols = [c for c in api.QUEEN_ANALYSIS_COLUMNS if c not in api.HEAVY_COLUMNS]
+    analysis_cursor = [NOW - timedelta(days=200), 10 ** 9]
+    log_cursor = [TODAY, NOW, 10 ** 9]
+    cases = [
+        ("signup: email exists", "SELECT id FROM users WHERE email = $1",
+         ["user7@ibrood.test"], {"index": "users_email_key", "no_seq_scan": ["users"]}),
+        ("login: user by email", "SELECT id, email, name, password_hash, created_at FROM users WHERE email = $1",
+         ["user7@ibrood.test"], {"index": "users_email_key", "no_seq_scan": ["users"]}),
+        ("logout: delete session", api.SESSION_LOGOUT_QUERY,
+         ["missing-token", NOW + timedelta(hours=1)], {"index": "sessions_token_expires_at_key", "no_seq_scan": ["sessions"],
+                                                       "partitions": {"sessions": 1}}),
+        ("auth: session lookup", api.SESSION_LOOKUP_QUERY,
+         ["missing-token"], {"index": "sessions_token_expires_at_key", "no_seq_scan": ["sessions"],
+                             "partitions": {"sessions": 2}}),
+        ("sweep: expired sessions", api.SESSION_SWEEP_QUERY,
+         [], {"index": "idx_sessions_expires_at", "no_seq_scan": ["sessions"], "partitions": {"sessions": 1}}),
+        ("stats: summary lookup", api.USER_STATS_QUERY,
+         [USERS // 2], {"index": "user_stats_pkey", "no_seq_scan": ["user_stats", "queen_cell_analyses", "brood_analyses"],
+                        "partitions": {"queen_cell_analyses": 1, "brood_analyses": 1}}),
+        ("trigger: latest queen analysis",
+         "SELECT id, timestamp FROM queen_cell_analyses WHERE user_id = $1 ORDER BY timestamp DESC LIMIT 1",
+         [USERS // 2], {"index": "idx_queen_analyses_user_timestamp_id", "index_only": True,
+                        "no_seq_scan": ["queen_cell_analyses"], "partitions": {"queen_cell_analyses": 3}}),
+        ("trigger: latest brood analysis",
+         "SELECT id, timestamp FROM brood_analyses WHERE user_id = $1 ORDER BY timestamp DESC LIMIT 1",
+         [USERS // 2], {"index": "idx_brood_analyses_user_timestamp_id", "index_only": True,
+                        "no_seq_scan": ["brood_analyses"], "partitions": {"brood_analyses": 3}}),
+        ("sync: already uploaded", api.SYNC_EXISTING_QUERY.format(table="queen_cell_analyses"),
+         [USERS // 2, [uuid.uuid4() for _ in range(50)]],
+         {"index": "idx_queen_analyses_user_client", "no_seq_scan": ["queen_cell_analyses"]}),
+        ("trends: weekly brood metrics", api.trend_query(["health_score", "egg_count"]),
+         [HIVES_PER_USER * USERS // 2, "week", TODAY - timedelta(days=365), TODAY],
+         {"index": "hive_daily_rollups_pkey", "no_seq_scan": ["hive_daily_rollups"], "allow_sort": True}),
+        ("delete queen analysis", "DELETE FROM queen_cell_analyses WHERE id = $1 AND user_id = $2",
+         [1, 1], {"index": "queen_cell_analyses_pkey", "no_seq_scan": ["queen_cell_analyses"]}),
+        ("delete queen log", "DELETE FROM queen_cell_logs WHERE id = $1 AND user_id = $2",
+         [1, 1], {"index": "queen_cell_logs_pkey", "no_seq_scan": ["queen_cell_logs"]}),
+    ]
+
+    pages = [
+        ("queen_cell_analyses", queen_cols, api.ANALYSIS_KEYS, analysis_cursor, "idx_queen_analyses_user_timestamp_id"),
+        ("brood_analyses", api.BROOD_ANALYSIS_COLUMNS, api.ANALYSIS_KEYS, analysis_cursor, "idx_brood_analyses_user_timestamp_id"),
+        ("queen_cell_logs", api.QUEEN_LOG_COLUMNS, api.LOG_KEYS, log_cursor, "idx_queen_logs_user_date_created_id"),
+        ("brood_logs", api.BROOD_LOG_COLUMNS, api.LOG_KEYS, log_cursor, "idx_brood_logs_user_date_created_id"),
+    ]
+    for table, columns, keys, cursor_values, index in pages:
+        for with_cursor in (False, True):
+            label = f"list {table}" + (" (cursor)" if with_cursor else "")
+            cases.append((label,) + listing(table, columns, keys, with_cursor, cursor_values, index))
+    return cases
+
+def walk(plan):
+    yield plan
+    for child in plan.get("Plans", []):
+        yield from walk(child)
+
+async def partition_parents(conn):
+    """Partition (and partition index) name -> name of the parent table (index)"""
+    rows = await conn.fetch(
+        """SELECT c.relname AS child, p.relname AS parent FROM pg_inherits i
+           JOIN pg_class c ON c.oid = i.inhrelid
+           JOIN pg_class p ON p.oid = i.inhparent"""
+    )
+    return {row['child']: row['parent'] for row in rows}
+
+def verify(plan, expect, parents):
+    """Problems found in a plan, empty when it matches expectations"""
+    nodes = list(walk(plan))
+    problems = []
+    # Sorting a handful of aggregated buckets is fine; sorting table rows is not
+    if not expect.get("allow_sort") and any(node["Node Type"] in ("Sort", "Incremental Sort") for node in nodes):
+        problems.append("plan sorts")
+    for node in nodes:
+        relation = parents.get(node.get("Relation Name"), node.get("Relation Name"))
+        if node["Node Type"] == "Seq Scan" and relation in expect.get("no_seq_scan", []):
+            problems.append(f"seq scan on {relation}")
+    indexes = {parents.get(node.get("Index Name"), node.get("Index Name")) for node in nodes}
+    if expect.get("index") and expect["index"] not in indexes:
+        problems.append(f"does not use {expect['index']}")
+    if expect.get("index_only") and not any(node["Node Type"] == "Index Only Scan" for node in nodes):
+        problems.append("not an index-only scan")
+    
+    # Partitions that were actually read: pruned ones are not in the plan and
+    # ones the executor never reached (LIMIT met) have zero loops
+    for table, limit in expect.get("partitions", {}).items():
+        read = {node["Relation Name"] for node in nodes
+                if parents.get(node.get("Relation Name")) == table and node.get("Actual Loops", 0) > 0}
+        if len(read) > limit:
+            problems.append(f"reads {len(read)} {table} partitions (expected <= {limit})")
+    return problems
+
+async def check_retention(conn):
+    """expire_monthly_partitions removes exactly the months past the retention"""
+    count = "SELECT COUNT(*) FROM pg_inherits WHERE inhparent = 'brood_analyses'::regclass"
+    oldest = "SELECT MIN(timestamp) FROM brood_analyses"
+    transaction = conn.transaction()
+    await transaction.start()
+    try:
+        before = await conn.fetchval(count)
+        expired = await conn.fetchval("SELECT expire_monthly_partitions('brood_analyses', 6, false)")
+        after = await conn.fetchval(count)
+        cutoff = await conn.fetchval("SELECT date_trunc('month', NOW() AT TIME ZONE 'UTC') - INTERVAL '6 months'")
+        remaining = await conn.fetchval(oldest)
+    finally:
+        await transaction.rollback()
+    
+    problems = []
+    if not expired or after != before - expired:
+        problems.append(f"expired {expired} of {before} partitions, {after} left")
+    if remaining is not None and remaining.replace(tzinfo=None) < cutoff:
+        problems.append(f"rows from {remaining:%Y-%m} survived a 6 month retention")
+    return problems
+
+async def main():
+    url = os.environ.get("TEST_DATABASE_URL")
+    if not url:
+        print("Set TEST_DATABASE_URL to a scratch Postgres database")
+        sys.exit(2)
+
+    conn = await asyncpg.connect(url)
+    failures = 0
+    try:
+        await conn.execute(f"DROP SCHEMA IF EXISTS {TEST_SCHEMA} CASCADE; CREATE SCHEMA {TEST_SCHEMA}")
+        await conn.execute(f"SET search_path TO {TEST_SCHEMA}")
+
+        print("Applying schema.sql...")
+        with open(SCHEMA_FILE) as f:
+            await conn.execute(f.read())
+
+        print(f"Seeding {USERS} users x {ANALYSES_PER_USER} analyses / {LOGS_PER_USER} logs...")
+        await conn.execute(SEED_SQL)
+        # VACUUM sets the visibility map so index-only scans are possible
+        await conn.execute("VACUUM ANALYZE")
+
+        parents = await partition_parents(conn)
+        
+        print("\nQuery plans:")
+        print("-" * 70)
+        results = [("retention: expire old months", await check_retention(conn))]
+        for name, query, args, expect in checks():
+            # ANALYZE executes the statement, so the DELETEs are rolled back
+            transaction = conn.transaction()
+            await transaction.start()
+            try:
+                explain = await conn.fetchval(f"EXPLAIN (ANALYZE, FORMAT JSON) {query}", *args)
+            finally:
+                await transaction.rollback()
+            results.append((name, verify(json.loads(explain)[0]["Plan"], expect, parents)))
+        
+        for name, problems in results:
+            failures += bool(problems)
+            status = "OK  " if not problems else "FAIL"
+            print(f"{status} {name:40} {'; '.join(problems)}")
+        print("-" * 70)
+    finally:
+        await conn.execute(f"DROP SCHEMA IF EXISTS {TEST_SCHEMA} CASCADE")
+        await conn.close()
+
+    print(f"{failures} failing check(s)" if failures else "All plans use their indexes and prune their partitions")
+    sys.exit(1 if failures else 0)
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,71 @@
+# iBrood /analyze Uploads
+# /analyze takes the image in one of three forms, picked by Content-Type:
+#   image/* or application/octet-stream - the raw file as the request body
+#   multipart/form-data                 - the file in a "file" field
+#   application/json                    - legacy {"image": "data:image/...;base64,..."}
+# Both the detection service and the gateway (api/main.py, which imports this
+# file from DETECTOR_DIR) parse the body here, so the two accept exactly the
+# same requests and report the same per-form sizes and parse times.
+
+import json
+import base64
+
+ANALYZE_FORMS = ("binary", "multipart", "json")
+
+class InvalidUpload(Exception):
+    """Raised when an /analyze body holds no usable image"""
+    pass
+
+class AnalyzeMetrics:
+    """Request/response bytes and body parse time per /analyze request form"""
+
+    def __init__(self, forms=ANALYZE_FORMS):
+        self.forms = {form: {"requests": 0, "request_bytes": 0, "response_bytes": 0, "parse_ms": 0.0} for form in forms}
+
+    def observe(self, form, request_bytes, response_bytes, parse_ms):
+        stats = self.forms[form]
+        stats["requests"] += 1
+        stats["request_bytes"] += request_bytes
+        stats["response_bytes"] += response_bytes
+        stats["parse_ms"] += parse_ms
+
+    def snapshot(self):
+        return {
+            form: {
+                "requests": stats["requests"],
+                "avg_request_bytes": round(stats["request_bytes"] / stats["requests"]) if stats["requests"] else 0,
+                "avg_response_bytes": round(stats["response_bytes"] / stats["requests"]) if stats["requests"] else 0,
+                "avg_parse_ms": round(stats["parse_ms"] / stats["requests"], 2) if stats["requests"] else 0
+            }
+            for form, stats in self.forms.items()
+        }
+
+async def read_analyze_upload(request):
+    """(form, image bytes, content type, request body size, legacy data URL or None) for an /analyze request.
+    Raises InvalidUpload, or ValueError for a body that is not valid JSON or base64."""
+    content_type = request.headers.get("content-type", "").split(";")[0].strip().lower()
+    if content_type == "application/json":
+        body = await request.body()
+        data = json.loads(body)
+        image_data = data.get('image', '') if isinstance(data, dict) else ''
+        if not isinstance(image_data, str) or 'data:image' not in image_data:
+            raise InvalidUpload("Invalid image format")
+        # binascii.Error from b64decode is a ValueError, answered with 400 as well
+        _, _, encoded = image_data.partition(',')
+        if not encoded:
+            raise InvalidUpload("Invalid image format")
+        return "json", base64.b64decode(encoded), "image/jpeg", len(body), image_data
+    if content_type == "multipart/form-data":
+        form = await request.form()
+        upload = form.get("file")
+        if upload is None or isinstance(upload, str):
+            raise InvalidUpload("Multipart body needs a 'file' field")
+        image_bytes = await upload.read()
+        return ("multipart", image_bytes, upload.content_type or "application/octet-stream",
+                int(request.headers.get("content-length", len(image_bytes))), None)
+    if content_type.startswith("image/") or content_type == "application/octet-stream":
+        image_bytes = await request.body()
+        if not image_bytes:
+            raise InvalidUpload("Empty request body")
+        return "binary", image_bytes, content_type, len(image_bytes), None
+    raise InvalidUpload(f"Unsupported Content-Type '{content_type}' - send an image, multipart/form-data or JSON")
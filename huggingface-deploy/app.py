@@ -1,5 +1,6 @@
-from fastapi import FastAPI, UploadFile, File, Request
-from fastapi.responses import JSONResponse, HTMLResponse
+from fastapi import FastAPI, UploadFile, File, Request, Query
+from typing import List
+from fastapi.responses import JSONResponse, HTMLResponse, Response, StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
 from ultralytics import YOLO
 import os
@@ -9,6 +10,24 @@ import io
 import base64
 import cv2
 import numpy as np
+import asyncio
+import contextlib
+import functools
+import threading
+import zipfile
+import hashlib
+import json
+import time
+import re
+import uuid
+import sqlite3
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from polygons import mask_polygons, letterbox_boxes
+from detections import Detections
+from ingest import MAX_UPLOAD_MB, UploadRejected, open_upload, decode_image, prepare_image, exif_orientation, upright
+from ingest import metrics as ingest_metrics
+from analyze_upload import InvalidUpload, AnalyzeMetrics, read_analyze_upload
 
 # ==================== INITIALIZE APP ====================
 app = FastAPI(title="iBrood Detection API", version="1.0.0")
@@ -35,46 +54,704 @@ os.environ['DISPLAY'] = ':0'
 os.environ['QT_QPA_PLATFORM'] = 'offscreen'
 os.environ['OPENCV_IO_ENABLE_OPENEXR'] = '0'
 
+# ==================== INFERENCE BACKEND ====================
+# INFERENCE_BACKEND picks which artifact of each model is loaded. ultralytics
+# runs all of them behind the same YOLO interface, so the rest of the app is
+# unaware of the backend:
+#   pytorch  - best-seg.pt / best-od.pt (default)
+#   onnx     - best-seg.onnx / best-od.onnx on ONNX Runtime
+#   openvino - best-seg_openvino_model/ / best-od_openvino_model/ on OpenVINO
+# The exported artifacts are produced at build time by export-models.py. If an
+# artifact is missing the PyTorch checkpoint is loaded instead.
+INFERENCE_BACKEND = os.environ.get("INFERENCE_BACKEND", "pytorch").lower()
+
+MODEL_BACKENDS = {
+    "pytorch": lambda weights: weights,
+    "onnx": lambda weights: os.path.splitext(weights)[0] + ".onnx",
+    "openvino": lambda weights: os.path.splitext(weights)[0] + "_openvino_model",
+}
+
+if INFERENCE_BACKEND not in MODEL_BACKENDS:
+    logger.error(f"Unknown INFERENCE_BACKEND '{INFERENCE_BACKEND}', using pytorch")
+    INFERENCE_BACKEND = "pytorch"
+
+def load_model(weights, task, label):
+    """Load a model on the configured backend, returning (model, backend)"""
+    if not os.path.exists(weights):
+        logger.error(f"{label} model file '{weights}' not found")
+        return None, None
+    
+    file_size = os.path.getsize(weights)
+    logger.info(f"{label} model file size: {file_size} bytes")
+    if file_size <= 1000:
+        logger.error(f"{label} model file too small, likely corrupted")
+        return None, None
+    
+    if INFERENCE_BACKEND != "pytorch":
+        artifact = MODEL_BACKENDS[INFERENCE_BACKEND](weights)
+        if os.path.exists(artifact):
+            try:
+                model = YOLO(artifact, task=task)
+                logger.info(f"{label} model ({artifact}) loaded on {INFERENCE_BACKEND}")
+                return model, INFERENCE_BACKEND
+            except Exception as e:
+                logger.error(f"Failed to load {artifact} on {INFERENCE_BACKEND}: {e}")
+        else:
+            logger.warning(f"{artifact} not found - run export-models.py to build it")
+        logger.warning(f"Falling back to PyTorch for {label} model")
+    
+    model = YOLO(weights, task=task)
+    logger.info(f"{label} model ({weights}) loaded successfully")
+    return model, "pytorch"
+
 # Queen Cell Model (Segmentation)
 queen_model = None
+queen_backend = None
 # Brood Model (Object Detection)
 brood_model = None
+brood_backend = None
 
 try:
     import cv2
     logger.info("OpenCV imported successfully")
     
     # Load Queen Cell Model (best-seg.pt)
-    if os.path.exists('best-seg.pt'):
-        file_size = os.path.getsize('best-seg.pt')
-        logger.info(f"Queen model file size: {file_size} bytes")
-        
-        if file_size > 1000:
-            queen_model = YOLO('best-seg.pt')
-            logger.info("Queen Cell model (best-seg.pt) loaded successfully")
-        else:
-            logger.error("Queen model file too small, likely corrupted")
-    else:
-        logger.error("Queen model file 'best-seg.pt' not found")
+    queen_model, queen_backend = load_model('best-seg.pt', 'segment', "Queen Cell")
     
     # Load Brood Model (best-od.pt)
-    if os.path.exists('best-od.pt'):
-        file_size = os.path.getsize('best-od.pt')
-        logger.info(f"Brood model file size: {file_size} bytes")
-        
-        if file_size > 1000:
-            brood_model = YOLO('best-od.pt')
-            logger.info("Brood model (best-od.pt) loaded successfully")
-        else:
-            logger.error("Brood model file too small, likely corrupted")
-    else:
-        logger.error("Brood model file 'best-od.pt' not found")
+    brood_model, brood_backend = load_model('best-od.pt', 'detect', "Brood")
         
 except ImportError as e:
     logger.error(f"OpenCV import error: {e}")
 except Exception as e:
     logger.error(f"Error loading models: {e}")
 
+# ==================== INT8 MODELS ====================
+# With INT8_MODELS=1 the statically quantized ONNX models built by
+# `export-models.py --int8 --calib DIR` are loaded next to the FP32 models.
+# Detection endpoints use them when called with precision=int8.
+INT8_MODELS = os.environ.get("INT8_MODELS", "0") == "1"
+PRECISIONS = ("fp32", "int8")
+
+queen_model_int8 = None
+brood_model_int8 = None
+
+def load_int8_model(weights, task, label):
+    """Load the quantized ONNX artifact for a checkpoint, or None"""
+    artifact = os.path.splitext(weights)[0] + "_int8.onnx"
+    if not os.path.exists(artifact):
+        logger.warning(f"{artifact} not found - run export-models.py --int8 to build it")
+        return None
+    try:
+        model = YOLO(artifact, task=task)
+        logger.info(f"{label} INT8 model ({artifact}) loaded successfully")
+        return model
+    except Exception as e:
+        logger.error(f"Failed to load {label} INT8 model: {e}")
+        return None
+
+if INT8_MODELS:
+    queen_model_int8 = load_int8_model('best-seg.pt', 'segment', "Queen Cell")
+    brood_model_int8 = load_int8_model('best-od.pt', 'detect', "Brood")
+
+# ==================== INFERENCE EXECUTOR ====================
+# Model calls are CPU-bound, so they run on a dedicated pool instead of the
+# event loop. This keeps /health responsive while a frame is being processed.
+# Admission is counted in frame-model units: a single detection takes one
+# slot, a /batch_detect request one per frame and model (at most the whole
+# queue), and image post-processing runs before the slot is released.
+INFERENCE_WORKERS = int(os.environ.get("INFERENCE_WORKERS", "1"))
+INFERENCE_QUEUE_SIZE = int(os.environ.get("INFERENCE_QUEUE_SIZE", "8"))
+INFERENCE_RETRY_AFTER = int(os.environ.get("INFERENCE_RETRY_AFTER", "5"))
+
+class InferenceQueueFull(Exception):
+    """Raised when no inference slot is free"""
+    pass
+
+class InferenceExecutor:
+    """Thread pool for inference work with a bounded number of in-flight requests"""
+
+    def __init__(self, workers, queue_size):
+        self.workers = workers
+        self.queue_size = queue_size
+        self.pending = 0
+        self.completed = 0
+        self.rejected = 0
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="inference")
+
+    @contextlib.asynccontextmanager
+    async def slot(self, weight=1):
+        """Reserve `weight` slots for one request, raising InferenceQueueFull when they
+        don't fit. A request heavier than the whole queue takes all of it."""
+        # Only touched from the event loop thread, so no lock is needed
+        weight = max(1, min(weight, self.workers + self.queue_size))
+        if self.pending + weight > self.workers + self.queue_size:
+            self.rejected += 1
+            raise InferenceQueueFull()
+
+        self.pending += weight
+        try:
+            yield
+        finally:
+            self.pending -= weight
+            self.completed += 1
+
+    async def run(self, fn, *args, **kwargs):
+        """Run fn on the pool without blocking the event loop"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._pool, functools.partial(fn, *args, **kwargs))
+
+    def stats(self):
+        return {
+            "workers": self.workers,
+            "queue_size": self.queue_size,
+            "pending": self.pending,
+            "completed": self.completed,
+            "rejected": self.rejected
+        }
+
+inference_executor = InferenceExecutor(INFERENCE_WORKERS, INFERENCE_QUEUE_SIZE)
+
+# Ultralytics predictors are not thread-safe, so each model is guarded by its
+# own lock. With 2+ workers queen and brood requests can still run side by side.
+queen_model_lock = threading.Lock()
+brood_model_lock = threading.Lock()
+queen_int8_lock = threading.Lock()
+brood_int8_lock = threading.Lock()
+
+def queue_full_response():
+    """503 with Retry-After so clients back off instead of hammering the worker"""
+    return JSONResponse({
+        "error": "Server busy",
+        "message": "Inference queue is full, please retry shortly."
+    }, status_code=503, headers={"Retry-After": str(INFERENCE_RETRY_AFTER)})
+
+# ==================== MICRO-BATCHING ====================
+# Concurrent requests for the same model are collected for up to
+# BATCH_MAX_WAIT_MS (or until BATCH_MAX_SIZE images) and run as one batched
+# predict call, which uses the CPU far better than a series of batch-of-one calls.
+BATCH_MAX_SIZE = int(os.environ.get("BATCH_MAX_SIZE", "4"))
+BATCH_MAX_WAIT_MS = float(os.environ.get("BATCH_MAX_WAIT_MS", "20"))
+
+class MicroBatcher:
+    """Groups single-image predict calls for one model into batched calls"""
+
+    def __init__(self, name, get_model, lock, max_batch, max_wait_ms):
+        self.name = name
+        self.get_model = get_model
+        self.lock = lock
+        self.max_batch = max(1, max_batch)
+        self.max_wait = max(0.0, max_wait_ms) / 1000.0
+        self.batches = 0
+        self.images = 0
+        self.batch_sizes = {}
+        self._queue = None
+        self._worker = None
+
+    async def predict(self, image):
+        """Queue one image and wait for its Results object"""
+        if self._worker is None or self._worker.done():
+            # Created lazily so the queue binds to uvicorn's running loop
+            self._queue = asyncio.Queue()
+            self._worker = asyncio.create_task(self._run())
+
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((image, future))
+        return await future
+
+    async def _collect(self):
+        """Wait for one request, then gather more until the batch is full or max wait passes"""
+        loop = asyncio.get_running_loop()
+        batch = [await self._queue.get()]
+        deadline = loop.time() + self.max_wait
+
+        while len(batch) < self.max_batch:
+            timeout = deadline - loop.time()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    def _predict_batch(self, images):
+        with self.lock:
+            return self.get_model()(images, verbose=False)
+
+    async def _run(self):
+        while True:
+            batch = await self._collect()
+            images = [image for image, _ in batch]
+
+            try:
+                results = await inference_executor.run(self._predict_batch, images)
+                for (_, future), result in zip(batch, results):
+                    if not future.done():
+                        future.set_result(result)
+            except Exception as e:
+                logger.error(f"{self.name} batch of {len(batch)} failed: {e}")
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+
+            self.batches += 1
+            self.images += len(batch)
+            self.batch_sizes[len(batch)] = self.batch_sizes.get(len(batch), 0) + 1
+
+    def stats(self):
+        return {
+            "max_batch": self.max_batch,
+            "max_wait_ms": self.max_wait * 1000,
+            "batches": self.batches,
+            "images": self.images,
+            "avg_batch_size": round(self.images / self.batches, 2) if self.batches else 0,
+            "batch_size_counts": {str(size): count for size, count in sorted(self.batch_sizes.items())}
+        }
+
+# Models are looked up at call time so the batchers follow whatever was loaded
+queen_batcher = MicroBatcher("queen", lambda: queen_model, queen_model_lock, BATCH_MAX_SIZE, BATCH_MAX_WAIT_MS)
+brood_batcher = MicroBatcher("brood", lambda: brood_model, brood_model_lock, BATCH_MAX_SIZE, BATCH_MAX_WAIT_MS)
+queen_int8_batcher = MicroBatcher("queen_int8", lambda: queen_model_int8, queen_int8_lock, BATCH_MAX_SIZE, BATCH_MAX_WAIT_MS)
+brood_int8_batcher = MicroBatcher("brood_int8", lambda: brood_model_int8, brood_int8_lock, BATCH_MAX_SIZE, BATCH_MAX_WAIT_MS)
+
+def select_batcher(kind, precision):
+    """Batcher for the queen or brood model at the requested precision, or None if not loaded"""
+    if precision not in PRECISIONS:
+        return None
+    if kind == "queen":
+        return queen_batcher if precision == "fp32" else (queen_int8_batcher if queen_model_int8 is not None else None)
+    return brood_batcher if precision == "fp32" else (brood_int8_batcher if brood_model_int8 is not None else None)
+
+def invalid_precision_response(precision):
+    if precision not in PRECISIONS:
+        message = f"precision must be one of: {', '.join(PRECISIONS)}"
+    else:
+        message = "INT8 models not loaded - start with INT8_MODELS=1 after building them"
+    return JSONResponse({"error": f"Unsupported precision '{precision}'", "message": message}, status_code=400)
+
+# ==================== RESULT CACHE ====================
+# Re-uploads of the same photo (mobile retries, re-opened analyses) are served
+# from a cache keyed by the image bytes, the model version and the request
+# parameters. The in-memory tier is an LRU with a TTL; setting
+# RESULT_CACHE_DIR adds an on-disk tier that survives restarts. Both tiers
+# are capped by bytes as well as entries, since an output=inline brood
+# response carries two full-resolution base64 PNGs; a response larger than
+# a tier's byte cap is not kept in that tier at all.
+RESULT_CACHE_SIZE = int(os.environ.get("RESULT_CACHE_SIZE", "32"))
+RESULT_CACHE_MB = float(os.environ.get("RESULT_CACHE_MB", "64"))
+RESULT_CACHE_TTL = int(os.environ.get("RESULT_CACHE_TTL", "3600"))
+RESULT_CACHE_DIR = os.environ.get("RESULT_CACHE_DIR", "")
+RESULT_CACHE_DISK_SIZE = int(os.environ.get("RESULT_CACHE_DISK_SIZE", "500"))
+RESULT_CACHE_DISK_MB = float(os.environ.get("RESULT_CACHE_DISK_MB", "512"))
+
+def model_fingerprint(weights, backend):
+    """Content hash of a checkpoint plus the backend it runs on"""
+    if backend is None or not os.path.exists(weights):
+        return None
+    digest = hashlib.sha256()
+    with open(weights, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            digest.update(chunk)
+    return f"{digest.hexdigest()[:16]}-{backend}"
+
+MODEL_VERSIONS = {
+    "queen": model_fingerprint('best-seg.pt', queen_backend),
+    "brood": model_fingerprint('best-od.pt', brood_backend)
+}
+
+class ResultCache:
+    """LRU + TTL cache of endpoint responses with an optional on-disk tier"""
+
+    def __init__(self, max_entries, ttl, directory="", max_disk_entries=0, max_bytes=0, max_disk_bytes=0):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.directory = directory
+        self.max_disk_entries = max_disk_entries
+        self.max_disk_bytes = max_disk_bytes
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._disk_writes = 0
+        self._disk_bytes_since_prune = 0
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+    def key(self, kind, file_content, **params):
+        """sha256 over the image bytes, model version and request parameters"""
+        digest = hashlib.sha256(file_content)
+        digest.update(json.dumps([kind, MODEL_VERSIONS.get(kind), params], sort_keys=True).encode())
+        return digest.hexdigest()
+
+    def _path(self, key):
+        return os.path.join(self.directory, key[:2], f"{key}.json")
+
+    def _read_disk(self, key):
+        """(response, size in bytes), or None"""
+        path = self._path(key)
+        try:
+            if time.time() - os.path.getmtime(path) > self.ttl:
+                os.remove(path)
+                return None
+            with open(path) as f:
+                body = f.read()
+            return json.loads(body), len(body)
+        except (OSError, ValueError):
+            return None
+
+    def _write_disk(self, key, body):
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'w') as f:
+            f.write(body)
+        os.replace(tmp_path, path)
+
+    def _prune_disk(self):
+        """Drop expired files, then the oldest ones beyond max_disk_entries or max_disk_bytes"""
+        files = []
+        for root, _, names in os.walk(self.directory):
+            for name in names:
+                path = os.path.join(root, name)
+                try:
+                    stat = os.stat(path)
+                    files.append((stat.st_mtime, stat.st_size, path))
+                except OSError:
+                    pass
+        # Newest first, so the oldest files are the ones over the caps
+        files.sort(reverse=True)
+        now = time.time()
+        kept = kept_bytes = 0
+        for mtime, size, path in files:
+            if now - mtime > self.ttl or kept >= self.max_disk_entries or kept_bytes + size > self.max_disk_bytes:
+                with contextlib.suppress(OSError):
+                    os.remove(path)
+            else:
+                kept += 1
+                kept_bytes += size
+
+    async def get(self, key):
+        entry = self._entries.get(key)
+        if entry is not None:
+            stored_at, response, size = entry
+            if time.monotonic() - stored_at <= self.ttl:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return dict(response)
+            del self._entries[key]
+            self._bytes -= size
+
+        if self.directory:
+            entry = await asyncio.to_thread(self._read_disk, key)
+            if entry is not None:
+                response, size = entry
+                self.disk_hits += 1
+                self._remember(key, response, size)
+                return dict(response)
+
+        self.misses += 1
+        return None
+
+    def _remember(self, key, response, size):
+        if self.max_entries <= 0 or size > self.max_bytes:
+            return
+        old = self._entries.pop(key, None)
+        if old is not None:
+            self._bytes -= old[2]
+        self._entries[key] = (time.monotonic(), response, size)
+        self._bytes += size
+        while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+            _, (_, _, evicted) = self._entries.popitem(last=False)
+            self._bytes -= evicted
+            self.evictions += 1
+
+    async def put(self, key, response):
+        # The serialized size is what the entry costs in either tier
+        body = await asyncio.to_thread(json.dumps, response)
+        self._remember(key, dict(response), len(body))
+        if self.directory and len(body) <= self.max_disk_bytes:
+            try:
+                await asyncio.to_thread(self._write_disk, key, body)
+                self._disk_writes += 1
+                self._disk_bytes_since_prune += len(body)
+                # Pruning walks the directory, so only do it every 50 writes or 10% of the byte cap
+                if self._disk_writes % 50 == 0 or self._disk_bytes_since_prune > self.max_disk_bytes / 10:
+                    self._disk_bytes_since_prune = 0
+                    await asyncio.to_thread(self._prune_disk)
+            except OSError as e:
+                logger.warning(f"Result cache write failed: {e}")
+
+    def stats(self):
+        lookups = self.hits + self.disk_hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "bytes": self._bytes,
+            "max_bytes": self.max_bytes,
+            "ttl_seconds": self.ttl,
+            "disk": bool(self.directory),
+            "hits": self.hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": round((self.hits + self.disk_hits) / lookups, 3) if lookups else 0
+        }
+
+result_cache = ResultCache(
+    RESULT_CACHE_SIZE, RESULT_CACHE_TTL, RESULT_CACHE_DIR, RESULT_CACHE_DISK_SIZE,
+    int(RESULT_CACHE_MB * 1024 * 1024), int(RESULT_CACHE_DISK_MB * 1024 * 1024)
+)
+
+# ==================== BLOB STORE ====================
+# Uploads are written once to a content-addressed store - the key is the
+# sha256 of the bytes, so re-uploads share one object and an object never
+# changes. Responses carry image_url / thumbnail_url (a JPEG preview made on
+# write) and the database keeps only the URL, not base64 in JSON.
+#   BLOB_BACKEND=local - files under BLOB_DIR, served by GET /blobs/{key}
+#   BLOB_BACKEND=s3    - BLOB_S3_BUCKET on AWS or any S3-compatible endpoint
+#                        (BLOB_S3_ENDPOINT); needs boto3
+#   BLOB_BACKEND=none  - disabled, responses carry no URLs
+# With BLOB_PUBLIC_URL set (a CDN or public bucket) URLs point there instead
+# of /blobs. If the S3 backend cannot be set up the local one is used.
+# Local blobs do not survive a rebuild of the Space; use S3 for durability.
+BLOB_BACKEND = os.environ.get("BLOB_BACKEND", "local").lower()
+BLOB_DIR = os.environ.get("BLOB_DIR", "/tmp/ibrood-blobs")
+BLOB_S3_BUCKET = os.environ.get("BLOB_S3_BUCKET", "")
+BLOB_S3_ENDPOINT = os.environ.get("BLOB_S3_ENDPOINT", "")
+BLOB_S3_PREFIX = os.environ.get("BLOB_S3_PREFIX", "")
+BLOB_PUBLIC_URL = os.environ.get("BLOB_PUBLIC_URL", "").rstrip("/")
+THUMBNAIL_SIZE = int(os.environ.get("THUMBNAIL_SIZE", "320"))
+BLOB_MAX_AGE = 31536000
+BLOB_EXTENSIONS = {"JPEG": "jpg", "PNG": "png", "WEBP": "webp"}
+BLOB_MEDIA_TYPES = {"jpg": "image/jpeg", "png": "image/png", "webp": "image/webp", "json": "application/json"}
+BLOB_KEY_PATTERN = re.compile(r"^(thumbs/)?[0-9a-f]{2}/([0-9a-f]{64})\.(jpg|png|webp)$")
+
+class LocalBlobBackend:
+    """Blobs as files under a directory, fanned out by the first two hex digits"""
+
+    name = "local"
+
+    def __init__(self, directory):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, key):
+        return os.path.join(self.directory, key)
+
+    def size(self, key):
+        """Size in bytes, or None if the blob does not exist"""
+        try:
+            return os.path.getsize(self._path(key))
+        except OSError:
+            return None
+
+    def write(self, key, content, media_type):
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        with open(tmp_path, 'wb') as f:
+            f.write(content)
+        os.replace(tmp_path, path)
+
+    def read(self, key, start, end):
+        """Bytes start..end inclusive"""
+        with open(self._path(key), 'rb') as f:
+            f.seek(start)
+            return f.read(end - start + 1)
+
+class S3BlobBackend:
+    """Blobs as objects in an S3 (or S3-compatible) bucket"""
+
+    name = "s3"
+
+    def __init__(self, bucket, endpoint, prefix):
+        import boto3
+        from botocore.exceptions import ClientError
+        self.client = boto3.client("s3", endpoint_url=endpoint or None)
+        self.client_error = ClientError
+        self.bucket = bucket
+        self.prefix = prefix
+
+    def size(self, key):
+        try:
+            return self.client.head_object(Bucket=self.bucket, Key=self.prefix + key)["ContentLength"]
+        except self.client_error:
+            return None
+
+    def write(self, key, content, media_type):
+        self.client.put_object(
+            Bucket=self.bucket, Key=self.prefix + key, Body=content, ContentType=media_type,
+            CacheControl=f"public, max-age={BLOB_MAX_AGE}, immutable"
+        )
+
+    def read(self, key, start, end):
+        obj = self.client.get_object(Bucket=self.bucket, Key=self.prefix + key, Range=f"bytes={start}-{end}")
+        return obj["Body"].read()
+
+class BlobStore:
+    """Content-addressed image store that makes a thumbnail for every image it writes"""
+
+    def __init__(self, backend, public_url=""):
+        self.backend = backend
+        self.public_url = public_url
+        self.writes = 0
+        self.dedup_hits = 0
+        self.bytes_written = 0
+
+    @staticmethod
+    def key(digest, ext, thumbnail=False):
+        return f"{'thumbs/' if thumbnail else ''}{digest[:2]}/{digest}.{ext}"
+
+    def url(self, key):
+        return f"{self.public_url or '/blobs'}/{key}"
+
+    def _write_once(self, key, content):
+        if self.backend.size(key) is not None:
+            self.dedup_hits += 1
+            return
+        self.backend.write(key, content, BLOB_MEDIA_TYPES[key.rsplit(".", 1)[1]])
+        self.writes += 1
+        self.bytes_written += len(content)
+
+    def put_image(self, content):
+        """Store an encoded image and its thumbnail; returns image_url and thumbnail_url"""
+        image = Image.open(io.BytesIO(content))
+        ext = BLOB_EXTENSIONS.get(image.format)
+        if ext is None:
+            # BMP, TIFF, ... are stored as JPEG so every blob is browser-viewable
+            buffer = io.BytesIO()
+            image.convert("RGB").save(buffer, format="JPEG", quality=90)
+            content, ext = buffer.getvalue(), "jpg"
+        digest = hashlib.sha256(content).hexdigest()
+        key = self.key(digest, ext)
+        thumbnail_key = self.key(digest, "jpg", thumbnail=True)
+        self._write_once(key, content)
+
+        if self.backend.size(thumbnail_key) is None:
+            # The thumbnail carries no EXIF, so it is stored upright
+            orientation = exif_orientation(image)
+            # draft() lets the JPEG decoder downscale while decoding
+            image.draft("RGB", (THUMBNAIL_SIZE, THUMBNAIL_SIZE))
+            thumbnail = upright(image.convert("RGB"), orientation)
+            thumbnail.thumbnail((THUMBNAIL_SIZE, THUMBNAIL_SIZE))
+            buffer = io.BytesIO()
+            thumbnail.save(buffer, format="JPEG", quality=80, optimize=True)
+            self._write_once(thumbnail_key, buffer.getvalue())
+        return {"image_url": self.url(key), "thumbnail_url": self.url(thumbnail_key)}
+
+    def key_of(self, url):
+        """Blob key of a URL returned by this store"""
+        return url[len(self.url("")):]
+
+    def read_all(self, key):
+        """Whole blob, or None if it does not exist"""
+        size = self.backend.size(key)
+        return None if size is None else self.backend.read(key, 0, size - 1)
+
+    def put_blob(self, key, content):
+        """Write a blob under a key outside the served image keys (results/...)"""
+        self._write_once(key, content)
+
+    def put_data_url(self, data_url):
+        """Store a data:image/...;base64 string; returns its blob URL"""
+        return self.put_image(base64.b64decode(data_url.split(",", 1)[1]))["image_url"]
+
+    def stats(self):
+        return {
+            "backend": self.backend.name,
+            "public_url": self.public_url or None,
+            "writes": self.writes,
+            "dedup_hits": self.dedup_hits,
+            "bytes_written": self.bytes_written
+        }
+
+def create_blob_store():
+    if BLOB_BACKEND == "none":
+        return None
+    if BLOB_BACKEND == "s3":
+        try:
+            return BlobStore(S3BlobBackend(BLOB_S3_BUCKET, BLOB_S3_ENDPOINT, BLOB_S3_PREFIX), BLOB_PUBLIC_URL)
+        except Exception as e:
+            logger.error(f"S3 blob backend unavailable ({e}), using local storage in '{BLOB_DIR}'")
+    elif BLOB_BACKEND != "local":
+        logger.error(f"Unknown BLOB_BACKEND '{BLOB_BACKEND}', using local")
+    try:
+        return BlobStore(LocalBlobBackend(BLOB_DIR), BLOB_PUBLIC_URL)
+    except OSError as e:
+        logger.error(f"Blob directory '{BLOB_DIR}' unusable ({e}), blob store disabled")
+        return None
+
+blob_store = create_blob_store()
+
+async def store_images(response, file_content, annotated=()):
+    """Add blob URLs for the upload (image_url, thumbnail_url) and for the inline annotated images
+    named in `annotated` (<field>_url) to a response. No-op when the store is disabled or fails."""
+    if blob_store is None:
+        return
+    
+    def write():
+        urls = blob_store.put_image(file_content)
+        for field in annotated:
+            if str(response.get(field, "")).startswith("data:image/"):
+                urls[f"{field}_url"] = blob_store.put_data_url(response[field])
+        return urls
+    
+    try:
+        response.update(await asyncio.to_thread(write))
+    except Exception as e:
+        logger.warning(f"Blob store write failed: {e}")
+
+def parse_byte_range(header, size):
+    """(start, end) for a single-range Range header, None to send the whole blob, or "unsatisfiable" """
+    match = re.fullmatch(r"bytes=(\d*)-(\d*)", header.strip())
+    if match is None or match.groups() == ("", ""):
+        return None  # malformed or multi-range: ignored, per RFC 9110
+    first, last = match.groups()
+    if not first:
+        length = int(last)
+        return (max(0, size - length), size - 1) if length and size else "unsatisfiable"
+    start, end = int(first), min(int(last), size - 1) if last else size - 1
+    return (start, end) if start < size and start <= end else "unsatisfiable"
+
+@app.get("/blobs/{key:path}")
+async def get_blob(key: str, request: Request):
+    """Stored image or thumbnail, with immutable caching, ETag revalidation and byte ranges"""
+    match = BLOB_KEY_PATTERN.match(key)
+    if blob_store is None or match is None:
+        return JSONResponse({"error": "Blob not found"}, status_code=404)
+    
+    etag = f'"{"t-" if match.group(1) else ""}{match.group(2)}"'
+    headers = {
+        "Cache-Control": f"public, max-age={BLOB_MAX_AGE}, immutable",
+        "ETag": etag,
+        "Accept-Ranges": "bytes"
+    }
+    if etag in request.headers.get("if-none-match", ""):
+        return Response(status_code=304, headers=headers)
+    
+    try:
+        size = await asyncio.to_thread(blob_store.backend.size, key)
+        if size is None:
+            return JSONResponse({"error": "Blob not found"}, status_code=404)
+        
+        byte_range = parse_byte_range(request.headers.get("range", ""), size) if "range" in request.headers else None
+        if byte_range == "unsatisfiable":
+            return Response(status_code=416, headers={**headers, "Content-Range": f"bytes */{size}"})
+        start, end = byte_range or (0, size - 1)
+        content = await asyncio.to_thread(blob_store.backend.read, key, start, end)
+    except Exception as e:
+        logger.error(f"Error reading blob {key}: {str(e)}")
+        return JSONResponse({"error": str(e)}, status_code=500)
+    
+    if byte_range:
+        headers["Content-Range"] = f"bytes {start}-{end}/{size}"
+    return Response(content, status_code=206 if byte_range else 200,
+                    media_type=BLOB_MEDIA_TYPES[match.group(3)], headers=headers)
+
 # ==================== CLASS CONFIGURATIONS ====================
 # Queen Cell Classes
 QUEEN_CLASS_NAMES = {
@@ -242,6 +919,21 @@ async def health_check():
         "brood_model_loaded": brood_model is not None,
         "queen_model_file_exists": os.path.exists('best-seg.pt'),
         "brood_model_file_exists": os.path.exists('best-od.pt'),
+        "inference_backend": {"configured": INFERENCE_BACKEND, "queen": queen_backend, "brood": brood_backend},
+        "inference": inference_executor.stats(),
+        "batching": {
+            "queen": queen_batcher.stats(),
+            "brood": brood_batcher.stats(),
+            "queen_int8": queen_int8_batcher.stats(),
+            "brood_int8": brood_int8_batcher.stats()
+        },
+        "result_cache": result_cache.stats(),
+        "annotation_store": annotation_store.stats(),
+        "blob_store": blob_store.stats() if blob_store is not None else None,
+        "jobs": await job_queue.stats(),
+        "analyze": analyze_metrics.snapshot(),
+        "ingest": ingest_metrics.stats(),
+        "int8_models_loaded": {"queen": queen_model_int8 is not None, "brood": brood_model_int8 is not None},
         "files_in_directory": current_dir_files
     }
 
@@ -255,75 +947,65 @@ def optimize_image_for_inference(image, max_size=1280):
         return image.resize(new_size, Image.LANCZOS), ratio
     return image, 1.0
 
+def upload_rejected_response(e):
+    """413 (too large) or 400 (not an image) for an upload refused by ingest.py"""
+    return JSONResponse({"error": "Upload rejected", "message": str(e)}, status_code=e.status_code)
+
 # ==================== DETECTION FUNCTIONS ====================
+def result_polygons(result, image_size, epsilon_ratio):
+    """Mask polygons of a segmentation result (see polygons.py), [] without masks"""
+    if getattr(result, 'masks', None) is None:
+        return []
+    try:
+        mask_data = result.masks.data
+        boxes = letterbox_boxes(result.boxes.xyxy.cpu().numpy(), result.orig_shape, mask_data.shape[1:])
+        return mask_polygons(mask_data, image_size, epsilon_ratio, boxes)
+    except Exception as e:
+        logger.warning(f"Mask extraction failed: {e}")
+        return []
+
+def frame_polygons(results, image_size, epsilon_ratio):
+    """Polygon (or None) for every detection, in the order of Detections.from_results"""
+    polygons = []
+    for result in results:
+        count = len(result.boxes) if result.boxes is not None else 0
+        found = result_polygons(result, image_size, epsilon_ratio)[:count]
+        polygons.extend(found + [None] * (count - len(found)))
+    return polygons
+
 def process_queen_detection(results, original_image):
     """Process YOLO results for Queen Cell detection with segmentation masks"""
-    detections = []
-    
     img_array = np.array(original_image)
     if len(img_array.shape) == 3:
         img_array = cv2.cvtColor(img_array, cv2.COLOR_RGB2BGR)
     
-    for result in results:
-        if result.boxes is not None:
-            boxes_data = result.boxes
-            masks_data = result.masks if hasattr(result, 'masks') and result.masks is not None else None
-            
-            for idx, box in enumerate(boxes_data):
-                cls = int(box.cls[0])
-                conf = float(box.conf[0])
-                x1, y1, x2, y2 = map(int, box.xyxy[0].tolist())
-                
-                detection = {
-                    "confidence": conf,
-                    "class": cls,
-                    "bbox": [x1, y1, x2, y2]
-                }
-                
-                # Extract segmentation mask if available
-                if masks_data is not None and idx < len(masks_data.data):
-                    try:
-                        mask = masks_data.data[idx].cpu().numpy()
-                        mask_height, mask_width = mask.shape
-                        
-                        # Convert mask to polygon points for frontend rendering
-                        binary_mask = (mask * 255).astype(np.uint8)
-                        contours, _ = cv2.findContours(binary_mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
-                        
-                        if contours:
-                            # Get the largest contour (main mask area)
-                            largest_contour = max(contours, key=cv2.contourArea)
-                            # Simplify the contour to reduce points
-                            epsilon = 0.005 * cv2.arcLength(largest_contour, True)
-                            approx = cv2.approxPolyDP(largest_contour, epsilon, True)
-                            
-                            # Scale contour points to original image size
-                            # PIL Image.size returns (width, height)
-                            img_width, img_height = original_image.size
-                            scale_x = img_width / mask_width
-                            scale_y = img_height / mask_height
-                            
-                            # Convert to list of [x, y] points
-                            polygon_points = []
-                            for point in approx:
-                                px, py = point[0]
-                                polygon_points.append([float(px * scale_x), float(py * scale_y)])
-                            
-                            detection["mask"] = {
-                                "type": "polygon",
-                                "points": polygon_points,
-                                "imageShape": [img_height, img_width]
-                            }
-                    except Exception as e:
-                        logger.warning(f"Mask extraction failed: {e}")
-                
-                detections.append(detection)
-                
-                color = QUEEN_COLORS.get(cls, (255, 255, 255))
-                cv2.rectangle(img_array, (x1, y1), (x2, y2), color, 2)
-                
-                label = f"{QUEEN_CLASS_NAMES.get(cls, 'Unknown')} {conf:.0%}"
-                cv2.putText(img_array, label, (x1, y1-10), cv2.FONT_HERSHEY_SIMPLEX, 0.5, color, 2)
+    img_width, img_height = original_image.size
+    columns = Detections.from_results(results)
+    polygons = frame_polygons(results, original_image.size, epsilon_ratio=0.005)
+    
+    detections = []
+    for idx, (conf, cls, bbox) in enumerate(columns.records()):
+        detection = {
+            "confidence": conf,
+            "class": cls,
+            "bbox": bbox
+        }
+        
+        if polygons[idx] is not None:
+            detection["mask"] = {
+                "type": "polygon",
+                "points": polygons[idx],
+                "imageShape": [img_height, img_width]
+            }
+        
+        detections.append(detection)
+        
+        x1, y1, x2, y2 = bbox
+        color = QUEEN_COLORS.get(cls, (255, 255, 255))
+        cv2.rectangle(img_array, (x1, y1), (x2, y2), color, 2)
+        
+        label = f"{QUEEN_CLASS_NAMES.get(cls, 'Unknown')} {conf:.0%}"
+        cv2.putText(img_array, label, (x1, y1-10), cv2.FONT_HERSHEY_SIMPLEX, 0.5, color, 2)
     
     if len(img_array.shape) == 3:
         img_array = cv2.cvtColor(img_array, cv2.COLOR_BGR2RGB)
@@ -340,251 +1022,110 @@ def process_queen_detection(results, original_image):
         "annotated_image": f"data:image/jpeg;base64,{img_base64}"
     }
 
-def process_brood_detection(results, original_image, show_labels=True):
-    """Process YOLO results for Brood detection with health assessment"""
-    detections = []
-    counts = {"egg": 0, "larva": 0, "pupa": 0, "empty_comb": 0}
-    
-    img_array = np.array(original_image)
-    if len(img_array.shape) == 3:
-        img_array = cv2.cvtColor(img_array, cv2.COLOR_RGB2BGR)
-    
-    # Styling - THIN lines for clean modern look like the screenshot
-    thickness = 1  # Thin line
-    font_scale = 0.35  # Small font
-    font_thickness = 1
-    
-    for result in results:
-        if result.boxes is not None:
-            boxes_data = result.boxes
-            
-            for idx, box in enumerate(boxes_data):
-                cls = int(box.cls[0])
-                conf = float(box.conf[0])
-                x1, y1, x2, y2 = map(int, box.xyxy[0].tolist())
-                
-                class_name = BROOD_CLASS_NAMES.get(cls, 'unknown')
-
-                detection = {
-                    "confidence": conf,
-                    "class": cls,
-                    "class_name": class_name,
-                    "bbox": [x1, y1, x2, y2],
-                    "attributes": BROOD_CLASS_ATTRIBUTES.get(class_name, {})
-                }
+# ==================== QUEEN DETECTION ====================
+async def run_queen_detection(file_content, batcher):
+    """Decode and annotate on the inference pool, predict through the queen batcher"""
+    _, optimized_image, _ = await inference_executor.run(prepare_image, file_content)
+    result = await batcher.predict(optimized_image)
+    return await inference_executor.run(process_queen_detection, [result], optimized_image)
 
-                detections.append(detection)
+def queen_request_error(precision):
+    """Error response for a queen detection request that can't run, else None"""
+    if queen_model is None:
+        return JSONResponse({
+            "error": "Queen model not loaded", 
+            "message": "Model file 'best-seg.pt' may be missing or corrupted."
+        }, status_code=500)
+    if select_batcher("queen", precision) is None:
+        return invalid_precision_response(precision)
+    return None
 
-                # Update counts
-                if class_name in counts:
-                    counts[class_name] += 1
-                elif class_name == "empty_comb":
-                    counts["empty_comb"] += 1
-                
-                # Draw THIN bounding box - clean modern style
-                color = BROOD_COLORS.get(cls, (255, 255, 255))
-                cv2.rectangle(img_array, (x1, y1), (x2, y2), color, thickness)
-                
-                # Only draw labels if show_labels is True - JUST PERCENTAGE
-                if show_labels:
-                    label = f"{int(conf * 100)}%"  # Just percentage, no class name
-                    text_color = BROOD_TEXT_COLORS.get(cls, (255, 255, 255))
-                    # Position inside box at top-left corner
-                    cv2.putText(img_array, label, (x1 + 2, y1 + 12), cv2.FONT_HERSHEY_SIMPLEX, font_scale, text_color, font_thickness)
-    
-    if len(img_array.shape) == 3:
-        img_array = cv2.cvtColor(img_array, cv2.COLOR_BGR2RGB)
-    
-    annotated_image = Image.fromarray(img_array)
-    
-    buffered = io.BytesIO()
-    annotated_image.save(buffered, format="PNG")  # PNG for better quality
-    img_base64 = base64.b64encode(buffered.getvalue()).decode()
+async def queen_detection(file_content, precision="fp32", progress=None):
+    """The /queen_detect response for an upload, from the result cache or a new inference"""
+    open_upload(file_content)  # size and bomb guards before any slot or cache work
+    cache_key = result_cache.key("queen", file_content, precision=precision)
+    cached = await result_cache.get(cache_key)
+    if cached is not None:
+        logger.info(f"Queen detection served from cache: {cached['count']} detections")
+        return cached
     
-    # Calculate health assessment
-    total_brood = counts["egg"] + counts["larva"] + counts["pupa"]
-    # Try to get empty cells if available, otherwise fallback to only brood
-    total_cells = total_brood
-    if "empty_comb" in counts:
-        total_cells += counts["empty_comb"]
-    
-    health_status = "UNKNOWN"
-    health_score = 0
-    recommendations = []
-    
-    if total_cells > 0:
-        # Calculate brood coverage as a percentage
-        brood_coverage = (total_brood / total_cells) * 100
-
-        # Calculate health based on brood distribution (actual computation)
-        egg_ratio = counts["egg"] / total_brood if total_brood > 0 else 0
-        larva_ratio = counts["larva"] / total_brood if total_brood > 0 else 0
-        pupa_ratio = counts["pupa"] / total_brood if total_brood > 0 else 0
-
-        # Score for balanced distribution (max 60)
-        ideal = 1/3
-        balance_penalty = (
-            abs(egg_ratio - ideal) + abs(larva_ratio - ideal) + abs(pupa_ratio - ideal)
-        )
-        balance_score = max(0, 60 - int(balance_penalty * 90))
-
-        # Score for brood coverage (max 40 for 100% coverage)
-        brood_score = min(40, int(brood_coverage * 0.4))
-
-        # Penalty for missing any stage
-        missing_penalty = 0
-        if counts["egg"] == 0 or counts["larva"] == 0 or counts["pupa"] == 0:
-            missing_penalty = 15
-
-        health_score = max(0, balance_score + brood_score - missing_penalty)
-
-        # Assign status
-        if health_score >= 85:
-            health_status = "EXCELLENT"
-            recommendations.append("Colony is thriving with excellent brood pattern")
-        elif health_score >= 70:
-            health_status = "GOOD"
-            recommendations.append("Healthy brood pattern - continue regular monitoring")
-        elif health_score >= 50:
-            health_status = "FAIR"
-            recommendations.append("Moderate brood presence - check queen activity")
-        else:
-            health_status = "POOR"
-            recommendations.append("Low brood count - inspect for queen issues")
-
-        # Additional recommendations based on counts
-        if counts["egg"] == 0 and total_brood > 0:
-            recommendations.append("No eggs detected - verify queen is laying")
-        if counts["larva"] > counts["pupa"] * 3:
-            recommendations.append("High larva count - ensure adequate food supply")
-        if counts["pupa"] == 0 and counts["larva"] > 0:
-            recommendations.append("No pupae detected - monitor for development issues")
+    async with inference_executor.slot():
+        if progress:
+            await progress("inference")
+        response = await run_queen_detection(file_content, select_batcher("queen", precision))
+        response["precision"] = precision
+        if progress:
+            await progress("storing")
+        await store_images(response, file_content, annotated=("annotated_image",))
+    await result_cache.put(cache_key, response)
     
-    return {
-        "detections": detections,
-        "count": len(detections),
-        "counts": counts,
-        "health": {
-            "status": health_status,
-            "score": health_score,
-            "total_brood": total_brood,
-            "total_cells": total_cells
-        },
-        "recommendations": recommendations if recommendations else ["Continue regular monitoring"],
-        "annotated_image": f"data:image/png;base64,{img_base64}"
-    }
+    logger.info(f"Queen detection completed: {response['count']} detections")
+    return response
 
-# ==================== QUEEN DETECTION ====================
 @app.post("/queen_detect")
-async def detect_queen(file: UploadFile = File(...)):
+async def detect_queen(file: UploadFile = File(...), precision: str = "fp32"):
     try:
-        if queen_model is None:
-            return JSONResponse({
-                "error": "Queen model not loaded", 
-                "message": "Model file 'best-seg.pt' may be missing or corrupted."
-            }, status_code=500)
+        error = queen_request_error(precision)
+        if error is not None:
+            return error
             
-        logger.info("Starting Queen Cell Detection...")
-        
-        file_content = await file.read()
-        image = Image.open(io.BytesIO(file_content))
-        
-        # Optimize for faster inference
-        optimized_image, _ = optimize_image_for_inference(image, max_size=1280)
-        
-        results = queen_model(optimized_image, verbose=False)
-        response = process_queen_detection(results, optimized_image)
-        
-        logger.info(f"Queen detection completed: {response['count']} detections")
-        return response
+        logger.info(f"Starting Queen Cell Detection ({precision})...")
+        return await queen_detection(await file.read(), precision)
         
+    except InferenceQueueFull:
+        logger.warning("Queen detection rejected: inference queue full")
+        return queue_full_response()
+    except UploadRejected as e:
+        return upload_rejected_response(e)
     except Exception as e:
         logger.error(f"Error in queen detection: {str(e)}")
         return JSONResponse({"error": str(e)}, status_code=500)
 
-def process_brood_detection_optimized(results, original_image, optimized_image, scale_ratio):
-    """Optimized: Process YOLO results and generate both annotated versions in one pass"""
-    detections = []
-    counts = {"egg": 0, "larva": 0, "pupa": 0}
-    
-    # Work on original image for output quality
-    img_array = np.array(original_image)
-    if len(img_array.shape) == 3:
-        img_array = cv2.cvtColor(img_array, cv2.COLOR_RGB2BGR)
-    
-    img_with_labels = img_array.copy()
-    img_no_labels = img_array.copy()
-    
-    thickness = 1
-    font_scale = 0.35
-    font_thickness = 1
-    
-    # Estimate total detectable cells using grid approach
-    img_height, img_width = img_array.shape[:2]
+def make_brood_detection(cls, conf, bbox):
+    class_name = BROOD_CLASS_NAMES.get(cls, 'unknown')
+    return {
+        "confidence": conf,
+        "class": cls,
+        "class_name": class_name,
+        "bbox": bbox,
+        "attributes": BROOD_CLASS_ATTRIBUTES.get(class_name, {})
+    }
+
+def brood_columns_json(columns, scale_ratio=1.0):
+    """JSON brood detections in original image coordinates plus per-class counts"""
+    detections = [make_brood_detection(cls, conf, bbox) for conf, cls, bbox in columns.records(scale_ratio)]
+    return detections, columns.class_counts(BROOD_CLASS_NAMES)
+
+def extract_brood_detections(results, scale_ratio):
+    """Collect brood detections in original image coordinates plus per-class counts"""
+    return brood_columns_json(Detections.from_results(results), scale_ratio)
+
+def estimate_total_cells(img_width, img_height):
+    """Estimate total detectable cells using grid approach"""
     # Assume average cell size ~40x40 pixels (adjust based on your images)
     avg_cell_size = 40
     grid_cols = img_width // avg_cell_size
     grid_rows = img_height // avg_cell_size
-    estimated_total_cells = grid_cols * grid_rows
-    
-    for result in results:
-        if result.boxes is not None:
-            for idx, box in enumerate(result.boxes):
-                cls = int(box.cls[0])
-                conf = float(box.conf[0])
-                # Scale coordinates back to original image size
-                x1, y1, x2, y2 = map(int, box.xyxy[0].tolist())
-                if scale_ratio != 1.0:
-                    x1 = int(x1 / scale_ratio)
-                    y1 = int(y1 / scale_ratio)
-                    x2 = int(x2 / scale_ratio)
-                    y2 = int(y2 / scale_ratio)
-                
-                class_name = BROOD_CLASS_NAMES.get(cls, 'unknown')
-                
-                detection = {
-                    "confidence": conf,
-                    "class": cls,
-                    "class_name": class_name,
-                    "bbox": [x1, y1, x2, y2],
-                    "attributes": BROOD_CLASS_ATTRIBUTES.get(class_name, {})
-                }
-                detections.append(detection)
-                
-                if class_name in counts:
-                    counts[class_name] += 1
-                
-                color = BROOD_COLORS.get(cls, (255, 255, 255))
-                text_color = BROOD_TEXT_COLORS.get(cls, (255, 255, 255))
-                
-                # Draw on both images
-                cv2.rectangle(img_no_labels, (x1, y1), (x2, y2), color, thickness)
-                cv2.rectangle(img_with_labels, (x1, y1), (x2, y2), color, thickness)
-                
-                # Labels only on one version
-                label = f"{int(conf * 100)}%"
-                cv2.putText(img_with_labels, label, (x1 + 2, y1 + 12), cv2.FONT_HERSHEY_SIMPLEX, font_scale, text_color, font_thickness)
-    
-    # Convert back to RGB
-    img_no_labels = cv2.cvtColor(img_no_labels, cv2.COLOR_BGR2RGB)
-    img_with_labels = cv2.cvtColor(img_with_labels, cv2.COLOR_BGR2RGB)
-    
-    # Encode images
-    buf1 = io.BytesIO()
-    Image.fromarray(img_no_labels).save(buf1, format="PNG", optimize=True)
-    img_no_labels_b64 = base64.b64encode(buf1.getvalue()).decode()
-    
-    buf2 = io.BytesIO()
-    Image.fromarray(img_with_labels).save(buf2, format="PNG", optimize=True)
-    img_with_labels_b64 = base64.b64encode(buf2.getvalue()).decode()
-    
-    # Health assessment with DATA-DRIVEN brood coverage
+    return grid_cols * grid_rows
+
+def brood_health_status(health_score):
+    """Map a 0-100 health score to its status label"""
+    if health_score >= 85:
+        return "EXCELLENT"
+    elif health_score >= 70:
+        return "GOOD"
+    elif health_score >= 50:
+        return "FAIR"
+    return "POOR"
+
+def assess_brood_health(counts, estimated_total_cells):
+    """Health assessment with DATA-DRIVEN brood coverage"""
     total_brood = sum(counts.values())
     health_status, health_score, brood_coverage, recommendations = "UNKNOWN", 0, 0, []
     
     if total_brood > 0:
         # DATA-DRIVEN: Brood Coverage = (Detected Brood / Estimated Total Cells) × 100
-        brood_coverage = min(100, round((total_brood / estimated_total_cells) * 100, 1))
+        brood_coverage = min(100, round((total_brood / max(1, estimated_total_cells)) * 100, 1))
         
         egg_r = counts["egg"] / total_brood
         larva_r = counts["larva"] / total_brood
@@ -610,17 +1151,14 @@ def process_brood_detection_optimized(results, original_image, optimized_image,
         health_score = max(0, min(100, base_score + count_score + coverage_score + balance_score - missing_penalty))
         
         # Assign status based on score
-        if health_score >= 85:
-            health_status = "EXCELLENT"
+        health_status = brood_health_status(health_score)
+        if health_status == "EXCELLENT":
             recommendations.append("Colony is thriving with excellent brood pattern")
-        elif health_score >= 70:
-            health_status = "GOOD"
+        elif health_status == "GOOD":
             recommendations.append("Healthy brood pattern - continue regular monitoring")
-        elif health_score >= 50:
-            health_status = "FAIR"
+        elif health_status == "FAIR":
             recommendations.append("Moderate brood presence - check queen activity")
         else:
-            health_status = "POOR"
             recommendations.append("Try capturing the whole frame to detect more cells or ensure image is clear")
         
         # Additional recommendations
@@ -631,74 +1169,544 @@ def process_brood_detection_optimized(results, original_image, optimized_image,
         if counts["pupa"] == 0 and counts["larva"] > 0:
             recommendations.append("No pupae detected - monitor for development issues")
     
+    return health_status, health_score, brood_coverage, recommendations
+
+def process_brood_detection_optimized(results, original_image, optimized_image, scale_ratio):
+    """Optimized: Process YOLO results and generate both annotated versions in one pass"""
+    detections, counts = extract_brood_detections(results, scale_ratio)
+    return render_brood_response(detections, counts, original_image)
+
+def summarize_brood(detections, counts, image_size):
+    """Brood counts and health for detections in original coordinates, without any image encoding"""
+    estimated_total_cells = estimate_total_cells(*image_size)
+    total_brood = sum(counts.values())
+    health_status, health_score, brood_coverage, recommendations = assess_brood_health(counts, estimated_total_cells)
+    
     return {
         "detections": detections,
         "count": len(detections),
         "counts": counts,
         "health": {"status": health_status, "score": health_score, "total_brood": total_brood, "total_cells": estimated_total_cells},
         "broodCoverage": brood_coverage,
-        "recommendations": recommendations or ["Continue regular monitoring"],
-        "annotated_image": f"data:image/png;base64,{img_no_labels_b64}",
-        "annotated_image_with_labels": f"data:image/png;base64,{img_with_labels_b64}"
+        "recommendations": recommendations or ["Continue regular monitoring"]
     }
 
+def process_brood_geometry(results, image_size, scale_ratio):
+    """Brood detections and health for one frame without drawing or encoding any image"""
+    detections, counts = extract_brood_detections(results, scale_ratio)
+    return summarize_brood(detections, counts, image_size)
+
+def to_bgr_array(image):
+    img_array = np.array(image)
+    if len(img_array.shape) == 3:
+        img_array = cv2.cvtColor(img_array, cv2.COLOR_RGB2BGR)
+    return img_array
+
+def draw_brood_annotations(img_array, detections, show_labels, ratio=1.0):
+    """Draw brood boxes (and confidence labels) in place on a BGR array, boxes scaled by ratio"""
+    thickness = 1
+    font_scale = 0.35
+    font_thickness = 1
+    
+    for detection in detections:
+        cls = detection["class"]
+        x1, y1, x2, y2 = detection["bbox"]
+        if ratio != 1.0:
+            x1, y1, x2, y2 = int(x1 * ratio), int(y1 * ratio), int(x2 * ratio), int(y2 * ratio)
+        
+        color = BROOD_COLORS.get(cls, (255, 255, 255))
+        cv2.rectangle(img_array, (x1, y1), (x2, y2), color, thickness)
+        
+        if show_labels:
+            text_color = BROOD_TEXT_COLORS.get(cls, (255, 255, 255))
+            label = f"{int(detection['confidence'] * 100)}%"
+            cv2.putText(img_array, label, (x1 + 2, y1 + 12), cv2.FONT_HERSHEY_SIMPLEX, font_scale, text_color, font_thickness)
+    
+    if len(img_array.shape) == 3:
+        img_array = cv2.cvtColor(img_array, cv2.COLOR_BGR2RGB)
+    return img_array
+
+def encode_image(img_array, image_format="PNG", quality=None):
+    """Encode an RGB array, PNG optimized or JPEG/WEBP at the given quality"""
+    buf = io.BytesIO()
+    if image_format == "PNG":
+        Image.fromarray(img_array).save(buf, format="PNG", optimize=True)
+    else:
+        Image.fromarray(img_array).save(buf, format=image_format, quality=quality)
+    return buf.getvalue()
+
+def render_brood_response(detections, counts, original_image):
+    """Draw both annotated versions and assess health for detections in original coordinates"""
+    response = summarize_brood(detections, counts, original_image.size)
+    
+    # Work on original image for output quality
+    img_array = to_bgr_array(original_image)
+    img_no_labels = draw_brood_annotations(img_array.copy(), detections, show_labels=False)
+    img_with_labels = draw_brood_annotations(img_array, detections, show_labels=True)
+    
+    response["annotated_image"] = f"data:image/png;base64,{base64.b64encode(encode_image(img_no_labels)).decode()}"
+    response["annotated_image_with_labels"] = f"data:image/png;base64,{base64.b64encode(encode_image(img_with_labels)).decode()}"
+    return response
+
+# ==================== TILED BROOD DETECTION ====================
+# Full-frame shots are several thousand pixels wide, so shrinking them to
+# 1280px leaves eggs only a few pixels across. Tiled mode runs the brood model
+# on overlapping full-resolution tiles instead and merges the boxes back in
+# original image coordinates.
+TILE_SIZE = int(os.environ.get("TILE_SIZE", "640"))
+TILE_OVERLAP = float(os.environ.get("TILE_OVERLAP", "0.2"))
+# Boxes of the same class whose intersection covers this much of the smaller
+# box are duplicates. Intersection-over-smaller also catches boxes that were
+# cut off at a tile edge, which plain IoU misses.
+TILE_MERGE_THRESHOLD = float(os.environ.get("TILE_MERGE_THRESHOLD", "0.5"))
+
+def tile_origins(length, tile_size, stride):
+    """Tile start offsets along one axis, with the last tile flush to the edge"""
+    if length <= tile_size:
+        return [0]
+    origins = list(range(0, length - tile_size, stride))
+    origins.append(length - tile_size)
+    return origins
+
+def slice_tiles(image, tile_size, overlap):
+    """Crop overlapping tiles covering the whole image as (x0, y0, tile) tuples"""
+    width, height = image.size
+    stride = max(1, int(tile_size * (1 - overlap)))
+    return [
+        (x0, y0, image.crop((x0, y0, min(x0 + tile_size, width), min(y0 + tile_size, height))))
+        for y0 in tile_origins(height, tile_size, stride)
+        for x0 in tile_origins(width, tile_size, stride)
+    ]
+
+def merge_tile_detections(boxes, scores, classes, threshold):
+    """Per-class greedy NMS on intersection-over-smaller, returning kept indices"""
+    areas = np.maximum(0, boxes[:, 2] - boxes[:, 0]) * np.maximum(0, boxes[:, 3] - boxes[:, 1])
+    keep = []
+    for cls in np.unique(classes):
+        order = np.where(classes == cls)[0]
+        order = order[np.argsort(-scores[order], kind="stable")]
+        while order.size:
+            best, rest = order[0], order[1:]
+            keep.append(best)
+            iw = np.maximum(0, np.minimum(boxes[best, 2], boxes[rest, 2]) - np.maximum(boxes[best, 0], boxes[rest, 0]))
+            ih = np.maximum(0, np.minimum(boxes[best, 3], boxes[rest, 3]) - np.maximum(boxes[best, 1], boxes[rest, 1]))
+            ios = (iw * ih) / np.maximum(np.minimum(areas[best], areas[rest]), 1e-6)
+            order = rest[ios < threshold]
+    return np.sort(np.array(keep, dtype=int))
+
+def process_tiled_brood_detection(results, origins, original_image, inline):
+    """Shift tile boxes to image coordinates, merge across tiles and annotate"""
+    columns = Detections.concatenate([
+        Detections.from_result(result).shifted(x0, y0) for (x0, y0), result in zip(origins, results)
+    ])
+    if len(columns):
+        columns = columns.take(merge_tile_detections(columns.xyxy, columns.conf, columns.cls, TILE_MERGE_THRESHOLD))
+    detections, counts = brood_columns_json(columns)
+    
+    if inline:
+        response = render_brood_response(detections, counts, original_image)
+    else:
+        response = summarize_brood(detections, counts, original_image.size)
+    response["tiles"] = len(origins)
+    return response
+
+async def run_tiled_brood_detection(file_content, batcher, tile_size, overlap, inline):
+    """Predict every tile through the brood batcher so tiles are batched and run in parallel"""
+    image = await inference_executor.run(decode_image, file_content)
+    tiles = await inference_executor.run(slice_tiles, image, tile_size, overlap)
+    
+    results = await asyncio.gather(*[batcher.predict(tile) for _, _, tile in tiles])
+    
+    origins = [(x0, y0) for x0, y0, _ in tiles]
+    return await inference_executor.run(process_tiled_brood_detection, results, origins, image, inline)
+
+# ==================== ANNOTATED IMAGES ====================
+# By default /brood_detect returns only detection geometry and does no image
+# work beyond inference. A result keeps its detections and a reference to the
+# upload's content-addressed blob; the annotated image is decoded, drawn and
+# encoded only when a client asks for it via GET /results/{id}/image, and
+# each rendered variant is kept in the blob store next to the result. Without
+# a blob store the upload bytes are kept in memory instead, for
+# ANNOTATION_TTL seconds and within ANNOTATION_MEMORY_MB.
+# output=inline restores the old response with two base64 PNGs.
+BROOD_OUTPUT_DEFAULT = os.environ.get("BROOD_OUTPUT", "geometry")
+BROOD_OUTPUTS = ("geometry", "inline")
+ANNOTATION_STORE_SIZE = int(os.environ.get("ANNOTATION_STORE_SIZE", "32"))
+ANNOTATION_TTL = int(os.environ.get("ANNOTATION_TTL", "3600"))
+ANNOTATION_MEMORY_MB = float(os.environ.get("ANNOTATION_MEMORY_MB", "128"))
+IMAGE_FORMATS = {
+    "jpeg": ("JPEG", "image/jpeg", "jpg"),
+    "webp": ("WEBP", "image/webp", "webp"),
+    "png": ("PNG", "image/png", "png")
+}
+
+class AnnotationStore:
+    """Detections plus the upload they belong to, by result id. Nothing is decoded here."""
+
+    def __init__(self, max_entries, ttl, max_bytes, blobs=None):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.blobs = blobs
+        self.renders = 0
+        self.render_hits = 0
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()  # put/get run on worker threads
+
+    def put(self, result_id, detections, image_url=None, file_content=None):
+        """Keep a result: a record pointing at the upload blob (image_url), or the
+        upload bytes themselves when there is no blob store"""
+        if self.blobs is not None and image_url:
+            try:
+                record = {"image": self.blobs.key_of(image_url), "detections": detections}
+                self.blobs.put_blob(f"results/{result_id}.json", json.dumps(record).encode())
+                return
+            except Exception as e:
+                logger.warning(f"Blob store write failed, keeping result in memory: {e}")
+        if file_content is None:
+            return
+        with self._lock:
+            old = self._entries.pop(result_id, None)
+            if old is not None:
+                self._bytes -= len(old[1])
+            self._entries[result_id] = (time.monotonic(), file_content, detections)
+            self._bytes += len(file_content)
+            while self._entries and (len(self._entries) > self.max_entries or self._bytes > self.max_bytes):
+                _, (_, evicted, _) = self._entries.popitem(last=False)
+                self._bytes -= len(evicted)
+
+    def get(self, result_id):
+        """(upload bytes, detections), or None"""
+        with self._lock:
+            entry = self._entries.get(result_id)
+            if entry is not None:
+                stored_at, file_content, detections = entry
+                if time.monotonic() - stored_at <= self.ttl:
+                    return file_content, detections
+                del self._entries[result_id]
+                self._bytes -= len(file_content)
+        if self.blobs is None:
+            return None
+        try:
+            record = self.blobs.read_all(f"results/{result_id}.json")
+            if record is None:
+                return None
+            record = json.loads(record)
+            file_content = self.blobs.read_all(record["image"])
+        except Exception as e:
+            logger.warning(f"Blob store read failed: {e}")
+            return None
+        return (file_content, record["detections"]) if file_content is not None else None
+
+    def rendered(self, result_id, variant):
+        """A previously rendered image, or None"""
+        if self.blobs is None:
+            return None
+        try:
+            content = self.blobs.read_all(f"results/{result_id}/{variant}")
+        except Exception as e:
+            logger.warning(f"Blob store read failed: {e}")
+            return None
+        if content is not None:
+            self.render_hits += 1
+        return content
+
+    def put_rendered(self, result_id, variant, content):
+        self.renders += 1
+        if self.blobs is None:
+            return
+        try:
+            self.blobs.put_blob(f"results/{result_id}/{variant}", content)
+        except Exception as e:
+            logger.warning(f"Blob store write failed: {e}")
+
+    def stats(self):
+        return {
+            "backend": "blob" if self.blobs is not None else "memory",
+            "entries": len(self._entries),
+            "bytes": self._bytes,
+            "max_entries": self.max_entries,
+            "max_bytes": self.max_bytes,
+            "ttl_seconds": self.ttl,
+            "renders": self.renders,
+            "render_hits": self.render_hits
+        }
+
+RESULT_ID_PATTERN = re.compile(r"^[0-9a-f]{32}$")
+
+annotation_store = AnnotationStore(ANNOTATION_STORE_SIZE, ANNOTATION_TTL, int(ANNOTATION_MEMORY_MB * 1024 * 1024), blob_store)
+
+def render_annotated_image(file_content, detections, show_labels, image_format, quality, max_size):
+    """Draw brood detections on the upload, optionally downscaled to max_size, and encode it"""
+    if max_size:
+        # Draft-decodes JPEGs straight to the preview size
+        _, image, ratio = prepare_image(file_content, max_size)
+    else:
+        image, ratio = decode_image(file_content), 1.0
+    img_array = draw_brood_annotations(to_bgr_array(image), detections, show_labels, ratio)
+    return encode_image(img_array, image_format, quality)
+
+@app.get("/results/{result_id}/image")
+async def get_result_image(
+    result_id: str,
+    labels: bool = False,
+    image_format: str = Query("jpeg", alias="format"),
+    quality: int = 85,
+    max_size: int = 0
+):
+    """Annotated brood image for a /brood_detect result, as JPEG/WebP/PNG with an optional downscaled preview"""
+    if image_format not in IMAGE_FORMATS:
+        return JSONResponse({"error": f"format must be one of: {', '.join(IMAGE_FORMATS)}"}, status_code=400)
+    if not 1 <= quality <= 100 or max_size < 0:
+        return JSONResponse({"error": "quality must be in [1, 100] and max_size >= 0"}, status_code=400)
+    
+    pil_format, media_type, ext = IMAGE_FORMATS[image_format]
+    # Result ids are content-addressed, so a rendered image never changes
+    headers = {"Cache-Control": f"public, max-age={ANNOTATION_TTL}, immutable"}
+    variant = f"{'labels' if labels else 'plain'}-q{quality}-{max_size}.{ext}"
+    if RESULT_ID_PATTERN.match(result_id):
+        content = await asyncio.to_thread(annotation_store.rendered, result_id, variant)
+        if content is not None:
+            return Response(content, media_type=media_type, headers=headers)
+        entry = await asyncio.to_thread(annotation_store.get, result_id)
+    else:
+        entry = None
+    if entry is None:
+        return JSONResponse({"error": "Result not found", "message": "Result expired - run detection again."}, status_code=404)
+    
+    file_content, detections = entry
+    try:
+        async with inference_executor.slot():
+            content = await inference_executor.run(
+                render_annotated_image, file_content, detections, labels, pil_format, quality, max_size
+            )
+    except InferenceQueueFull:
+        return queue_full_response()
+    except Exception as e:
+        logger.error(f"Error rendering result image: {str(e)}")
+        return JSONResponse({"error": str(e)}, status_code=500)
+    
+    await asyncio.to_thread(annotation_store.put_rendered, result_id, variant, content)
+    return Response(content, media_type=media_type, headers=headers)
+
 # ==================== BROOD DETECTION ====================
+async def run_brood_detection(file_content, batcher, inline):
+    """Decode and annotate on the inference pool, predict through the brood batcher"""
+    if not inline:
+        # Decode straight to inference size
+        image_size, optimized_image, scale_ratio = await inference_executor.run(prepare_image, file_content)
+        result = await batcher.predict(optimized_image)
+        return await inference_executor.run(process_brood_geometry, [result], image_size, scale_ratio)
+    
+    # Inline output draws on the full-resolution upload
+    image = await inference_executor.run(decode_image, file_content)
+    optimized_image, scale_ratio = await inference_executor.run(optimize_image_for_inference, image)
+    
+    # Run inference ONCE
+    result = await batcher.predict(optimized_image)
+    
+    # Process results and generate BOTH annotated versions in one pass
+    return await inference_executor.run(
+        process_brood_detection_optimized, [result], image, optimized_image, scale_ratio
+    )
+
+def brood_request_error(precision="fp32", tiled=False, tile_size=TILE_SIZE, tile_overlap=TILE_OVERLAP,
+                        output=BROOD_OUTPUT_DEFAULT, **_):
+    """Error response for a brood detection request that can't run, else None"""
+    if brood_model is None:
+        return JSONResponse({
+            "error": "Brood model not loaded", 
+            "message": "Model file 'best-od.pt' may be missing or corrupted."
+        }, status_code=500)
+    if select_batcher("brood", precision) is None:
+        return invalid_precision_response(precision)
+    if tiled and (tile_size < 160 or not 0 <= tile_overlap < 1):
+        return JSONResponse({"error": "tile_size must be >= 160 and tile_overlap in [0, 1)"}, status_code=400)
+    if output not in BROOD_OUTPUTS:
+        return JSONResponse({"error": f"output must be one of: {', '.join(BROOD_OUTPUTS)}"}, status_code=400)
+    return None
+
+async def brood_detection(file_content, show_labels=False, precision="fp32", tiled=False, tile_size=TILE_SIZE,
+                          tile_overlap=TILE_OVERLAP, output=BROOD_OUTPUT_DEFAULT, progress=None):
+    """The /brood_detect response for an upload, from the result cache or a new inference"""
+    open_upload(file_content)  # size and bomb guards before any slot or cache work
+    inline = output == "inline"
+    cache_params = {"precision": precision, "show_labels": show_labels, "tiled": tiled, "output": output}
+    if tiled:
+        cache_params.update(tile_size=tile_size, tile_overlap=tile_overlap, merge_threshold=TILE_MERGE_THRESHOLD)
+    cache_key = result_cache.key("brood", file_content, **cache_params)
+    result_id = cache_key[:32]
+    cached = await result_cache.get(cache_key)
+    if cached is not None:
+        if not inline:
+            await asyncio.to_thread(
+                annotation_store.put, result_id, cached["detections"], cached.get("image_url"), file_content
+            )
+        logger.info(f"Brood detection served from cache: {cached['count']} detections")
+        return cached
+    
+    batcher = select_batcher("brood", precision)
+    async with inference_executor.slot():
+        if progress:
+            await progress("inference")
+        if tiled:
+            response = await run_tiled_brood_detection(file_content, batcher, tile_size, tile_overlap, inline)
+        else:
+            response = await run_brood_detection(file_content, batcher, inline)
+        response["precision"] = precision
+        if progress:
+            await progress("storing")
+        await store_images(response, file_content, annotated=("annotated_image", "annotated_image_with_labels"))
+        if not inline:
+            # Only a reference to the upload blob (image_url) is kept; rendering waits for a request
+            await asyncio.to_thread(
+                annotation_store.put, result_id, response["detections"], response.get("image_url"), file_content
+            )
+    if not inline:
+        response["result_id"] = result_id
+        response["annotated_image_url"] = f"/results/{result_id}/image"
+        response["annotated_image_with_labels_url"] = f"/results/{result_id}/image?labels=true"
+    await result_cache.put(cache_key, response)
+    
+    logger.info(f"Brood detection completed: {response['count']} detections")
+    return response
+
 @app.post("/brood_detect")
-async def detect_brood(file: UploadFile = File(...), show_labels: bool = False):
+async def detect_brood(
+    file: UploadFile = File(...),
+    show_labels: bool = False,
+    precision: str = "fp32",
+    tiled: bool = False,
+    tile_size: int = TILE_SIZE,
+    tile_overlap: float = TILE_OVERLAP,
+    output: str = BROOD_OUTPUT_DEFAULT
+):
     try:
-        if brood_model is None:
-            return JSONResponse({
-                "error": "Brood model not loaded", 
-                "message": "Model file 'best-od.pt' may be missing or corrupted."
-            }, status_code=500)
+        params = {"show_labels": show_labels, "precision": precision, "tiled": tiled,
+                  "tile_size": tile_size, "tile_overlap": tile_overlap, "output": output}
+        error = brood_request_error(**params)
+        if error is not None:
+            return error
             
-        logger.info("Starting Brood Detection...")
-        
-        file_content = await file.read()
-        image = Image.open(io.BytesIO(file_content))
-        
-        # Optimize image size for faster inference
-        optimized_image, scale_ratio = optimize_image_for_inference(image, max_size=1280)
-        
-        # Run inference ONCE
-        results = brood_model(optimized_image, verbose=False)
-        
-        # Process results and generate BOTH annotated versions in one pass
-        response = process_brood_detection_optimized(results, image, optimized_image, scale_ratio)
-        
-        logger.info(f"Brood detection completed: {response['count']} detections")
-        return response
+        logger.info(f"Starting Brood Detection ({precision}{', tiled' if tiled else ''})...")
+        return await brood_detection(await file.read(), **params)
         
+    except InferenceQueueFull:
+        logger.warning("Brood detection rejected: inference queue full")
+        return queue_full_response()
+    except UploadRejected as e:
+        return upload_rejected_response(e)
     except Exception as e:
         logger.error(f"Error in brood detection: {str(e)}")
         return JSONResponse({"error": str(e)}, status_code=500)
 
 # ==================== ANALYZE ENDPOINT (Frontend Compatibility) ====================
+# Frontend maturityDistribution keys per queen class, in response order
+MATURITY_KEYS = {
+    "Open Cell": "open",
+    "Capped Cell": "capped",
+    "Matured Cell": "mature",
+    "Semi-Matured Cell": "semiMature",
+    "Failed Cell": "failed"
+}
+
+def process_queen_analysis(results, image_size, scale_ratio):
+    """Build the frontend queen cell analysis from YOLO results"""
+    img_width, img_height = image_size
+    
+    # Class info for recommendations
+    class_info = {
+        "Open Cell": {"days": 5, "desc": "Newly formed queen cell, larva visible", "maturity": 20},
+        "Capped Cell": {"days": 4, "desc": "Sealed cell, pupa developing inside", "maturity": 50},
+        "Semi-Matured Cell": {"days": 2, "desc": "Development progressing, darkening tip", "maturity": 75},
+        "Matured Cell": {"days": 1, "desc": "Ready to emerge, dark conical tip", "maturity": 95},
+        "Failed Cell": {"days": 0, "desc": "Development stopped, cell failed", "maturity": 0}
+    }
+    
+    columns = Detections.from_results(results)
+    # Less aggressive simplification for smoother masks
+    polygons = frame_polygons(results, image_size, epsilon_ratio=0.002)
+    class_counts = columns.class_counts(QUEEN_CLASS_NAMES)
+    maturity_distribution = {key: class_counts[name] for name, key in MATURITY_KEYS.items()}
+    
+    cells = []
+    for idx, (conf, cls, (x1, y1, x2, y2)) in enumerate(columns.records(scale_ratio)):
+        class_name = QUEEN_CLASS_NAMES.get(cls, 'Unknown')
+        info = class_info.get(class_name, {"days": 3, "desc": "Unknown cell type", "maturity": 50})
+        
+        cell = {
+            "id": idx + 1,
+            "type": class_name,
+            "confidence": round(conf * 100),
+            "bbox": [x1, y1, x2 - x1, y2 - y1],  # Convert to [x, y, width, height]
+            "maturityPercentage": info["maturity"],
+            "estimatedHatchingDays": info["days"],
+            "description": info["desc"]
+        }
+        
+        if polygons[idx] is not None:
+            cell["mask"] = {
+                "type": "polygon",
+                "points": polygons[idx],
+                "imageShape": [img_height, img_width]
+            }
+        
+        cells.append(cell)
+    
+    # Generate recommendations
+    recommendations = []
+    if maturity_distribution["mature"] > 0:
+        recommendations.append(f"{maturity_distribution['mature']} mature cell(s) ready to emerge - monitor closely!")
+    if maturity_distribution["semiMature"] > 0:
+        recommendations.append(f"{maturity_distribution['semiMature']} semi-mature cell(s) - emergence in 1-2 days")
+    if maturity_distribution["failed"] > 0:
+        recommendations.append(f"Remove {maturity_distribution['failed']} failed cell(s) to prevent disease")
+    if len(cells) > 5:
+        recommendations.append("High queen cell count detected - consider swarm prevention")
+    if not recommendations:
+        recommendations.append("Continue regular monitoring of queen cell development")
+    
+    return {
+        "totalQueenCells": len(cells),
+        "cells": cells,
+        "maturityDistribution": maturity_distribution,
+        "recommendations": recommendations
+    }
+
+async def run_queen_analysis(image_bytes):
+    """Queen cell analysis in the frontend format, predicted through the queen batcher"""
+    image_size, optimized_image, scale_ratio = await inference_executor.run(prepare_image, image_bytes)
+    result = await queen_batcher.predict(optimized_image)
+    return await inference_executor.run(process_queen_analysis, [result], image_size, scale_ratio)
+
+# /analyze takes the image as a raw body, a multipart "file" field or legacy
+# base64 JSON, parsed by analyze_upload.py. Binary forms get a short reference
+# back (imageId plus blob-store URLs) instead of the image. The legacy form
+# still echoes it as imagePreview, so existing clients see no change. Sizes
+# and parse times per form are reported under "analyze" in /health.
+analyze_metrics = AnalyzeMetrics()
+
 @app.post("/analyze")
 async def analyze_image(request: Request):
     """
-    Compatibility endpoint for frontend - expects JSON with base64 image
+    Compatibility endpoint for frontend - takes the image as a raw body,
+    multipart upload or legacy base64 JSON (see above)
     Returns queen cell analysis with segmentation masks
     """
     try:
         logger.info("STARTING ANALYSIS FROM FRONTEND...")
         
-        data = await request.json()
-        image_data = data.get('image', '')
-        
-        if not image_data or 'data:image' not in image_data:
+        start = time.perf_counter()
+        try:
+            form, image_bytes, _, request_bytes, image_data = await read_analyze_upload(request)
+        except (InvalidUpload, ValueError) as e:
             return JSONResponse(
-                content={"error": "Invalid image format"},
+                content={"error": str(e) if isinstance(e, InvalidUpload) else "Invalid image format"},
                 status_code=400
             )
-        
-        # Extract base64 data
-        image_base64 = image_data.split(',')[1]
-        image_bytes = base64.b64decode(image_base64)
-        
-        # Convert to PIL Image
-        image = Image.open(io.BytesIO(image_bytes))
-        img_width, img_height = image.size
+        parse_ms = (time.perf_counter() - start) * 1000
+        open_upload(image_bytes)
         
         if queen_model is None:
             return JSONResponse(
@@ -706,132 +1714,23 @@ async def analyze_image(request: Request):
                 status_code=500
             )
         
-        # Optimize image for faster inference
-        optimized_image, scale_ratio = optimize_image_for_inference(image, max_size=1280)
-        
-        # Run YOLO inference with verbose=False for speed
-        results = queen_model(optimized_image, verbose=False)
-        
-        cells = []
-        maturity_distribution = {
-            "open": 0,
-            "capped": 0,
-            "mature": 0,
-            "semiMature": 0,
-            "failed": 0
-        }
-        
-        # Class info for recommendations
-        class_info = {
-            "Open Cell": {"days": 5, "desc": "Newly formed queen cell, larva visible", "maturity": 20},
-            "Capped Cell": {"days": 4, "desc": "Sealed cell, pupa developing inside", "maturity": 50},
-            "Semi-Matured Cell": {"days": 2, "desc": "Development progressing, darkening tip", "maturity": 75},
-            "Matured Cell": {"days": 1, "desc": "Ready to emerge, dark conical tip", "maturity": 95},
-            "Failed Cell": {"days": 0, "desc": "Development stopped, cell failed", "maturity": 0}
-        }
-        
-        for result in results:
-            if result.boxes is not None:
-                boxes_data = result.boxes
-                masks_data = result.masks if hasattr(result, 'masks') and result.masks is not None else None
-                
-                for idx, box in enumerate(boxes_data):
-                    cls = int(box.cls[0])
-                    conf = float(box.conf[0])
-                    x1, y1, x2, y2 = map(int, box.xyxy[0].tolist())
-                    
-                    # Scale coordinates back to original image size
-                    if scale_ratio != 1.0:
-                        x1 = int(x1 / scale_ratio)
-                        y1 = int(y1 / scale_ratio)
-                        x2 = int(x2 / scale_ratio)
-                        y2 = int(y2 / scale_ratio)
-                    
-                    class_name = QUEEN_CLASS_NAMES.get(cls, 'Unknown')
-                    info = class_info.get(class_name, {"days": 3, "desc": "Unknown cell type", "maturity": 50})
-                    
-                    # Update distribution
-                    if class_name == "Open Cell":
-                        maturity_distribution["open"] += 1
-                    elif class_name == "Capped Cell":
-                        maturity_distribution["capped"] += 1
-                    elif class_name == "Semi-Matured Cell":
-                        maturity_distribution["semiMature"] += 1
-                    elif class_name == "Matured Cell":
-                        maturity_distribution["mature"] += 1
-                    elif class_name == "Failed Cell":
-                        maturity_distribution["failed"] += 1
-                    
-                    cell = {
-                        "id": idx + 1,
-                        "type": class_name,
-                        "confidence": round(conf * 100),
-                        "bbox": [x1, y1, x2 - x1, y2 - y1],  # Convert to [x, y, width, height]
-                        "maturityPercentage": info["maturity"],
-                        "estimatedHatchingDays": info["days"],
-                        "description": info["desc"]
-                    }
-                    
-                    # Extract segmentation mask if available
-                    if masks_data is not None and idx < len(masks_data.data):
-                        try:
-                            mask = masks_data.data[idx].cpu().numpy()
-                            mask_height, mask_width = mask.shape
-                            
-                            # Convert mask to polygon points
-                            binary_mask = (mask * 255).astype(np.uint8)
-                            contours, _ = cv2.findContours(binary_mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
-                            
-                            if contours:
-                                largest_contour = max(contours, key=cv2.contourArea)
-                                # Less aggressive simplification for smoother masks
-                                epsilon = 0.002 * cv2.arcLength(largest_contour, True)
-                                approx = cv2.approxPolyDP(largest_contour, epsilon, True)
-                                
-                                # Scale to original image size (accounting for optimization resize)
-                                opt_w, opt_h = optimized_image.size
-                                scale_x = (img_width / mask_width)
-                                scale_y = (img_height / mask_height)
-                                
-                                polygon_points = []
-                                for point in approx:
-                                    px, py = point[0]
-                                    polygon_points.append([float(px * scale_x), float(py * scale_y)])
-                                
-                                cell["mask"] = {
-                                    "type": "polygon",
-                                    "points": polygon_points,
-                                    "imageShape": [img_height, img_width]
-                                }
-                        except Exception as e:
-                            logger.warning(f"Mask extraction failed for cell {idx + 1}: {e}")
-                    
-                    cells.append(cell)
-        
-        # Generate recommendations
-        recommendations = []
-        if maturity_distribution["mature"] > 0:
-            recommendations.append(f"{maturity_distribution['mature']} mature cell(s) ready to emerge - monitor closely!")
-        if maturity_distribution["semiMature"] > 0:
-            recommendations.append(f"{maturity_distribution['semiMature']} semi-mature cell(s) - emergence in 1-2 days")
-        if maturity_distribution["failed"] > 0:
-            recommendations.append(f"Remove {maturity_distribution['failed']} failed cell(s) to prevent disease")
-        if len(cells) > 5:
-            recommendations.append("High queen cell count detected - consider swarm prevention")
-        if not recommendations:
-            recommendations.append("Continue regular monitoring of queen cell development")
-        
-        response = {
-            "totalQueenCells": len(cells),
-            "cells": cells,
-            "maturityDistribution": maturity_distribution,
-            "recommendations": recommendations,
-            "imagePreview": image_data
-        }
+        async with inference_executor.slot():
+            response = await run_queen_analysis(image_bytes)
+            await store_images(response, image_bytes)
+        if image_data is not None:
+            response["imagePreview"] = image_data
+        response["imageId"] = hashlib.sha256(image_bytes).hexdigest()[:32]
         
-        logger.info(f"Analysis complete: {len(cells)} cells detected")
-        return JSONResponse(content=response)
+        logger.info(f"Analysis complete ({form}): {response['totalQueenCells']} cells detected")
+        result = JSONResponse(content=response)
+        analyze_metrics.observe(form, request_bytes, len(result.body), parse_ms)
+        return result
         
+    except InferenceQueueFull:
+        logger.warning("Analysis rejected: inference queue full")
+        return queue_full_response()
+    except UploadRejected as e:
+        return upload_rejected_response(e)
     except Exception as e:
         logger.error(f"Error in analyze endpoint: {str(e)}")
         import traceback
@@ -840,3 +1739,490 @@ async def analyze_image(request: Request):
             content={"error": str(e)},
             status_code=500
         )
+
+# ==================== BATCH DETECTION (Whole Hive Inspection) ====================
+# One request carries every frame of an inspection. Frames are predicted
+# concurrently so the batchers can group them, and no annotated images are
+# encoded - the per-frame geometry plus a hive-level aggregate is returned.
+BATCH_MAX_FRAMES = int(os.environ.get("BATCH_MAX_FRAMES", "30"))
+BATCH_MAX_MB = float(os.environ.get("BATCH_MAX_MB", "200"))  # all frames of a request, uncompressed
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.bmp', '.webp', '.tif', '.tiff')
+
+def is_zip_upload(upload):
+    return (upload.filename or '').lower().endswith('.zip') or upload.content_type in ('application/zip', 'application/x-zip-compressed')
+
+def extract_zip_frames(file_content, max_frames=BATCH_MAX_FRAMES, max_bytes=BATCH_MAX_MB * 1024 * 1024):
+    """Read (name, bytes) pairs for every image inside a zip archive. Entry count
+    and uncompressed sizes are checked from the central directory before anything
+    is decompressed, so zip bombs and archives with thousands of frames are
+    rejected up front (zipfile never inflates a member past its declared size)."""
+    with zipfile.ZipFile(io.BytesIO(file_content)) as archive:
+        members = [
+            info for info in archive.infolist()
+            if not info.is_dir() and not os.path.basename(info.filename).startswith('.')
+            and info.filename.lower().endswith(IMAGE_EXTENSIONS)
+        ]
+        if len(members) > max_frames:
+            raise UploadRejected(f"Too many frames (max {BATCH_MAX_FRAMES})")
+        for info in members:
+            if info.file_size > MAX_UPLOAD_MB * 1024 * 1024:
+                raise UploadRejected(f"{info.filename} is {info.file_size / 1024 / 1024:.1f} MB uncompressed, "
+                                     f"the limit is {MAX_UPLOAD_MB:g} MB")
+        if sum(info.file_size for info in members) > max_bytes:
+            raise UploadRejected(f"Frames exceed {BATCH_MAX_MB:g} MB uncompressed")
+        return [(info.filename, archive.read(info)) for info in members]
+
+async def run_frame_detection(name, file_content, queen, brood):
+    """Run the given queen/brood batchers (None to skip) over one frame, reporting failures per frame"""
+    frame = {"frame": name}
+    try:
+        image_size, optimized_image, scale_ratio = await inference_executor.run(prepare_image, file_content)
+        frame["imageShape"] = [image_size[1], image_size[0]]
+        
+        predictions = []
+        if queen is not None:
+            predictions.append(queen.predict(optimized_image))
+        if brood is not None:
+            predictions.append(brood.predict(optimized_image))
+        results = await asyncio.gather(*predictions)
+        
+        if queen is not None:
+            frame["queen"] = await inference_executor.run(process_queen_analysis, [results[0]], image_size, scale_ratio)
+        if brood is not None:
+            frame["brood"] = await inference_executor.run(process_brood_geometry, [results[-1]], image_size, scale_ratio)
+    except Exception as e:
+        logger.warning(f"Batch frame {name} failed: {e}")
+        frame["error"] = str(e)
+    return frame
+
+def aggregate_hive(frames):
+    """Hive-level totals across every successfully processed frame"""
+    hive = {"frames": len(frames), "frames_failed": sum(1 for frame in frames if "error" in frame)}
+    
+    queen_frames = [frame["queen"] for frame in frames if "queen" in frame]
+    if queen_frames:
+        maturity_distribution = {"open": 0, "capped": 0, "mature": 0, "semiMature": 0, "failed": 0}
+        for queen in queen_frames:
+            for key, value in queen["maturityDistribution"].items():
+                maturity_distribution[key] += value
+        hive["queen"] = {
+            "totalQueenCells": sum(queen["totalQueenCells"] for queen in queen_frames),
+            "framesWithQueenCells": sum(1 for queen in queen_frames if queen["totalQueenCells"] > 0),
+            "maturityDistribution": maturity_distribution
+        }
+    
+    brood_frames = [frame["brood"] for frame in frames if "brood" in frame]
+    if brood_frames:
+        counts = {"egg": 0, "larva": 0, "pupa": 0}
+        for brood in brood_frames:
+            for key, value in brood["counts"].items():
+                counts[key] += value
+        estimated_total_cells = sum(brood["health"]["total_cells"] for brood in brood_frames)
+        health_status, health_score, brood_coverage, recommendations = assess_brood_health(counts, estimated_total_cells)
+        hive["brood"] = {
+            "counts": counts,
+            "health": {"status": health_status, "score": health_score, "total_brood": sum(counts.values()), "total_cells": estimated_total_cells},
+            "broodCoverage": brood_coverage,
+            "recommendations": recommendations or ["Continue regular monitoring"]
+        }
+    
+    return hive
+
+@app.post("/batch_detect")
+async def batch_detect(files: List[UploadFile] = File(...), models: str = "queen,brood", precision: str = "fp32"):
+    """
+    Analyse a whole hive inspection in one request - many image files and/or zip archives
+    Returns per-frame queen/brood results plus a hive-level aggregate
+    """
+    try:
+        requested = {model.strip() for model in models.split(',') if model.strip()}
+        run_queen, run_brood = "queen" in requested, "brood" in requested
+        if not (run_queen or run_brood) or requested - {"queen", "brood"}:
+            return JSONResponse({"error": "models must be a comma-separated subset of: queen, brood"}, status_code=400)
+        if run_queen and queen_model is None:
+            return JSONResponse({"error": "Queen model not loaded"}, status_code=500)
+        if run_brood and brood_model is None:
+            return JSONResponse({"error": "Brood model not loaded"}, status_code=500)
+        
+        queen = select_batcher("queen", precision) if run_queen else None
+        brood = select_batcher("brood", precision) if run_brood else None
+        if (run_queen and queen is None) or (run_brood and brood is None):
+            return invalid_precision_response(precision)
+        
+        frames, frame_bytes = [], 0
+        for upload in files:
+            file_content = await upload.read()
+            if is_zip_upload(upload):
+                # Archives only get the frame and byte budget left by earlier uploads
+                extracted = await inference_executor.run(
+                    extract_zip_frames, file_content, BATCH_MAX_FRAMES - len(frames),
+                    BATCH_MAX_MB * 1024 * 1024 - frame_bytes
+                )
+            else:
+                extracted = [(upload.filename, file_content)]
+            frames.extend(extracted)
+            frame_bytes += sum(len(content) for _, content in extracted)
+            if len(frames) > BATCH_MAX_FRAMES:
+                return JSONResponse({"error": f"Too many frames (max {BATCH_MAX_FRAMES})"}, status_code=413)
+            if frame_bytes > BATCH_MAX_MB * 1024 * 1024:
+                return JSONResponse({"error": f"Frames exceed {BATCH_MAX_MB:g} MB"}, status_code=413)
+        
+        if not frames:
+            return JSONResponse({"error": "No images found in upload"}, status_code=400)
+        
+        logger.info(f"Starting batch detection over {len(frames)} frame(s)...")
+        
+        # Every frame runs each requested model, so the batch is weighed as that many requests
+        async with inference_executor.slot(len(frames) * (run_queen + run_brood)):
+            results = await asyncio.gather(*[
+                run_frame_detection(name, file_content, queen, brood) for name, file_content in frames
+            ])
+        
+        response = {"frames": results, "hive": aggregate_hive(results), "precision": precision}
+        logger.info(f"Batch detection completed: {len(results)} frame(s), {response['hive']['frames_failed']} failed")
+        return response
+        
+    except InferenceQueueFull:
+        logger.warning("Batch detection rejected: inference queue full")
+        return queue_full_response()
+    except UploadRejected as e:
+        return upload_rejected_response(e)
+    except zipfile.BadZipFile as e:
+        return JSONResponse({"error": f"Invalid zip archive: {e}"}, status_code=400)
+    except Exception as e:
+        logger.error(f"Error in batch detection: {str(e)}")
+        return JSONResponse({"error": str(e)}, status_code=500)
+
+# ==================== JOBS ====================
+# Long inferences (big or tiled frames) can outlast a client's or the
+# gateway's HTTP timeout. POST /jobs queues the same queen/brood detection
+# and returns a job id at once; GET /jobs/{id} polls it and
+# GET /jobs/{id}/events streams its progress as server-sent events.
+# Jobs live in SQLite (JOBS_DB) with their upload, so queued and interrupted
+# jobs are picked up again after a restart (point JOBS_DB at persistent
+# storage to also survive a redeploy). Finished jobs are kept for JOB_TTL
+# seconds.
+JOBS_DB = os.environ.get("JOBS_DB", "/tmp/ibrood-jobs.sqlite3")
+JOB_WORKERS = int(os.environ.get("JOB_WORKERS", "1"))
+JOB_TTL = int(os.environ.get("JOB_TTL", "86400"))
+JOB_MAX_ATTEMPTS = int(os.environ.get("JOB_MAX_ATTEMPTS", "3"))
+JOB_POLL_INTERVAL = 2.0
+JOB_KEEPALIVE_SECONDS = 15
+
+# Task -> (request check, detection core) shared with the synchronous endpoints
+JOB_TASKS = {
+    "queen_detect": (queen_request_error, queen_detection),
+    "brood_detect": (brood_request_error, brood_detection),
+}
+JOB_FINAL_STATES = ("done", "failed")
+
+class JobQueue:
+    """Durable FIFO of detection jobs in SQLite; upload bytes are kept until the job finishes"""
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS jobs (
+            id TEXT PRIMARY KEY,
+            task TEXT NOT NULL,
+            params TEXT NOT NULL,
+            status TEXT NOT NULL,
+            stage TEXT,
+            upload BLOB,
+            result TEXT,
+            error TEXT,
+            attempts INTEGER NOT NULL DEFAULT 0,
+            created_at REAL NOT NULL,
+            updated_at REAL NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS idx_jobs_status_created ON jobs (status, created_at);
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.completed = 0
+        self.failed = 0
+        self._lock = threading.Lock()
+        self._db = None
+        self._changed = None
+        self._work = None
+
+    def start(self):
+        """Open the database and bind the change notifications to the running event loop.
+        Nothing is opened on import, so importing this module (the gateway's local
+        inference mode) leaves JOBS_DB alone."""
+        self._db = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+        self._db.row_factory = sqlite3.Row
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.executescript(self.SCHEMA)
+        self._changed = asyncio.Condition()
+        self._work = asyncio.Event()
+
+    # Blocking SQLite calls, run through asyncio.to_thread
+    def _execute(self, query, *params):
+        """Run a statement, returning the affected row count"""
+        with self._lock:
+            return self._db.execute(query, params).rowcount
+
+    def _query(self, query, *params):
+        with self._lock:
+            return self._db.execute(query, params).fetchall()
+
+    def _recover(self):
+        """Requeue jobs that were running when the process stopped"""
+        return self._execute(
+            "UPDATE jobs SET status = 'queued', stage = NULL, updated_at = ? WHERE status = 'running'", time.time()
+        )
+
+    def _submit(self, job_id, task, params, upload):
+        now = time.time()
+        self._execute(
+            "INSERT INTO jobs (id, task, params, status, upload, created_at, updated_at) VALUES (?, ?, ?, 'queued', ?, ?, ?)",
+            job_id, task, json.dumps(params), upload, now, now
+        )
+
+    def _claim(self):
+        """Oldest queued job, marked running, or None"""
+        with self._lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                row = self._db.execute(
+                    "SELECT id, task, params, upload, attempts FROM jobs WHERE status = 'queued' ORDER BY created_at LIMIT 1"
+                ).fetchone()
+                if row is not None:
+                    self._db.execute(
+                        "UPDATE jobs SET status = 'running', stage = 'starting', attempts = attempts + 1, updated_at = ? WHERE id = ?",
+                        (time.time(), row["id"])
+                    )
+                self._db.execute("COMMIT")
+            except BaseException:
+                self._db.execute("ROLLBACK")
+                raise
+        return row
+
+    def _update(self, job_id, **fields):
+        fields["updated_at"] = time.time()
+        if fields.get("status") in JOB_FINAL_STATES:
+            fields["upload"] = None
+        assignments = ", ".join(f"{name} = ?" for name in fields)
+        self._execute(f"UPDATE jobs SET {assignments} WHERE id = ?", *fields.values(), job_id)
+
+    def _get(self, job_id):
+        rows = self._query(
+            "SELECT id, task, status, stage, result, error, attempts, created_at, updated_at FROM jobs WHERE id = ?", job_id
+        )
+        if not rows:
+            return None
+        row = rows[0]
+        job = {
+            "job_id": row["id"],
+            "task": row["task"],
+            "status": row["status"],
+            "stage": row["stage"],
+            "attempts": row["attempts"],
+            "created_at": row["created_at"],
+            "updated_at": row["updated_at"]
+        }
+        if row["status"] == "queued":
+            job["position"] = self._query(
+                "SELECT COUNT(*) FROM jobs WHERE status = 'queued' AND created_at < ?", row["created_at"]
+            )[0][0]
+        if row["result"] is not None:
+            job["result"] = json.loads(row["result"])
+        if row["error"] is not None:
+            job["error"] = row["error"]
+        return job
+
+    def _prune(self):
+        return self._execute(
+            "DELETE FROM jobs WHERE status IN ('done', 'failed') AND updated_at < ?", time.time() - JOB_TTL
+        )
+
+    def _counts(self):
+        return {status: count for status, count in self._query("SELECT status, COUNT(*) FROM jobs GROUP BY status")}
+
+    async def _notify(self):
+        async with self._changed:
+            self._changed.notify_all()
+
+    async def recover(self):
+        return await asyncio.to_thread(self._recover)
+
+    async def submit(self, task, params, upload):
+        job_id = uuid.uuid4().hex
+        await asyncio.to_thread(self._submit, job_id, task, params, upload)
+        self._work.set()
+        await self._notify()
+        return job_id
+
+    async def claim(self):
+        """Next job to run, waiting up to JOB_POLL_INTERVAL for one to be submitted"""
+        row = await asyncio.to_thread(self._claim)
+        if row is None:
+            self._work.clear()
+            with contextlib.suppress(asyncio.TimeoutError):
+                await asyncio.wait_for(self._work.wait(), JOB_POLL_INTERVAL)
+            return None
+        await self._notify()
+        return row
+
+    async def update(self, job_id, **fields):
+        await asyncio.to_thread(self._update, job_id, **fields)
+        if fields.get("status") == "done":
+            self.completed += 1
+        elif fields.get("status") == "failed":
+            self.failed += 1
+        await self._notify()
+
+    async def get(self, job_id):
+        return await asyncio.to_thread(self._get, job_id)
+
+    async def prune(self):
+        return await asyncio.to_thread(self._prune)
+
+    async def wait_for_change(self, timeout):
+        """True when any job changed within timeout seconds"""
+        async with self._changed:
+            try:
+                await asyncio.wait_for(self._changed.wait(), timeout)
+                return True
+            except asyncio.TimeoutError:
+                return False
+
+    async def stats(self):
+        by_status = await asyncio.to_thread(self._counts) if self._db is not None else {}
+        return {"db": self.path, "workers": JOB_WORKERS, "completed": self.completed, "failed": self.failed,
+                "by_status": by_status}
+
+job_queue = JobQueue(JOBS_DB)
+
+async def run_job(job):
+    """Run a claimed job through its detection core and record the outcome"""
+    job_id = job["id"]
+    _, detect = JOB_TASKS[job["task"]]
+    params = json.loads(job["params"])
+
+    async def progress(stage):
+        await job_queue.update(job_id, stage=stage)
+
+    try:
+        result = await detect(job["upload"], progress=progress, **params)
+        await job_queue.update(job_id, status="done", stage=None, result=json.dumps(result))
+        logger.info(f"Job {job_id} ({job['task']}) done")
+    except InferenceQueueFull:
+        # Synchronous requests hold every slot - give the job back and wait
+        await job_queue.update(job_id, status="queued", stage=None, attempts=job["attempts"])
+        await asyncio.sleep(INFERENCE_RETRY_AFTER)
+    except Exception as e:
+        logger.error(f"Job {job_id} ({job['task']}) failed: {str(e)}")
+        await job_queue.update(job_id, status="failed", stage=None, error=str(e))
+
+async def job_worker():
+    """Claim and run jobs forever, pruning expired ones about once an hour"""
+    last_prune = 0.0
+    while True:
+        try:
+            if time.monotonic() - last_prune > 3600:
+                last_prune = time.monotonic()
+                pruned = await job_queue.prune()
+                if pruned:
+                    logger.info(f"Pruned {pruned} finished job(s)")
+            job = await job_queue.claim()
+            if job is None:
+                continue
+            if job["attempts"] >= JOB_MAX_ATTEMPTS:
+                # Claimed this many times without finishing: it keeps taking the process down
+                await job_queue.update(job["id"], status="failed", stage=None, error="Job did not complete after repeated attempts")
+                continue
+            await run_job(job)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"Job worker error: {str(e)}")
+            await asyncio.sleep(JOB_POLL_INTERVAL)
+
+@app.on_event("startup")
+async def start_job_workers():
+    job_queue.start()
+    recovered = await job_queue.recover()
+    if recovered:
+        logger.info(f"Requeued {recovered} interrupted job(s)")
+    for _ in range(JOB_WORKERS):
+        asyncio.create_task(job_worker())
+
+@app.post("/jobs", status_code=202)
+async def submit_job(
+    response: Response,
+    file: UploadFile = File(...),
+    task: str = "brood_detect",
+    show_labels: bool = False,
+    precision: str = "fp32",
+    tiled: bool = False,
+    tile_size: int = TILE_SIZE,
+    tile_overlap: float = TILE_OVERLAP,
+    output: str = BROOD_OUTPUT_DEFAULT
+):
+    """Queue a queen_detect or brood_detect run; takes the same parameters as those endpoints"""
+    if task not in JOB_TASKS:
+        return JSONResponse({"error": f"task must be one of: {', '.join(JOB_TASKS)}"}, status_code=400)
+    if task == "queen_detect":
+        params = {"precision": precision}
+    else:
+        params = {"show_labels": show_labels, "precision": precision, "tiled": tiled,
+                  "tile_size": tile_size, "tile_overlap": tile_overlap, "output": output}
+    check, _ = JOB_TASKS[task]
+    error = check(**params)
+    if error is not None:
+        return error
+    
+    file_content = await file.read()
+    try:
+        open_upload(file_content)
+    except UploadRejected as e:
+        return upload_rejected_response(e)
+    
+    job_id = await job_queue.submit(task, params, file_content)
+    logger.info(f"Job {job_id} ({task}) queued")
+    response.headers["Location"] = f"/jobs/{job_id}"
+    return {
+        "job_id": job_id,
+        "status": "queued",
+        "status_url": f"/jobs/{job_id}",
+        "events_url": f"/jobs/{job_id}/events"
+    }
+
+@app.get("/jobs/{job_id}")
+async def get_job(job_id: str):
+    """Job status; the detection response is under "result" once it is done"""
+    job = await job_queue.get(job_id)
+    if job is None:
+        return JSONResponse({"error": "Job not found"}, status_code=404)
+    return job
+
+@app.get("/jobs/{job_id}/events")
+async def job_events(job_id: str):
+    """Server-sent events: a "progress" event per status/stage/queue position change,
+    then one "done" or "failed" event carrying the full job"""
+    job = await job_queue.get(job_id)
+    if job is None:
+        return JSONResponse({"error": "Job not found"}, status_code=404)
+    
+    async def events():
+        current = job
+        last = None
+        while True:
+            if current is None:
+                yield f"event: failed\ndata: {json.dumps({'job_id': job_id, 'error': 'Job expired'})}\n\n"
+                return
+            if current["status"] in JOB_FINAL_STATES:
+                yield f"event: {current['status']}\ndata: {json.dumps(current)}\n\n"
+                return
+            state = {key: current.get(key) for key in ("job_id", "status", "stage", "position")}
+            if state != last:
+                yield f"event: progress\ndata: {json.dumps(state)}\n\n"
+                last = state
+            if not await job_queue.wait_for_change(JOB_KEEPALIVE_SECONDS):
+                yield ": keep-alive\n\n"
+            current = await job_queue.get(job_id)
+    
+    return StreamingResponse(events(), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+"""
+/analyze Transport Benchmark
+Posts the same frames to /analyze as legacy base64 JSON, as a raw binary
+body and as a multipart upload, and compares payload sizes and latency.
+Works against the detection service or the api/main.py gateway.
+
+Usage:
+    python benchmark-analyze.py path/to/frames [--url http://localhost:7860] [--runs 3]
+"""
+
+import os
+import time
+import base64
+import argparse
+import mimetypes
+import statistics
+import httpx
+
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.webp')
+
+def requests_for(name, content):
+    """httpx request kwargs for each /analyze form"""
+    media_type = mimetypes.guess_type(name)[0] or "application/octet-stream"
+    data_url = f"data:{media_type};base64,{base64.b64encode(content).decode()}"
+    return {
+        "json": {"json": {"image": data_url}},
+        "binary": {"content": content, "headers": {"content-type": media_type}},
+        "multipart": {"files": {"file": (name, content, media_type)}},
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare /analyze request forms")
+    parser.add_argument('folder', help="Folder of frames")
+    parser.add_argument('--url', default="http://localhost:7860", help="Detection service or gateway base URL")
+    parser.add_argument('--runs', type=int, default=3, help="Requests per frame and form")
+    args = parser.parse_args()
+
+    frames = [
+        (name, open(os.path.join(args.folder, name), 'rb').read())
+        for name in sorted(os.listdir(args.folder)) if name.lower().endswith(IMAGE_EXTENSIONS)
+    ]
+    if not frames:
+        print(f"No images in {args.folder}")
+        return
+
+    stats = {form: {"request": [], "response": [], "latency": []} for form in ("json", "binary", "multipart")}
+    with httpx.Client(base_url=args.url, timeout=120) as client:
+        for name, content in frames:
+            for form, kwargs in requests_for(name, content).items():
+                for _ in range(args.runs):
+                    request = client.build_request("POST", "/analyze", **kwargs)
+                    start = time.perf_counter()
+                    response = client.send(request)
+                    elapsed = (time.perf_counter() - start) * 1000
+                    response.raise_for_status()
+                    stats[form]["request"].append(len(request.read()))
+                    stats[form]["response"].append(len(response.content))
+                    stats[form]["latency"].append(elapsed)
+
+    print(f"{len(frames)} frame(s) x {args.runs} run(s) against {args.url}/analyze")
+    print("-" * 72)
+    print(f"{'form':10} | {'request KB':>10} | {'response KB':>11} | {'p50 ms':>8} | {'p95 ms':>8} | {'vs json':>8}")
+    json_request = statistics.mean(stats["json"]["request"])
+    for form, values in stats.items():
+        latencies = sorted(values["latency"])
+        request_kb = statistics.mean(values["request"]) / 1024
+        print(f"{form:10} | {request_kb:10.1f} | {statistics.mean(values['response']) / 1024:11.1f} | "
+              f"{statistics.median(latencies):8.1f} | {latencies[int(len(latencies) * 0.95)]:8.1f} | "
+              f"{statistics.mean(values['request']) / json_request:7.0%}")
+    print("-" * 72)
+    print(f"Server-side averages: {args.url}/health -> analyze")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+"""
+Ingestion Benchmark
+Times decoding phone-sized frames to inference size: the old path (full
+decode, then LANCZOS resize) against ingest.prepare_image (JPEG draft
+decoding, EXIF orientation, size guards)
+
+Usage:
+    python benchmark-ingest.py path/to/frames [--max-size 1280] [--runs 3]
+    python benchmark-ingest.py --generate path/to/frames   # synthetic 12MP / 48MP JPEGs
+"""
+
+import os
+import io
+import time
+import argparse
+import statistics
+import numpy as np
+from PIL import Image
+
+import ingest
+
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.webp')
+
+def legacy_prepare(file_content, max_size):
+    """Decode and resize the way app.py did before ingest.py"""
+    image = Image.open(io.BytesIO(file_content))
+    image.load()
+    width, height = image.size
+    if max(width, height) > max_size:
+        ratio = max_size / max(width, height)
+        return image.size, image.resize((int(width * ratio), int(height * ratio)), Image.LANCZOS), ratio
+    return image.size, image, 1.0
+
+def generate(folder):
+    """Write noisy JPEGs at common phone resolutions, one of them rotated via EXIF"""
+    os.makedirs(folder, exist_ok=True)
+    rng = np.random.default_rng(0)
+    for name, (width, height), orientation in (
+        ("phone-12mp.jpg", (4032, 3024), 1),
+        ("phone-12mp-portrait.jpg", (4032, 3024), 6),
+        ("phone-48mp.jpg", (8000, 6000), 1),
+    ):
+        # Smooth gradient plus noise compresses like a photo, unlike pure noise
+        small = rng.integers(0, 255, (height // 16, width // 16, 3), dtype=np.uint8)
+        image = Image.fromarray(small).resize((width, height), Image.BILINEAR)
+        exif = Image.Exif()
+        exif[ingest.EXIF_ORIENTATION] = orientation
+        image.save(os.path.join(folder, name), quality=90, exif=exif)
+        print(f"wrote {name} ({width}x{height}, orientation {orientation})")
+
+def time_ms(fn, runs):
+    samples = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        result = fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    return statistics.median(samples), result
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark upload decoding to inference size")
+    parser.add_argument('folder', help="Folder of phone frames")
+    parser.add_argument('--max-size', type=int, default=1280, help="Inference size, as in app.py")
+    parser.add_argument('--runs', type=int, default=3, help="Timed runs per frame")
+    parser.add_argument('--generate', action='store_true', help="Write synthetic frames into folder first")
+    args = parser.parse_args()
+
+    if args.generate:
+        generate(args.folder)
+
+    names = sorted(name for name in os.listdir(args.folder) if name.lower().endswith(IMAGE_EXTENSIONS))
+    print(f"Decoding to {args.max_size}px, median of {args.runs} run(s)")
+    print("-" * 96)
+    print(f"{'frame':28} | {'MB':>5} | {'source':>11} | {'legacy ms':>9} | {'ingest ms':>9} | {'speedup':>7} | {'output':>11}")
+    totals = [0.0, 0.0]
+    for name in names:
+        with open(os.path.join(args.folder, name), 'rb') as f:
+            content = f.read()
+        try:
+            legacy_ms, (size, _, _) = time_ms(lambda: legacy_prepare(content, args.max_size), args.runs)
+            ingest_ms, (_, image, _) = time_ms(lambda: ingest.prepare_image(content, args.max_size), args.runs)
+        except ingest.UploadRejected as e:
+            print(f"{name:28} | rejected: {e}")
+            continue
+        totals[0] += legacy_ms
+        totals[1] += ingest_ms
+        print(f"{name:28} | {len(content) / 1024 / 1024:5.1f} | {f'{size[0]}x{size[1]}':>11} | {legacy_ms:9.1f} | "
+              f"{ingest_ms:9.1f} | {legacy_ms / ingest_ms:6.1f}x | {f'{image.size[0]}x{image.size[1]}':>11}")
+    print("-" * 96)
+    if totals[1]:
+        print(f"Total: legacy {totals[0]:.0f} ms, ingest {totals[1]:.0f} ms ({totals[0] / totals[1]:.1f}x)")
+    print(f"Ingest stats: {ingest.metrics.stats()}")
+
+if __name__ == "__main__":
+    main()
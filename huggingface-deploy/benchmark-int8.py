@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+"""
+INT8 Benchmark Tool
+Compares the FP32 and INT8 models on the same frames: latency, memory and
+per-class detection counts
+
+Usage:
+    python export-models.py --int8 --calib path/to/calibration/frames
+    python benchmark-int8.py path/to/frames [--runs 3]
+"""
+
+import os
+import sys
+import time
+import argparse
+import resource
+import numpy as np
+from PIL import Image
+from ultralytics import YOLO
+
+# Checkpoint -> task, matching the models loaded in app.py
+MODELS = {
+    'best-seg.pt': 'segment',
+    'best-od.pt': 'detect',
+}
+
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.bmp', '.webp')
+
+def rss_mb():
+    """Current resident set size in MB (Linux), falling back to peak RSS"""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / 1024 / 1024
+    except OSError:
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+def optimize_image_for_inference(image, max_size=1280):
+    """Same pre-resize as app.py so latencies match the service"""
+    width, height = image.size
+    if max(width, height) > max_size:
+        ratio = max_size / max(width, height)
+        return image.resize((int(width * ratio), int(height * ratio)), Image.LANCZOS)
+    return image
+
+def load_images(folder):
+    paths = sorted(
+        os.path.join(folder, name) for name in os.listdir(folder)
+        if name.lower().endswith(IMAGE_EXTENSIONS)
+    )
+    return [(os.path.basename(path), optimize_image_for_inference(Image.open(path).convert('RGB'))) for path in paths]
+
+def benchmark(path, task, images, runs):
+    """Load a model and time it on every image, returning latency, memory and counts"""
+    rss_before = rss_mb()
+    model = YOLO(path, task=task)
+    model(images[0][1], verbose=False)  # warm-up
+    rss_loaded = rss_mb()
+
+    latencies, counts = [], {}
+    for name, image in images:
+        for _ in range(runs):
+            start = time.perf_counter()
+            result = model(image, verbose=False)[0]
+            latencies.append((time.perf_counter() - start) * 1000)
+
+        classes = result.boxes.cls.cpu().numpy().astype(int) if result.boxes is not None else np.array([], dtype=int)
+        counts[name] = np.bincount(classes, minlength=len(model.names))
+
+    stats = {
+        "mean_ms": float(np.mean(latencies)),
+        "p95_ms": float(np.percentile(latencies, 95)),
+        "model_mb": rss_loaded - rss_before,
+        "peak_mb": rss_mb() - rss_before,
+        "counts": counts,
+        "names": model.names,
+    }
+    del model
+    return stats
+
+def report(weights, fp32, int8):
+    print(f"\n{weights}")
+    print("-" * 60)
+    print(f"{'':12} | {'mean ms':>9} | {'p95 ms':>9} | {'model MB':>9} | {'peak MB':>9}")
+    for label, stats in (("FP32", fp32), ("INT8", int8)):
+        print(f"{label:12} | {stats['mean_ms']:9.1f} | {stats['p95_ms']:9.1f} | {stats['model_mb']:9.1f} | {stats['peak_mb']:9.1f}")
+    print(f"{'speedup':12} | {fp32['mean_ms'] / int8['mean_ms']:8.2f}x | {fp32['p95_ms'] / int8['p95_ms']:8.2f}x |")
+
+    # Count accuracy: per-class absolute count error of INT8 against FP32
+    names = fp32["names"]
+    fp32_counts = np.array([fp32["counts"][name] for name in sorted(fp32["counts"])])
+    int8_counts = np.array([int8["counts"][name][:fp32_counts.shape[1]] for name in sorted(int8["counts"])])
+    abs_error = np.abs(int8_counts - fp32_counts)
+    totals = fp32_counts.sum(axis=0)
+
+    print("\nCount accuracy (INT8 vs FP32)")
+    for cls in range(fp32_counts.shape[1]):
+        rel = abs_error[:, cls].sum() / totals[cls] if totals[cls] else 0.0
+        print(f"{names[cls]:20} | fp32={totals[cls]:6} int8={int8_counts[:, cls].sum():6} | MAE/frame={abs_error[:, cls].mean():6.2f} | rel err={rel:6.1%}")
+    print("-" * 60)
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark INT8 models against FP32")
+    parser.add_argument('frames', help="Folder of frame images")
+    parser.add_argument('--runs', type=int, default=3, help="Timed runs per image")
+    args = parser.parse_args()
+
+    images = load_images(args.frames)
+    if not images:
+        print(f"No images found in {args.frames}")
+        sys.exit(1)
+    print(f"Benchmarking on {len(images)} frame(s), {args.runs} run(s) each")
+
+    for weights, task in MODELS.items():
+        int8_path = os.path.splitext(weights)[0] + '_int8.onnx'
+        if not os.path.exists(weights) or not os.path.exists(int8_path):
+            print(f"Skipping {weights}: need both {weights} and {int8_path}")
+            continue
+
+        fp32 = benchmark(weights, task, images, args.runs)
+        int8 = benchmark(int8_path, task, images, args.runs)
+        report(weights, fp32, int8)
+
+if __name__ == "__main__":
+    main()
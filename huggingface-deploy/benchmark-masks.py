@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+"""
+Mask Polygon Benchmark
+Times mask-to-polygon conversion for one frame of queen cell masks: the old
+per-detection loop (one device copy and a full-frame contour search per mask)
+against polygons.py, inline and on the mask thread pool. Masks are synthetic
+ellipses, so no model or images are needed.
+
+Usage:
+    python benchmark-masks.py [--cells 16 48 96] [--size 640] [--runs 20] [--workers N]
+"""
+
+import time
+import argparse
+import statistics
+from concurrent.futures import ThreadPoolExecutor
+import cv2
+import numpy as np
+import torch
+
+import polygons
+
+def synthetic_masks(cells, size, seed=0):
+    """(cells, size, size) float tensor of filled ellipses, like YOLO mask output, and their xyxy boxes"""
+    rng = np.random.default_rng(seed)
+    masks = np.zeros((cells, size, size), dtype=np.uint8)
+    boxes = []
+    for mask in masks:
+        center = tuple(int(v) for v in rng.integers(20, size - 20, 2))
+        axes = tuple(int(v) for v in rng.integers(6, 40, 2))
+        cv2.ellipse(mask, center, axes, float(rng.uniform(0, 180)), 0, 360, 1, -1)
+        x, y, w, h = cv2.boundingRect(mask)
+        boxes.append([x, y, x + w, y + h])
+    return torch.from_numpy(masks.astype(np.float32)), np.array(boxes, dtype=float)
+
+def loop_polygons(mask_data, image_size, epsilon_ratio):
+    """The per-detection loop process_queen_detection used before polygons.py"""
+    img_width, img_height = image_size
+    results = []
+    for idx in range(len(mask_data)):
+        mask = mask_data[idx].cpu().numpy()
+        mask_height, mask_width = mask.shape
+        binary_mask = (mask * 255).astype(np.uint8)
+        contours, _ = cv2.findContours(binary_mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+        if not contours:
+            results.append(None)
+            continue
+        largest_contour = max(contours, key=cv2.contourArea)
+        epsilon = epsilon_ratio * cv2.arcLength(largest_contour, True)
+        approx = cv2.approxPolyDP(largest_contour, epsilon, True)
+        scale_x = img_width / mask_width
+        scale_y = img_height / mask_height
+        polygon_points = []
+        for point in approx:
+            px, py = point[0]
+            polygon_points.append([float(px * scale_x), float(py * scale_y)])
+        results.append(polygon_points)
+    return results
+
+def time_ms(fn, runs):
+    fn()  # warm-up
+    samples = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    return statistics.median(samples)
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark mask-to-polygon conversion")
+    parser.add_argument('--cells', type=int, nargs='+', default=[16, 48, 96], help="Masks per frame")
+    parser.add_argument('--size', type=int, default=640, help="Mask resolution")
+    parser.add_argument('--runs', type=int, default=20, help="Timed runs per configuration")
+    parser.add_argument('--workers', type=int, default=max(polygons.MASK_WORKERS, 2), help="Mask threads")
+    args = parser.parse_args()
+
+    pool = ThreadPoolExecutor(max_workers=args.workers, thread_name_prefix="mask")
+    image_size = (args.size * 2, args.size * 2)  # polygons are scaled to a 2x original
+    print(f"{args.size}x{args.size} masks, median of {args.runs} runs, {args.workers} mask thread(s)")
+    print("-" * 64)
+    print(f"{'cells':>6} | {'loop ms':>9} | {'inline ms':>9} | {'pool ms':>9} | {'speedup':>8} | {'same':>5}")
+
+    for cells in args.cells:
+        masks, boxes = synthetic_masks(cells, args.size)
+        expected = loop_polygons(masks, image_size, 0.005)
+
+        polygons.executor = None
+        same = polygons.mask_polygons(masks, image_size, 0.005, boxes) == expected
+        inline_ms = time_ms(lambda: polygons.mask_polygons(masks, image_size, 0.005, boxes), args.runs)
+
+        polygons.executor = pool
+        polygons.MASK_PARALLEL_MIN = 0
+        same = same and polygons.mask_polygons(masks, image_size, 0.005, boxes) == expected
+        pool_ms = time_ms(lambda: polygons.mask_polygons(masks, image_size, 0.005, boxes), args.runs)
+
+        loop_ms = time_ms(lambda: loop_polygons(masks, image_size, 0.005), args.runs)
+        best = min(inline_ms, pool_ms)
+        print(f"{cells:6d} | {loop_ms:9.2f} | {inline_ms:9.2f} | {pool_ms:9.2f} | {loop_ms / best:7.1f}x | {str(same):>5}")
+
+    print("-" * 64)
+    print("same = polygons identical to the per-detection loop")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+"""
+Detection Post-processing Benchmark
+Times turning one frame of YOLO boxes into scaled JSON detections and class
+counts: the old per-box loop (a tensor index and device sync per box) against
+detections.py columns. Boxes are synthetic ultralytics Results, so no model or
+images are needed; use --device cuda to see the per-box sync cost on a GPU.
+
+Usage:
+    python benchmark-postprocess.py [--boxes 500 1000 2000] [--runs 20] [--device cpu]
+"""
+
+import time
+import argparse
+import statistics
+import numpy as np
+import torch
+from ultralytics.engine.results import Results
+
+from detections import Detections
+
+CLASS_NAMES = {0: 'egg', 1: 'larva', 2: 'pupa'}
+SCALE_RATIO = 1280 / 4032  # phone frame resized for inference
+
+def synthetic_result(count, device, seed=0):
+    """Results with count random brood boxes on a 1280x960 frame"""
+    rng = np.random.default_rng(seed)
+    xy = rng.uniform(0, [1220, 900], (count, 2))
+    wh = rng.uniform(8, 60, (count, 2))
+    data = np.column_stack([xy, xy + wh, rng.uniform(0.25, 1, count), rng.integers(0, 3, count)])
+    boxes = torch.tensor(data, dtype=torch.float32, device=device)
+    return Results(np.zeros((960, 1280, 3), dtype=np.uint8), path="synthetic", names=CLASS_NAMES, boxes=boxes)
+
+def make_detection(cls, conf, bbox):
+    return {"confidence": conf, "class": cls, "class_name": CLASS_NAMES.get(cls, 'unknown'), "bbox": bbox}
+
+def loop_postprocess(results, scale_ratio):
+    """The per-box loop extract_brood_detections used before detections.py"""
+    detections = []
+    counts = {"egg": 0, "larva": 0, "pupa": 0}
+    for result in results:
+        if result.boxes is not None:
+            for box in result.boxes:
+                cls = int(box.cls[0])
+                conf = float(box.conf[0])
+                x1, y1, x2, y2 = map(int, box.xyxy[0].tolist())
+                if scale_ratio != 1.0:
+                    x1, y1, x2, y2 = int(x1 / scale_ratio), int(y1 / scale_ratio), int(x2 / scale_ratio), int(y2 / scale_ratio)
+                detection = make_detection(cls, conf, [x1, y1, x2, y2])
+                detections.append(detection)
+                if detection["class_name"] in counts:
+                    counts[detection["class_name"]] += 1
+    return detections, counts
+
+def columnar_postprocess(results, scale_ratio):
+    """What extract_brood_detections does now"""
+    columns = Detections.from_results(results)
+    detections = [make_detection(cls, conf, bbox) for conf, cls, bbox in columns.records(scale_ratio)]
+    return detections, columns.class_counts(CLASS_NAMES)
+
+def time_ms(fn, runs):
+    fn()  # warm-up
+    samples = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    return statistics.median(samples)
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark detection post-processing")
+    parser.add_argument('--boxes', type=int, nargs='+', default=[500, 1000, 2000], help="Detections per frame")
+    parser.add_argument('--runs', type=int, default=20, help="Timed runs per configuration")
+    parser.add_argument('--device', default="cpu", help="Torch device holding the boxes (cpu, cuda, mps)")
+    args = parser.parse_args()
+
+    print(f"Boxes on {args.device}, scale ratio {SCALE_RATIO:.3f}, median of {args.runs} runs")
+    print("-" * 58)
+    print(f"{'boxes':>6} | {'loop ms':>9} | {'columns ms':>10} | {'speedup':>8} | {'same':>5}")
+
+    for count in args.boxes:
+        results = [synthetic_result(count, args.device)]
+        same = loop_postprocess(results, SCALE_RATIO) == columnar_postprocess(results, SCALE_RATIO)
+        loop_ms = time_ms(lambda: loop_postprocess(results, SCALE_RATIO), args.runs)
+        columns_ms = time_ms(lambda: columnar_postprocess(results, SCALE_RATIO), args.runs)
+        print(f"{count:6d} | {loop_ms:9.2f} | {columns_ms:10.2f} | {loop_ms / columns_ms:7.1f}x | {str(same):>5}")
+
+    print("-" * 58)
+    print("same = detections and counts identical to the per-box loop")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+# iBrood Detection Columns
+# Post-processing works on YOLO results as columns instead of box by box. The
+# boxes of a result (xyxy, confidence, class) are copied to host memory in one
+# transfer, and shifting, scaling, filtering and per-class counting are NumPy
+# operations. Python objects are only built at the JSON edge, from tolist() of
+# whole columns, so a frame with hundreds of cells no longer pays a tensor
+# index and a device sync for every box.
+
+import numpy as np
+
+class Detections:
+    """N detections as columns: xyxy (N, 4) float32, conf (N,) float32 and cls (N,) int"""
+
+    def __init__(self, xyxy, conf, cls):
+        self.xyxy = np.asarray(xyxy, dtype=np.float32).reshape(-1, 4)
+        self.conf = np.asarray(conf, dtype=np.float32)
+        self.cls = np.asarray(cls, dtype=np.int64)
+
+    @classmethod
+    def empty(cls):
+        return cls(np.zeros((0, 4)), np.zeros(0), np.zeros(0))
+
+    @classmethod
+    def from_result(cls, result):
+        """Columns of one ultralytics Results, copied off the device in a single transfer"""
+        boxes = getattr(result, 'boxes', None)
+        if boxes is None or len(boxes) == 0:
+            return cls.empty()
+        # Rows are [x1, y1, x2, y2, (track id,) conf, cls]
+        data = boxes.cpu().numpy().data
+        return cls(data[:, :4], data[:, -2], data[:, -1])
+
+    @classmethod
+    def from_results(cls, results):
+        return cls.concatenate([cls.from_result(result) for result in results])
+
+    @classmethod
+    def concatenate(cls, parts):
+        parts = [part for part in parts if len(part)]
+        if not parts:
+            return cls.empty()
+        if len(parts) == 1:
+            return parts[0]
+        return cls(
+            np.concatenate([part.xyxy for part in parts]),
+            np.concatenate([part.conf for part in parts]),
+            np.concatenate([part.cls for part in parts])
+        )
+
+    def __len__(self):
+        return len(self.conf)
+
+    def shifted(self, x0, y0):
+        """Boxes moved by (x0, y0), e.g. from tile to image coordinates"""
+        return Detections(self.xyxy + np.array([x0, y0, x0, y0], dtype=np.float32), self.conf, self.cls)
+
+    def take(self, selection):
+        """Subset by index array or boolean mask"""
+        return Detections(self.xyxy[selection], self.conf[selection], self.cls[selection])
+
+    def pixel_boxes(self, scale_ratio=1.0):
+        """Integer xyxy, divided by scale_ratio to undo the inference resize.
+        Truncates before and after scaling, exactly like int() per coordinate did."""
+        boxes = self.xyxy.astype(np.int64)
+        if scale_ratio != 1.0:
+            boxes = (boxes / scale_ratio).astype(np.int64)
+        return boxes
+
+    def class_counts(self, class_names):
+        """{name: count} for every class of a {class id: name} map, in its order"""
+        per_class = np.bincount(self.cls, minlength=max(class_names) + 1)
+        return {name: int(per_class[cls]) for cls, name in class_names.items()}
+
+    def records(self, scale_ratio=1.0):
+        """(confidence, class, [x1, y1, x2, y2]) Python tuples for building JSON"""
+        return zip(self.conf.tolist(), self.cls.tolist(), self.pixel_boxes(scale_ratio).tolist())
@@ -0,0 +1,225 @@
+#!/usr/bin/env python3
+"""
+Model Export Tool
+Exports the PyTorch checkpoints to ONNX / OpenVINO for the CPU inference
+backends in app.py, and checks that exported models match the PyTorch baseline
+
+Usage:
+    python export-models.py                         # export onnx + openvino
+    python export-models.py --formats onnx          # export one format
+    python export-models.py --check path/to/frames  # parity check only
+    python export-models.py --int8 --calib path/to/frames  # INT8 ONNX models
+"""
+
+import os
+import sys
+import argparse
+import numpy as np
+from PIL import Image
+from ultralytics import YOLO
+
+# Checkpoint -> task, matching the models loaded in app.py
+MODELS = {
+    'best-seg.pt': 'segment',
+    'best-od.pt': 'detect',
+}
+
+# Same artifact names app.py looks for
+ARTIFACTS = {
+    'onnx': lambda weights: os.path.splitext(weights)[0] + '.onnx',
+    'openvino': lambda weights: os.path.splitext(weights)[0] + '_openvino_model',
+    'int8': lambda weights: os.path.splitext(weights)[0] + '_int8.onnx',
+}
+
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.bmp', '.webp')
+
+def export_models(formats, imgsz):
+    """Export every checkpoint to each requested format"""
+    for weights, task in MODELS.items():
+        if not os.path.exists(weights):
+            print(f"Skipping {weights}: file not found")
+            continue
+
+        for fmt in formats:
+            print(f"Exporting {weights} -> {fmt}...")
+            model = YOLO(weights, task=task)
+            # dynamic=True keeps the batch axis free for the micro-batchers
+            path = model.export(format=fmt, imgsz=imgsz, dynamic=True)
+            print(f"Exported: {path}")
+
+def letterbox(image, imgsz):
+    """Resize + pad to imgsz x imgsz the way ultralytics preprocesses, as NCHW float32"""
+    width, height = image.size
+    ratio = imgsz / max(width, height)
+    resized = image.resize((int(round(width * ratio)), int(round(height * ratio))), Image.BILINEAR)
+    canvas = Image.new('RGB', (imgsz, imgsz), (114, 114, 114))
+    canvas.paste(resized, ((imgsz - resized.width) // 2, (imgsz - resized.height) // 2))
+    return (np.asarray(canvas, dtype=np.float32) / 255.0).transpose(2, 0, 1)[None]
+
+def quantize_int8(calib_folder, imgsz, limit):
+    """Static INT8 quantization of the exported ONNX models, calibrated on local frames"""
+    import onnx
+    import onnxruntime
+    from onnxruntime.quantization import CalibrationDataReader, QuantFormat, QuantType, quantize_static
+    from onnxruntime.quantization.shape_inference import quant_pre_process
+
+    paths = sorted(
+        os.path.join(calib_folder, name) for name in os.listdir(calib_folder)
+        if name.lower().endswith(IMAGE_EXTENSIONS)
+    )[:limit]
+    if not paths:
+        print(f"No calibration images found in {calib_folder}")
+        return False
+
+    class FrameReader(CalibrationDataReader):
+        def __init__(self, input_name):
+            self.input_name = input_name
+            self.paths = iter(paths)
+
+        def get_next(self):
+            path = next(self.paths, None)
+            if path is None:
+                return None
+            return {self.input_name: letterbox(Image.open(path).convert('RGB'), imgsz)}
+
+    for weights in MODELS:
+        fp32 = ARTIFACTS['onnx'](weights)
+        if not os.path.exists(fp32):
+            print(f"Skipping {weights}: {fp32} missing - export onnx first")
+            continue
+
+        int8 = ARTIFACTS['int8'](weights)
+        prepared = os.path.splitext(fp32)[0] + '_prep.onnx'
+        print(f"Quantizing {fp32} -> {int8} on {len(paths)} calibration frames...")
+
+        quant_pre_process(fp32, prepared)
+        input_name = onnxruntime.InferenceSession(prepared, providers=['CPUExecutionProvider']).get_inputs()[0].name
+        quantize_static(
+            prepared, int8, FrameReader(input_name),
+            quant_format=QuantFormat.QDQ,
+            activation_type=QuantType.QUInt8,
+            weight_type=QuantType.QInt8,
+            per_channel=True
+        )
+        os.remove(prepared)
+
+        # ultralytics reads class names, stride and imgsz from the ONNX metadata
+        source, target = onnx.load(fp32), onnx.load(int8)
+        del target.metadata_props[:]
+        target.metadata_props.extend(source.metadata_props)
+        onnx.save(target, int8)
+        print(f"Quantized: {int8}")
+
+    return True
+
+def box_iou(a, b):
+    """IoU between two [x1, y1, x2, y2] boxes"""
+    ix1, iy1 = max(a[0], b[0]), max(a[1], b[1])
+    ix2, iy2 = min(a[2], b[2]), min(a[3], b[3])
+    inter = max(0.0, ix2 - ix1) * max(0.0, iy2 - iy1)
+    union = (a[2] - a[0]) * (a[3] - a[1]) + (b[2] - b[0]) * (b[3] - b[1]) - inter
+    return inter / union if union > 0 else 0.0
+
+def detections(model, image):
+    """(class, confidence, box) triples for one image"""
+    result = model(image, verbose=False)[0]
+    if result.boxes is None:
+        return []
+    return list(zip(
+        result.boxes.cls.cpu().numpy().astype(int).tolist(),
+        result.boxes.conf.cpu().numpy().tolist(),
+        result.boxes.xyxy.cpu().numpy().tolist()
+    ))
+
+def compare(baseline, candidate, iou_tol, conf_tol):
+    """Greedily match candidate detections to the baseline, returning the matched count"""
+    unmatched = list(candidate)
+    matched = 0
+    for cls, conf, box in sorted(baseline, key=lambda d: -d[1]):
+        best, best_iou = None, iou_tol
+        for other in unmatched:
+            if other[0] != cls or abs(other[1] - conf) > conf_tol:
+                continue
+            iou = box_iou(box, other[2])
+            if iou >= best_iou:
+                best, best_iou = other, iou
+        if best is not None:
+            unmatched.remove(best)
+            matched += 1
+    return matched
+
+def load_images(folder):
+    paths = sorted(
+        os.path.join(folder, name) for name in os.listdir(folder)
+        if name.lower().endswith(IMAGE_EXTENSIONS)
+    )
+    return [(os.path.basename(path), Image.open(path).convert('RGB')) for path in paths]
+
+def check_parity(folder, formats, iou_tol, conf_tol, min_match):
+    """Compare exported models against PyTorch on a folder of frames"""
+    images = load_images(folder)
+    if not images:
+        print(f"No images found in {folder}")
+        return False
+
+    ok = True
+    for weights, task in MODELS.items():
+        if not os.path.exists(weights):
+            continue
+        baseline_model = YOLO(weights, task=task)
+        baseline = {name: detections(baseline_model, image) for name, image in images}
+
+        for fmt in formats:
+            artifact = ARTIFACTS[fmt](weights)
+            if not os.path.exists(artifact):
+                print(f"{artifact} missing - export it first")
+                ok = False
+                continue
+
+            model = YOLO(artifact, task=task)
+            total, matched = 0, 0
+            print(f"\n{weights} vs {fmt}")
+            print("-" * 60)
+            for name, image in images:
+                candidate = detections(model, image)
+                hits = compare(baseline[name], candidate, iou_tol, conf_tol)
+                total += max(len(baseline[name]), len(candidate))
+                matched += hits
+                print(f"{name:30} | pytorch={len(baseline[name]):4} {fmt}={len(candidate):4} matched={hits:4}")
+
+            rate = matched / total if total else 1.0
+            status = "PASS" if rate >= min_match else "FAIL"
+            print("-" * 60)
+            print(f"{status}: {rate:.1%} of detections match (required {min_match:.0%})")
+            ok = ok and rate >= min_match
+
+    return ok
+
+def main():
+    parser = argparse.ArgumentParser(description="Export iBrood models for CPU inference backends")
+    parser.add_argument('--formats', nargs='+', choices=['onnx', 'openvino'], default=['onnx', 'openvino'])
+    parser.add_argument('--imgsz', type=int, default=640, help="Export size, must match the predict size in app.py")
+    parser.add_argument('--check', metavar='DIR', help="Folder of frames for the parity check (skips export)")
+    parser.add_argument('--int8', action='store_true', help="Build static INT8 ONNX models from the FP32 ONNX export")
+    parser.add_argument('--calib', metavar='DIR', help="Folder of frames for INT8 calibration")
+    parser.add_argument('--calib-limit', type=int, default=200, help="Maximum calibration frames")
+    parser.add_argument('--iou-tol', type=float, default=0.9, help="Minimum IoU for two boxes to match")
+    parser.add_argument('--conf-tol', type=float, default=0.05, help="Maximum confidence difference for a match")
+    parser.add_argument('--min-match', type=float, default=0.95, help="Required fraction of matching detections")
+    args = parser.parse_args()
+
+    if args.check:
+        ok = check_parity(args.check, args.formats, args.iou_tol, args.conf_tol, args.min_match)
+        sys.exit(0 if ok else 1)
+
+    if args.int8:
+        if not args.calib:
+            parser.error("--int8 needs --calib DIR")
+        if not all(os.path.exists(ARTIFACTS['onnx'](weights)) for weights in MODELS if os.path.exists(weights)):
+            export_models(['onnx'], args.imgsz)
+        sys.exit(0 if quantize_int8(args.calib, args.imgsz, args.calib_limit) else 1)
+
+    export_models(args.formats, args.imgsz)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,135 @@
+# iBrood Image Ingestion
+# Every detection endpoint decodes uploads here. The guards run on the file
+# header before any pixel is decoded: uploads over MAX_UPLOAD_MB and images
+# over MAX_IMAGE_PIXELS (decompression bombs) are rejected. JPEGs are decoded
+# with draft() at the reduced DCT scale closest to the inference size, so a
+# 48MP phone frame is never fully decoded just to be downscaled. EXIF
+# orientation is applied once, so detections line up with the photo as it is
+# displayed. Decode times are kept apart from inference in IngestMetrics.
+
+import io
+import os
+import math
+import time
+import threading
+from PIL import Image, UnidentifiedImageError
+
+MAX_UPLOAD_MB = float(os.environ.get("MAX_UPLOAD_MB", "25"))
+MAX_IMAGE_PIXELS = int(os.environ.get("MAX_IMAGE_PIXELS", "60000000"))  # 48MP phones fit
+
+# PIL's own bomb check stays as a backstop for code that opens images directly
+Image.MAX_IMAGE_PIXELS = MAX_IMAGE_PIXELS
+
+EXIF_ORIENTATION = 0x0112
+ORIENTATION_TRANSPOSE = {
+    2: Image.Transpose.FLIP_LEFT_RIGHT,
+    3: Image.Transpose.ROTATE_180,
+    4: Image.Transpose.FLIP_TOP_BOTTOM,
+    5: Image.Transpose.TRANSPOSE,
+    6: Image.Transpose.ROTATE_270,
+    7: Image.Transpose.TRANSVERSE,
+    8: Image.Transpose.ROTATE_90,
+}
+
+class UploadRejected(Exception):
+    """Raised for uploads that are too large or not an image, before they are decoded"""
+
+    def __init__(self, message, status_code=413):
+        super().__init__(message)
+        self.status_code = status_code
+
+class IngestMetrics:
+    """Decode counts and time, separate from inference"""
+
+    def __init__(self):
+        self.decodes = 0
+        self.draft_decodes = 0
+        self.rejected = 0
+        self.decode_ms = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, elapsed_ms, drafted):
+        with self._lock:
+            self.decodes += 1
+            self.draft_decodes += drafted
+            self.decode_ms += elapsed_ms
+
+    def reject(self):
+        with self._lock:
+            self.rejected += 1
+
+    def stats(self):
+        return {
+            "decodes": self.decodes,
+            "draft_decodes": self.draft_decodes,
+            "rejected": self.rejected,
+            "avg_decode_ms": round(self.decode_ms / self.decodes, 2) if self.decodes else 0,
+            "max_upload_mb": MAX_UPLOAD_MB,
+            "max_image_pixels": MAX_IMAGE_PIXELS
+        }
+
+metrics = IngestMetrics()
+
+def open_upload(file_content):
+    """Open an upload lazily (header only), rejecting oversize files and decompression bombs"""
+    try:
+        if len(file_content) > MAX_UPLOAD_MB * 1024 * 1024:
+            raise UploadRejected(f"Upload is {len(file_content) / 1024 / 1024:.1f} MB, the limit is {MAX_UPLOAD_MB:g} MB")
+        try:
+            image = Image.open(io.BytesIO(file_content))
+        except Image.DecompressionBombError as e:
+            raise UploadRejected(str(e))
+        except UnidentifiedImageError:
+            raise UploadRejected("Upload is not a supported image", status_code=400)
+        width, height = image.size
+        if width * height > MAX_IMAGE_PIXELS:
+            raise UploadRejected(f"Image is {width}x{height}, the limit is {MAX_IMAGE_PIXELS} pixels")
+        return image
+    except UploadRejected:
+        metrics.reject()
+        raise
+
+def exif_orientation(image):
+    try:
+        return image.getexif().get(EXIF_ORIENTATION, 1)
+    except Exception:
+        return 1
+
+def upright(image, orientation):
+    """The image turned the way its EXIF orientation says it is displayed"""
+    method = ORIENTATION_TRANSPOSE.get(orientation)
+    return image.transpose(method) if method is not None else image
+
+def decode_image(file_content):
+    """Fully decode an upload, upright"""
+    start = time.perf_counter()
+    image = open_upload(file_content)
+    orientation = exif_orientation(image)
+    image.load()
+    image = upright(image, orientation)
+    metrics.observe((time.perf_counter() - start) * 1000, False)
+    return image
+
+def prepare_image(file_content, max_size=1280):
+    """Decode an upload straight to the copy used for inference.
+    Returns (upright original size, inference image, scale ratio)."""
+    start = time.perf_counter()
+    image = open_upload(file_content)
+    orientation = exif_orientation(image)
+    width, height = image.size
+    ratio = min(1.0, max_size / max(width, height))
+
+    drafted = False
+    if ratio < 1.0 and image.format == "JPEG":
+        # Picks the largest 1/2, 1/4 or 1/8 scale that is still >= the target
+        image.draft(image.mode, (math.ceil(width * ratio), math.ceil(height * ratio)))
+        drafted = image.size != (width, height)
+    image.load()
+
+    target = (int(width * ratio), int(height * ratio))
+    if image.size != target:
+        image = image.resize(target, Image.LANCZOS)
+    image = upright(image, orientation)
+    original_size = (height, width) if orientation in (5, 6, 7, 8) else (width, height)
+    metrics.observe((time.perf_counter() - start) * 1000, drafted)
+    return original_size, image, ratio
@@ -0,0 +1,91 @@
+# iBrood Mask Polygons
+# Turns the segmentation masks of one YOLO result into simplified polygons for
+# the frontend. All masks are copied to host memory in one transfer, each is
+# cropped to its detection box before thresholding and the contour search,
+# and points are scaled as arrays. Frames with many cells spread the contour
+# work over MASK_WORKERS threads (OpenCV releases the GIL).
+
+import os
+import logging
+from concurrent.futures import ThreadPoolExecutor
+import cv2
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+MASK_WORKERS = int(os.environ.get("MASK_WORKERS", str(min(4, os.cpu_count() or 1))))
+MASK_PARALLEL_MIN = int(os.environ.get("MASK_PARALLEL_MIN", "8"))  # fewer masks are done inline
+# ultralytics zeroes each mask outside its box on the 4x coarser prototype
+# grid, so after upsampling a mask can bleed a few pixels past the box
+CROP_MARGIN = 8
+
+executor = ThreadPoolExecutor(max_workers=MASK_WORKERS, thread_name_prefix="mask") if MASK_WORKERS > 1 else None
+
+def letterbox_boxes(boxes_xyxy, orig_shape, mask_shape):
+    """Map xyxy boxes from original image pixels onto the letterboxed mask grid
+    (the inverse of ultralytics' scale_boxes)"""
+    orig_height, orig_width = orig_shape
+    mask_height, mask_width = mask_shape
+    gain = min(mask_height / orig_height, mask_width / orig_width)
+    pad_x = (mask_width - orig_width * gain) / 2
+    pad_y = (mask_height - orig_height * gain) / 2
+    return boxes_xyxy * gain + np.array([pad_x, pad_y, pad_x, pad_y])
+
+def crop_bounds(boxes, mask_shape):
+    """(y0, y1, x0, x1) crop of each mask: its box plus CROP_MARGIN, clipped to the mask"""
+    height, width = mask_shape
+    x0 = np.clip(np.floor(boxes[:, 0]) - CROP_MARGIN, 0, width)
+    y0 = np.clip(np.floor(boxes[:, 1]) - CROP_MARGIN, 0, height)
+    x1 = np.clip(np.ceil(boxes[:, 2]) + CROP_MARGIN + 1, 0, width)
+    y1 = np.clip(np.ceil(boxes[:, 3]) + CROP_MARGIN + 1, 0, height)
+    return np.stack([y0, y1, x0, x1], axis=1).astype(int)
+
+def cut_through(crop, bounds, mask_shape):
+    """Whether set pixels touch an edge of the crop that is not an edge of the mask"""
+    y0, y1, x0, x1 = bounds
+    height, width = mask_shape
+    return bool(
+        (y0 > 0 and crop[0].any()) or (y1 < height and crop[-1].any()) or
+        (x0 > 0 and crop[:, 0].any()) or (x1 < width and crop[:, -1].any())
+    )
+
+def contour_polygon(binary, offset, epsilon_ratio):
+    """Largest external contour of a binary mask, simplified, as an (n, 2) array in mask coordinates"""
+    contours, _ = cv2.findContours(binary, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE, offset=offset)
+    if not contours:
+        return None
+    largest = max(contours, key=cv2.contourArea)
+    return cv2.approxPolyDP(largest, epsilon_ratio * cv2.arcLength(largest, True), True).reshape(-1, 2)
+
+def mask_polygons(mask_data, image_size, epsilon_ratio, boxes=None):
+    """Polygon ([[x, y], ...] scaled to image_size) for each mask of a Results.masks.data
+    tensor, or None where a mask has no contour. boxes (xyxy on the mask grid, see
+    letterbox_boxes) limit the contour search to each detection; without them
+    the whole mask is searched."""
+    masks = mask_data.cpu().numpy()
+    count, mask_height, mask_width = masks.shape
+    mask_shape = (mask_height, mask_width)
+    bounds = crop_bounds(np.asarray(boxes, dtype=float), mask_shape) if boxes is not None else None
+    # PIL Image.size returns (width, height)
+    scale = np.array([image_size[0] / mask_width, image_size[1] / mask_height])
+
+    def polygon(i):
+        binary, offset = None, (0, 0)
+        if bounds is not None:
+            y0, y1, x0, x1 = bounds[i]
+            binary, offset = (masks[i, y0:y1, x0:x1] * 255).astype(np.uint8), (int(x0), int(y0))
+            # A box that doesn't hold its whole mask falls back to the full search
+            if binary.size == 0 or cut_through(binary, bounds[i], mask_shape):
+                binary, offset = None, (0, 0)
+        if binary is None:
+            binary = (masks[i] * 255).astype(np.uint8)
+        try:
+            points = contour_polygon(binary, offset, epsilon_ratio)
+        except cv2.error as e:
+            logger.warning(f"Mask extraction failed for mask {i + 1}: {e}")
+            return None
+        return None if points is None else (points * scale).tolist()
+
+    if executor is not None and count >= MASK_PARALLEL_MIN:
+        return list(executor.map(polygon, range(count)))
+    return [polygon(i) for i in range(count)]
@@ -65,6 +65,10 @@ export class YOLOQueenCellService {
     // Call HuggingFace API directly
     const HF_API_URL = "https://rozu1726-ibrood-app.hf.space"
     
+    // Send the raw image bytes - a third smaller than base64 JSON, and the
+    // server answers with a reference instead of echoing the image back
+    const imageBlob = await (await fetch(imageData)).blob()
+    
     for (let attempt = 1; attempt <= maxRetries; attempt++) {
       try {
         console.log(`📡 Calling HuggingFace API /analyze endpoint (attempt ${attempt})...`)
@@ -72,13 +76,13 @@ export class YOLOQueenCellService {
         const controller = new AbortController()
         const timeoutId = setTimeout(() => controller.abort(), 60000)
         
-        // Use /analyze endpoint - it expects JSON with base64 image and returns full analysis
+        // Use /analyze endpoint - it takes the image as the request body and returns full analysis
         const response = await fetch(`${HF_API_URL}/analyze`, {
           method: 'POST',
           headers: {
-            'Content-Type': 'application/json',
+            'Content-Type': imageBlob.type || 'application/octet-stream',
           },
-          body: JSON.stringify({ image: imageData }),
+          body: imageBlob,
           signal: controller.signal
         })
         